@@ -3,7 +3,8 @@ import json
 import uuid
 import re
 import logging
-from typing import Literal
+import threading
+from typing import Literal, NamedTuple
 from pydantic import BaseModel, ConfigDict, ValidationError
 
 from kaa.errors import ProduceSolutionInvalidError, ProduceSolutionNotFoundError
@@ -94,6 +95,96 @@ class ProduceSolution(ConfigBaseModel):
     """培育数据"""
 
 
+class _Stat(NamedTuple):
+    mtime_ns: int
+    size: int
+
+
+def _stat(path: str) -> _Stat | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return _Stat(st.st_mtime_ns, st.st_size)
+
+
+class _SolutionCache:
+    """
+    单个方案目录的缓存。
+
+    * ID → 文件路径的索引，目录的 mtime 变化（文件增删、重命名）时重建。
+    * 已解析的方案，按文件的 mtime 与大小判断是否需要重新读取。
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.__index: dict[str, str] = {}
+        self.__index_stat: _Stat | None = None
+        self.__solutions: dict[str, tuple[_Stat, ProduceSolution]] = {}
+
+    def invalidate(self):
+        self.__index_stat = None
+        self.__solutions.clear()
+
+    def __rebuild_index(self, stat: _Stat | None):
+        index: dict[str, str] = {}
+        if stat is not None:
+            for filename in os.listdir(self.directory):
+                if not filename.endswith('.json'):
+                    continue
+                file_path = os.path.join(self.directory, filename)
+                try:
+                    with open(file_path, 'r', encoding='utf-8') as f:
+                        id = json.load(f).get('id')
+                except Exception:
+                    continue
+                if isinstance(id, str) and id not in index:
+                    index[id] = file_path
+        logger.debug('Indexed %d produce solutions in %s.', len(index), self.directory)
+        self.__index = index
+        self.__index_stat = stat
+
+    def path(self, id: str) -> str | None:
+        """根据方案 ID 查找文件路径"""
+        stat = _stat(self.directory)
+        if stat is None or stat != self.__index_stat:
+            self.__rebuild_index(stat)
+        file_path = self.__index.get(id)
+        if file_path is not None and not os.path.exists(file_path):
+            # 目录 mtime 精度不足时可能漏掉变化
+            self.__rebuild_index(stat)
+            file_path = self.__index.get(id)
+        return file_path
+
+    def get(self, id: str) -> ProduceSolution:
+        """读取方案。文件未变化时直接返回缓存的对象。"""
+        file_path = self.path(id)
+        if file_path is None:
+            raise ProduceSolutionNotFoundError(id)
+        stat = _stat(file_path)
+        cached = self.__solutions.get(file_path)
+        if cached is not None and stat is not None and cached[0] == stat:
+            return cached[1]
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                solution = ProduceSolution.model_validate_json(f.read())
+        except ValidationError as e:
+            raise ProduceSolutionInvalidError(id, file_path, e)
+        if solution.id != id:
+            # 文件内容被外部修改，ID 已变化，重建索引后再查找一次
+            self.__rebuild_index(_stat(self.directory))
+            if self.__index.get(id) in (None, file_path):
+                raise ProduceSolutionNotFoundError(id)
+            return self.get(id)
+        if stat is not None:
+            self.__solutions[file_path] = (stat, solution)
+        return solution
+
+
+_caches: dict[str, _SolutionCache] = {}
+_caches_lock = threading.Lock()
+
+
 class ProduceSolutionManager:
     """培育方案管理器"""
 
@@ -123,6 +214,14 @@ class ProduceSolutionManager:
         safe_name = self._sanitize_filename(name)
         return os.path.join(self.SOLUTIONS_DIR, f"{safe_name}.json")
 
+    @property
+    def _cache(self) -> _SolutionCache:
+        with _caches_lock:
+            cache = _caches.get(self.SOLUTIONS_DIR)
+            if cache is None:
+                cache = _caches[self.SOLUTIONS_DIR] = _SolutionCache(self.SOLUTIONS_DIR)
+            return cache
+
     def _find_file_path_by_id(self, id: str) -> str | None:
         """
         根据方案ID查找文件路径
@@ -130,20 +229,9 @@ class ProduceSolutionManager:
         :param id: 方案ID
         :return: 文件路径，如果未找到则返回 None
         """
-        if not os.path.exists(self.SOLUTIONS_DIR):
-            return None
-
-        for filename in os.listdir(self.SOLUTIONS_DIR):
-            if filename.endswith('.json'):
-                try:
-                    file_path = os.path.join(self.SOLUTIONS_DIR, filename)
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    if data.get('id') == id:
-                        return file_path
-                except Exception:
-                    continue
-        return None
+        cache = self._cache
+        with cache.lock:
+            return cache.path(id)
 
     def new(self, name: str) -> ProduceSolution:
         """
@@ -189,9 +277,12 @@ class ProduceSolutionManager:
 
         :param id: 方案ID
         """
-        file_path = self._find_file_path_by_id(id)
-        if file_path:
-            os.remove(file_path)
+        cache = self._cache
+        with cache.lock:
+            file_path = cache.path(id)
+            if file_path:
+                os.remove(file_path)
+            cache.invalidate()
 
     def save(self, id: str, solution: ProduceSolution) -> None:
         """
@@ -203,17 +294,21 @@ class ProduceSolutionManager:
         # 确保ID一致
         solution.id = id
 
-        # 先删除具有相同ID的旧文件（如果存在），避免名称变更时产生重复文件
-        old_file_path = self._find_file_path_by_id(id)
-        if old_file_path:
-            os.remove(old_file_path)
-
-        # 保存新文件
-        file_path = self._get_file_path(solution.name)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            # 使用 model_dump 并指定 mode='json' 来正确序列化枚举
-            data = solution.model_dump(mode='json')
-            json.dump(data, f, ensure_ascii=False, indent=4)
+        cache = self._cache
+        with cache.lock:
+            # 先删除具有相同ID的旧文件（如果存在），避免名称变更时产生重复文件
+            old_file_path = cache.path(id)
+            if old_file_path:
+                os.remove(old_file_path)
+
+            # 保存新文件
+            file_path = self._get_file_path(solution.name)
+            with open(file_path, 'w', encoding='utf-8') as f:
+                # 使用 model_dump 并指定 mode='json' 来正确序列化枚举
+                data = solution.model_dump(mode='json')
+                json.dump(data, f, ensure_ascii=False, indent=4)
+            # mtime 精度可能不足以区分两次写入，因此不依赖 mtime 判断
+            cache.invalidate()
 
     def read(self, id: str) -> ProduceSolution:
         """
@@ -223,15 +318,22 @@ class ProduceSolutionManager:
         :return: 方案对象
         :raises ProduceSloutionNotFoundError: 当方案不存在时
         """
-        file_path = self._find_file_path_by_id(id)
-        if not file_path:
-            raise ProduceSolutionNotFoundError(id)
+        return self.get(id).model_copy(deep=True)
 
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return ProduceSolution.model_validate_json(f.read())
-        except ValidationError as e:
-            raise ProduceSolutionInvalidError(id, file_path, e)
+    def get(self, id: str) -> ProduceSolution:
+        """
+        读取指定ID的培育方案，并在内存中缓存。
+
+        与 `read` 不同，返回的是缓存中的共享对象，调用方不应修改它。
+        文件被修改、增删后会自动重新读取。
+
+        :param id: 方案ID
+        :return: 方案对象
+        :raises ProduceSloutionNotFoundError: 当方案不存在时
+        """
+        cache = self._cache
+        with cache.lock:
+            return cache.get(id)
 
     def duplicate(self, id: str) -> ProduceSolution:
         """
@@ -1,2 +1,3 @@
 from .idol_card import IdolCard
-from .constants import CharacterId
\ No newline at end of file
+from .constants import CharacterId
+from .catalog import SkillCatalog, skill_catalog
\ No newline at end of file
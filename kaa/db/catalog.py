@@ -0,0 +1,112 @@
+import threading
+from logging import getLogger
+
+from .skill_card import (
+    SkillCard, ProduceExamEffect,
+    PRODUCE_CARD_SELECT, PRODUCE_EXAM_EFFECT_SELECT,
+)
+from .sqlite import ConnectionManager, manager
+
+logger = getLogger(__name__)
+
+
+class SkillCatalog:
+    """
+    技能卡目录。
+
+    首次使用时一次性读取 ProduceCard 与 ProduceExamEffect 全表，
+    建立以 id 与 assetId 为 key 的索引，之后的查询只需一次字典查找。
+    game.db 被替换（即连接管理器的 `generation` 变化）后，下次查询时自动重新加载。
+    """
+    def __init__(self, connections: ConnectionManager | None = None):
+        """
+        :param connections: 连接管理器。默认为 game.db 的连接管理器。
+        """
+        self.__connections = connections
+        self.__lock = threading.Lock()
+        self.__generation: int | None = None
+        self.__by_id: dict[str, SkillCard] = {}
+        self.__by_asset_id: dict[str, SkillCard] = {}
+        self.__effects: dict[str, ProduceExamEffect] = {}
+        self.__all: list[SkillCard] = []
+
+    @property
+    def connections(self) -> ConnectionManager:
+        return self.__connections or manager()
+
+    def __ensure_loaded(self):
+        generation = self.connections.generation
+        if self.__generation == generation:
+            return
+        with self.__lock:
+            if self.__generation == generation:
+                return
+            self.__load()
+            self.__generation = generation
+
+    def __load(self):
+        effects: dict[str, ProduceExamEffect] = {}
+        by_id: dict[str, SkillCard] = {}
+        by_asset_id: dict[str, SkillCard] = {}
+        all_cards: list[SkillCard] = []
+        with self.connections.connection() as conn:
+            for row in conn.execute(f"{PRODUCE_EXAM_EFFECT_SELECT};"):
+                effect = ProduceExamEffect.from_row(row)
+                if effect._id:
+                    effects[effect._id] = effect
+            for row in conn.execute(f"{PRODUCE_CARD_SELECT};"):
+                card = SkillCard._from_row(row, effects)
+                all_cards.append(card)
+                # 与 `SkillCard.from_id` / `from_asset_id` 一致，同一 key 取表中第一行
+                by_id.setdefault(card._id, card)
+                if card._asset_id:
+                    by_asset_id.setdefault(card._asset_id, card)
+        self.__effects = effects
+        self.__by_id = by_id
+        self.__by_asset_id = by_asset_id
+        self.__all = all_cards
+        logger.info('Skill catalog loaded. cards=%d, effects=%d', len(by_id), len(effects))
+
+    def invalidate(self):
+        """丢弃已加载的数据，下次查询时重新加载。"""
+        with self.__lock:
+            self.__generation = None
+
+    def by_asset_id(self, asset_id: str) -> SkillCard | None:
+        """根据 asset_id 查询技能卡。"""
+        self.__ensure_loaded()
+        return self.__by_asset_id.get(asset_id)
+
+    def by_id(self, card_id: str) -> SkillCard | None:
+        """根据 id 查询技能卡。"""
+        self.__ensure_loaded()
+        return self.__by_id.get(card_id)
+
+    def effect(self, effect_id: str) -> ProduceExamEffect | None:
+        """根据 id 查询考试效果。"""
+        self.__ensure_loaded()
+        return self.__effects.get(effect_id)
+
+    def cards(self) -> list[SkillCard]:
+        """所有技能卡（每个 id 一张）"""
+        self.__ensure_loaded()
+        return list(self.__by_id.values())
+
+    def all_cards(self) -> list[SkillCard]:
+        """ProduceCard 表中的所有行，包括同一 id 的各个强化等级"""
+        self.__ensure_loaded()
+        return list(self.__all)
+
+    @property
+    def generation(self) -> int:
+        """当前已加载数据对应的连接管理器 `generation`。可据此判断派生数据是否需要重建。"""
+        self.__ensure_loaded()
+        return self.connections.generation
+
+
+_catalog = SkillCatalog()
+
+
+def skill_catalog() -> SkillCatalog:
+    """返回全局技能卡目录"""
+    return _catalog
@@ -1,42 +1,176 @@
 import sqlite3
 import threading
+import weakref
+from pathlib import Path
 from logging import getLogger
-from typing import Any, List, Optional
+from contextlib import contextmanager
+from typing import Any, Iterator, List, Optional
 
+from kaa.game_data import events as game_data_events
 from kaa.game_data.paths import game_db_path
 
-_db_path = str(game_db_path())
+logger = getLogger(__name__)
 
-_db_dict = {}
+MMAP_SIZE = 256 * 1024 * 1024
+"""PRAGMA mmap_size，单位字节"""
+CACHE_SIZE_KB = 16 * 1024
+"""PRAGMA cache_size，单位 KiB"""
+
+
+class _ConnectionHolder:
+    """保存在线程局部存储中。线程结束时被回收，随之关闭连接。"""
+    def __init__(self, conn: sqlite3.Connection, generation: int):
+        self.conn = conn
+        self.generation = generation
+        self.in_use = threading.RLock()
+        """所属线程使用连接期间持有。`release_idle()` 只关闭未被占用的连接"""
+        self.finalizer = weakref.finalize(self, _close_connection, conn)
+
+
+def _close_connection(conn: sqlite3.Connection):
+    try:
+        conn.close()
+    except sqlite3.Error as e:
+        logger.warning("Failed to close database connection: %s", e)
+
+
+class ConnectionManager:
+    """
+    game.db 连接管理器。
+
+    * 每个线程使用独立的只读连接（`mode=ro&immutable=1`），首次查询时打开。
+    * 线程结束后，其连接随线程局部存储一起被回收并关闭。
+    * game.db 被替换后调用 `reset()`，各线程会在下次查询时关闭旧连接并重新打开。
+    * 移走游戏数据目录前调用 `release_idle()`，释放未在使用的连接占用的文件。
+    """
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.__local = threading.local()
+        self.__lock = threading.Lock()
+        self.__generation = 0
+        self.__holders: weakref.WeakSet[_ConnectionHolder] = weakref.WeakSet()
+
+    def __open(self) -> sqlite3.Connection:
+        uri = self.path.resolve().as_uri() + '?mode=ro&immutable=1'
+        # 连接只在所属线程中使用。`release_idle()` 会在持有占用锁时从其他线程关闭它
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f'PRAGMA mmap_size = {MMAP_SIZE};')
+        conn.execute(f'PRAGMA cache_size = {-CACHE_SIZE_KB};')
+        return conn
+
+    def get(self) -> sqlite3.Connection:
+        """返回当前线程的连接，不存在或已失效时打开新连接。"""
+        holder: _ConnectionHolder | None = getattr(self.__local, 'holder', None)
+        if holder is not None and holder.generation == self.__generation and holder.finalizer.alive:
+            return holder.conn
+        if holder is not None:
+            holder.finalizer()
+        with self.__lock:
+            conn = self.__open()
+            holder = _ConnectionHolder(conn, self.__generation)
+            self.__holders.add(holder)
+        self.__local.holder = holder
+        logger.info("Database connection established for thread: %s", threading.current_thread().name)
+        return conn
+
+    def close_current(self):
+        """关闭当前线程的连接。"""
+        holder: _ConnectionHolder | None = getattr(self.__local, 'holder', None)
+        if holder is not None:
+            holder.finalizer()
+            self.__local.holder = None
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        获取当前线程的连接，并在使用期间将其标记为占用。
+
+        占用中的连接不会被 `release_idle()` 关闭。查询应在此上下文中完成。
+        """
+        while True:
+            conn = self.get()
+            holder: _ConnectionHolder = self.__local.holder
+            with holder.in_use:
+                # 获取占用锁前可能已被 release_idle() 关闭，此时重新打开
+                if holder.finalizer.alive:
+                    yield conn
+                    return
+
+    def reset(self):
+        """
+        使所有线程的连接失效。各线程在下次查询时关闭旧连接并重新打开。
+
+        用于 game.db 被替换后。由于使用了 `immutable=1`，继续使用旧连接会读到错误的数据。
+        正在进行的查询不受影响。
+        """
+        with self.__lock:
+            self.__generation += 1
+        logger.info("Database connections reset. generation=%d", self.__generation)
+
+    def release_idle(self) -> int:
+        """
+        关闭所有未在使用的连接，释放其占用的文件。
+
+        Windows 下目录中有打开的文件时无法重命名，因此移走游戏数据目录前调用。
+        正在 `connection()` 中使用的连接不会被关闭；被关闭的连接会在所属线程下次查询时重新打开。
+        :return: 关闭的连接数量。
+        """
+        with self.__lock:
+            holders = list(self.__holders)
+        closed = 0
+        for holder in holders:
+            if not holder.in_use.acquire(blocking=False):
+                continue
+            try:
+                if holder.finalizer.alive:
+                    holder.finalizer()
+                    closed += 1
+            finally:
+                holder.in_use.release()
+        logger.info("Released %d idle database connections (%d total).", closed, len(holders))
+        return closed
+
+    @property
+    def generation(self) -> int:
+        """每次调用 `reset()` 后递增。依赖 game.db 内容的缓存可据此判断是否需要重新加载。"""
+        return self.__generation
+
+    @property
+    def connection_count(self) -> int:
+        """当前仍然打开的连接数量"""
+        return sum(1 for h in list(self.__holders) if h.finalizer.alive)
+
+
+_manager = ConnectionManager(game_db_path())
+# 游戏数据目录被替换后，各线程在下次查询时打开新的 game.db
+game_data_events.subscribe(_manager.reset)
+
+
+def manager() -> ConnectionManager:
+    """返回 game.db 的连接管理器"""
+    return _manager
 
-logger = getLogger(__name__)
 
 def _ensure_db() -> sqlite3.Connection:
     """
     确保数据库连接已建立
     培育过程是新开线程，不同线程的connection不能使用
-    # TODO 培育结束需要关闭connection
     """
-    global _db_dict
-    thread_id = threading.current_thread().ident
-    if thread_id not in _db_dict:
-        _db_dict[thread_id] = sqlite3.connect(_db_path)
-        _db_dict[thread_id].row_factory = sqlite3.Row
-        logger.info("Database connection established for thread: %s", thread_id)
-    return _db_dict[thread_id]
+    return _manager.get()
 
 
 def select_many(query: str, *args) -> List[tuple[Any, ...]]:
     """执行查询并返回多行结果，每行为字典格式"""
-    db = _ensure_db()
-    c = db.cursor()
-    c.execute(query, args)
-    return c.fetchall()
+    with _manager.connection() as db:
+        c = db.cursor()
+        c.execute(query, args)
+        return c.fetchall()
 
 
 def select(query: str, *args) -> Optional[tuple[Any, ...]]:
     """执行查询并返回单行结果，为字典格式"""
-    db = _ensure_db()
-    c = db.cursor()
-    c.execute(query, args)
-    return c.fetchone()
+    with _manager.connection() as db:
+        c = db.cursor()
+        c.execute(query, args)
+        return c.fetchone()
@@ -138,4 +138,15 @@ class WindowsOnlyError(KaaUserFriendlyError):
         super().__init__(
             f'此功能（{feature_name}）仅在 Windows 上可用。当前系统为 {platform.system()}。请不要使用此功能，或在 Windows 上运行 kaa。',
             'https://www.kdocs.cn/l/cetCY8mGKHLj?linkname=LbvACPfiCw'
-        )
\ No newline at end of file
+        )
+
+class GameDataValidationError(KaaUserFriendlyError):
+    """暂存的游戏数据未通过验证，未替换当前数据"""
+    def __init__(self, files: list[str]):
+        self.files = files
+        """验证失败的文件"""
+        names = '、'.join(files[:10]) + (' 等' if len(files) > 10 else '')
+        super().__init__(
+            f'游戏数据更新失败，下载的文件未通过校验（{names}）。已保留原有数据，请稍后重试',
+            'https://www.kdocs.cn/l/cetCY8mGKHLj?linkname=some-link' # TODO
+        )
@@ -0,0 +1,51 @@
+"""
+游戏数据变更通知。
+
+updater 整体替换游戏数据目录后调用 `publish_changed()`。依赖游戏数据的缓存可以：
+
+* 记录 `generation()`，在下次使用时发现其变化并重新加载（如各图像数据库的访问函数）；
+* 用 `subscribe()` 注册回调，在替换完成后立即执行（如关闭 game.db 的连接）。
+"""
+import threading
+from logging import getLogger
+from typing import Callable
+
+logger = getLogger(__name__)
+
+_lock = threading.Lock()
+_generation = 0
+_listeners: list[Callable[[], None]] = []
+
+
+def generation() -> int:
+    """游戏数据的版本号。每次 `publish_changed()` 后递增。"""
+    return _generation
+
+
+def subscribe(listener: Callable[[], None]) -> Callable[[], None]:
+    """
+    注册游戏数据变更回调。回调在调用 `publish_changed()` 的线程中执行。
+
+    :return: 取消注册的函数。
+    """
+    with _lock:
+        _listeners.append(listener)
+    def unsubscribe():
+        with _lock:
+            if listener in _listeners:
+                _listeners.remove(listener)
+    return unsubscribe
+
+
+def publish_changed():
+    """通知游戏数据已被替换。回调抛出的异常会被记录，不会中断其他回调。"""
+    global _generation
+    with _lock:
+        _generation += 1
+        listeners = list(_listeners)
+    logger.info('Game data changed. generation=%d, listeners=%d', _generation, len(listeners))
+    for listener in listeners:
+        try:
+            listener()
+        except Exception:
+            logger.exception('Game data listener %r failed.', listener)
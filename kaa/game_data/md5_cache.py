@@ -0,0 +1,130 @@
+"""
+本地文件 md5 缓存。
+
+检查更新时需要校验所有 sprite 文件的 md5。
+本模块以文件路径为键缓存 `(大小, mtime_ns, md5)`，只有大小或修改时间变化的文件才会重新计算，
+并使用线程池并行计算（hashlib 在计算时会释放 GIL）。
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import concurrent.futures
+from pathlib import Path
+from typing import Iterable, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+_VERSION = 1
+_RACY_NS = 2 * 10**9
+"""修改时间距今不足此值的文件不缓存：同一时间精度内的再次修改无法通过 mtime 发现"""
+
+
+def md5_file(path: Path) -> str:
+    h = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class _Entry(NamedTuple):
+    size: int
+    mtime_ns: int
+    md5: str
+
+
+class Md5Cache:
+    """
+    持久化的 md5 缓存。
+
+    用法：
+    ```python
+    cache = Md5Cache(md5_cache_path(), get_game_data_dir())
+    hashes = cache.md5_many(paths)
+    cache.save()
+    ```
+    """
+    def __init__(self, cache_path: Path, root: Path):
+        """
+        :param cache_path: 缓存文件路径。
+        :param root: 缓存中的路径以此目录为基准保存。
+        """
+        self.cache_path = cache_path
+        self.root = root
+        self.__prefix = root.as_posix().rstrip('/') + '/'
+        self.hits = 0
+        self.misses = 0
+        self.__entries: dict[str, _Entry] = {}
+        self.__dirty = False
+        self.load()
+
+    def load(self):
+        """从磁盘读取缓存。文件不存在或损坏时视为空缓存。"""
+        self.__entries = {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == _VERSION:
+                self.__entries = {k: _Entry(*v) for k, v in data['files'].items()}
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning('Failed to load md5 cache %s: %s', self.cache_path, e)
+
+    def save(self):
+        """将缓存写回磁盘。没有变化时不写入。"""
+        if not self.__dirty:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.cache_path.with_name(self.cache_path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': _VERSION, 'files': self.__entries}, f)
+        os.replace(tmp, self.cache_path)
+        self.__dirty = False
+
+    def __key(self, path: Path) -> str:
+        key = path.as_posix()
+        if key.startswith(self.__prefix):
+            return key[len(self.__prefix):]
+        return Path(os.path.relpath(path, self.root)).as_posix()
+
+    def md5_many(self, paths: Iterable[Path], max_workers: int = 8) -> dict[Path, str | None]:
+        """
+        计算多个文件的 md5。
+
+        :return: 路径到 md5 的映射。文件不存在时为 None。
+        """
+        result: dict[Path, str | None] = {}
+        stale: list[tuple[Path, str, os.stat_result]] = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                result[path] = None
+                continue
+            key = self.__key(path)
+            entry = self.__entries.get(key)
+            if entry is not None and entry.size == st.st_size and entry.mtime_ns == st.st_mtime_ns:
+                self.hits += 1
+                result[path] = entry.md5
+            else:
+                stale.append((path, key, st))
+
+        if stale:
+            self.misses += len(stale)
+            now = time.time_ns()
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+                hashes = pool.map(md5_file, [p for p, _, _ in stale])
+                for (path, key, st), md5 in zip(stale, hashes):
+                    result[path] = md5
+                    if now - st.st_mtime_ns >= _RACY_NS:
+                        self.__entries[key] = _Entry(st.st_size, st.st_mtime_ns, md5)
+                        self.__dirty = True
+            logger.debug('Hashed %d files (%d cached).', len(stale), self.hits)
+        return result
+
+    def md5(self, path: Path) -> str | None:
+        """计算单个文件的 md5。文件不存在时返回 None。"""
+        return self.md5_many([path])[path]
@@ -1,11 +1,44 @@
+import threading
 from pathlib import Path
 
 _GAME_DATA_DIR = Path('./resources/game_data')
+_STAGING_DIR = _GAME_DATA_DIR.with_name('game_data.staging')
+_BACKUP_DIR = _GAME_DATA_DIR.with_name('game_data.old')
+
+_init_lock = threading.Lock()
+_initialized = False
+
+def _init_game_data_dir():
+    """
+    创建游戏数据目录，并完成或回滚上次中断的目录替换（见 `staging.StagedGameData.commit`）。
+
+    每个进程只在首次访问时执行一次。之后的目录替换由 updater 完成，
+    若在其两次重命名之间再次执行，会抢先移动暂存目录，导致替换失败。
+    """
+    if not _GAME_DATA_DIR.exists():
+        if _BACKUP_DIR.exists():
+            # 旧目录移走前暂存目录已通过验证，因此优先完成替换
+            (_STAGING_DIR if _STAGING_DIR.exists() else _BACKUP_DIR).rename(_GAME_DATA_DIR)
+        else:
+            _GAME_DATA_DIR.mkdir(parents=True, exist_ok=True)
 
 def get_game_data_dir() -> Path:
-    _GAME_DATA_DIR.mkdir(parents=True, exist_ok=True)
+    global _initialized
+    if not _initialized:
+        with _init_lock:
+            if not _initialized:
+                _init_game_data_dir()
+                _initialized = True
     return _GAME_DATA_DIR
 
+def staging_dir() -> Path:
+    """更新时暂存新数据的目录。验证通过后整体替换游戏数据目录"""
+    return _STAGING_DIR
+
+def backup_dir() -> Path:
+    """替换游戏数据目录时，旧目录被临时移动到此处"""
+    return _BACKUP_DIR
+
 def game_db_path() -> Path:
     return get_game_data_dir() / 'game.db'
 
@@ -13,5 +46,17 @@ def sprites_path(category: str) -> Path:
     """category: 'idol_cards' | 'skill_cards' | 'drinks'"""
     return get_game_data_dir() / category
 
+def descriptors_path(category: str) -> Path:
+    """预先计算的描述符包。category: 'idol_cards' | 'skill_cards' | 'drinks'"""
+    return get_game_data_dir() / 'descriptors' / f'{category}.npz'
+
+def downloads_path() -> Path:
+    """下载中的临时文件所在目录"""
+    return get_game_data_dir() / 'downloads'
+
+def md5_cache_path() -> Path:
+    """本地文件 md5 缓存"""
+    return get_game_data_dir() / 'md5_cache.json'
+
 def version_path() -> Path:
     return get_game_data_dir() / 'version.txt'
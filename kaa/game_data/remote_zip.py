@@ -0,0 +1,189 @@
+"""
+通过 HTTP Range 请求读取远程 zip 中的部分文件。
+
+zip 的目录（central directory）位于文件末尾，记录了每个文件在压缩包中的偏移与大小。
+先读取末尾的目录，再只下载需要的文件对应的字节区间，
+这样更新少量 sprite 时不必下载整个压缩包。
+
+仅支持 stored 与 deflate 两种压缩方式，不支持 zip64 与加密。
+服务器不支持 Range 或压缩包不受支持时抛出 `RemoteZipError`，调用方应回退到完整下载。
+"""
+import zlib
+import struct
+import logging
+import concurrent.futures
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+_EOCD_SIG = b'PK\x05\x06'
+_EOCD = struct.Struct('<4s4H2LH')
+_CD_ENTRY_SIG = b'PK\x01\x02'
+_CD_ENTRY = struct.Struct('<4s6H3L5H2L')
+_LOCAL_SIG = b'PK\x03\x04'
+_LOCAL = struct.Struct('<4s5H3L2H')
+# EOCD 之后最多有 65535 字节的注释
+_TAIL_SIZE = _EOCD.size + 0xFFFF
+
+_STORED = 0
+_DEFLATED = 8
+
+
+class RemoteZipError(Exception):
+    """远程 zip 无法按区间读取"""
+
+
+@dataclass(frozen=True)
+class ZipMember:
+    name: str
+    method: int
+    crc: int
+    compressed_size: int
+    size: int
+    offset: int
+    """本地文件头在压缩包中的偏移"""
+    end: int
+    """本文件数据（含本地文件头）在压缩包中的结束位置（不含）"""
+
+
+class RemoteZip:
+    """
+    远程 zip 文件。
+
+    用法：
+    ```python
+    z = RemoteZip(url, session)
+    members = [m for m in z.members() if m.name.endswith('.png')]
+    for member, data in z.read(members):
+        ...
+    ```
+    """
+    def __init__(self, url: str, session: requests.Session, timeout: float = 30):
+        self.url = url
+        self.session = session
+        self.timeout = timeout
+        self.size: int | None = None
+        """压缩包大小。读取目录后可用。"""
+        self.__members: list[ZipMember] | None = None
+
+    def _get(self, headers_range: str) -> tuple[bytes, int]:
+        """
+        发送 Range 请求。
+
+        :return: `(数据, 文件总大小)`
+        """
+        resp = self.session.get(self.url, headers={'Range': headers_range}, timeout=self.timeout)
+        if resp.status_code != 206:
+            resp.close()
+            raise RemoteZipError(f'Range request not supported (HTTP {resp.status_code}).')
+        content_range = resp.headers.get('content-range', '')
+        try:
+            total = int(content_range.rsplit('/', 1)[1])
+        except (IndexError, ValueError):
+            raise RemoteZipError(f'Invalid Content-Range: {content_range!r}')
+        return resp.content, total
+
+    def _get_range(self, start: int, end: int) -> bytes:
+        """读取 `[start, end)` 区间"""
+        data, _ = self._get(f'bytes={start}-{end - 1}')
+        if len(data) != end - start:
+            raise RemoteZipError(f'Expected {end - start} bytes, got {len(data)}.')
+        return data
+
+    def members(self) -> list[ZipMember]:
+        """读取并解析压缩包的目录。结果会被缓存。"""
+        if self.__members is not None:
+            return self.__members
+        tail, total = self._get(f'bytes=-{_TAIL_SIZE}')
+        self.size = total
+        pos = tail.rfind(_EOCD_SIG)
+        if pos < 0 or len(tail) - pos < _EOCD.size:
+            raise RemoteZipError('End of central directory not found.')
+        _, disk, _, _, count, cd_size, cd_offset, _ = _EOCD.unpack_from(tail, pos)
+        if disk != 0 or count == 0xFFFF or cd_offset == 0xFFFFFFFF:
+            raise RemoteZipError('Multi-disk and zip64 archives are not supported.')
+
+        tail_start = total - len(tail)
+        if cd_offset >= tail_start:
+            cd = tail[cd_offset - tail_start:cd_offset - tail_start + cd_size]
+        else:
+            cd = self._get_range(cd_offset, cd_offset + cd_size)
+
+        entries: list[tuple[str, int, int, int, int, int]] = []
+        pos = 0
+        for _ in range(count):
+            if cd[pos:pos + 4] != _CD_ENTRY_SIG:
+                raise RemoteZipError('Corrupted central directory.')
+            fields = _CD_ENTRY.unpack_from(cd, pos)
+            flags, method, crc, csize, size = fields[3], fields[4], fields[7], fields[8], fields[9]
+            name_len, extra_len, comment_len, offset = fields[10], fields[11], fields[12], fields[16]
+            name_start = pos + _CD_ENTRY.size
+            name = cd[name_start:name_start + name_len].decode('utf-8' if flags & 0x800 else 'cp437')
+            if 0xFFFFFFFF in (csize, size, offset):
+                raise RemoteZipError(f'Zip64 member is not supported: {name}')
+            if flags & 0x1:
+                raise RemoteZipError(f'Encrypted member is not supported: {name}')
+            entries.append((name, method, crc, csize, size, offset))
+            pos = name_start + name_len + extra_len + comment_len
+
+        # 每个文件的数据延续到下一个文件（或目录）开始处，据此得到精确的下载区间
+        boundaries = sorted({e[5] for e in entries} | {cd_offset})
+        next_offset = {b: boundaries[i + 1] for i, b in enumerate(boundaries[:-1])}
+        self.__members = [
+            ZipMember(name, method, crc, csize, size, offset, next_offset[offset])
+            for name, method, crc, csize, size, offset in entries
+        ]
+        logger.debug('Read central directory of %s: %d members, %d bytes.', self.url, count, total)
+        return self.__members
+
+    def read_member(self, member: ZipMember) -> bytes:
+        """下载并解压单个文件"""
+        if member.method not in (_STORED, _DEFLATED):
+            raise RemoteZipError(f'Unsupported compression method {member.method}: {member.name}')
+        raw = self._get_range(member.offset, member.end)
+        if raw[:4] != _LOCAL_SIG:
+            raise RemoteZipError(f'Corrupted local header: {member.name}')
+        fields = _LOCAL.unpack_from(raw)
+        data_start = _LOCAL.size + fields[9] + fields[10]
+        compressed = raw[data_start:data_start + member.compressed_size]
+        if member.method == _DEFLATED:
+            try:
+                data = zlib.decompress(compressed, -zlib.MAX_WBITS)
+            except zlib.error as e:
+                raise RemoteZipError(f'Failed to decompress {member.name}: {e}')
+        else:
+            data = compressed
+        if len(data) != member.size or zlib.crc32(data) != member.crc:
+            raise RemoteZipError(f'CRC mismatch: {member.name}')
+        return data
+
+    def read(
+        self,
+        members: Iterable[ZipMember],
+        max_workers: int = 8,
+        progress_cb: Optional[Callable[[int, int], None]] = None,
+    ) -> Iterator[tuple[ZipMember, bytes]]:
+        """
+        并发下载多个文件，按完成顺序返回。
+
+        :param progress_cb: progress_cb(downloaded_bytes, total_bytes)，按压缩后大小计算。
+        """
+        members = list(members)
+        total = sum(m.end - m.offset for m in members)
+        downloaded = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(self.read_member, m): m for m in members}
+            try:
+                for future in concurrent.futures.as_completed(futures):
+                    member = futures[future]
+                    data = future.result()
+                    downloaded += member.end - member.offset
+                    if progress_cb:
+                        progress_cb(downloaded, total)
+                    yield member, data
+            finally:
+                for future in futures:
+                    future.cancel()
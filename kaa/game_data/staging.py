@@ -0,0 +1,160 @@
+"""
+游戏数据的暂存与整体替换。
+
+更新时不直接修改当前的游戏数据目录，而是：
+
+1. `prepare()`：以硬链接（不支持时复制）在暂存目录中建立当前数据的副本；
+2. 将下载的新文件写入暂存目录；
+3. `validate()`：按 manifest 校验暂存目录中的所有文件；
+4. `commit()`：将当前目录移走，再把暂存目录重命名为游戏数据目录。
+
+因此正在运行的任务只会看到完整的旧数据或完整的新数据。
+替换过程中断时，下次启动后首次调用 `paths.get_game_data_dir()` 会完成或回滚替换。
+
+注意：暂存目录中未修改的文件是指向当前数据的硬链接，
+写入新文件时必须先删除再创建（或写入临时文件后 `os.replace`），不能原地覆盖。
+"""
+import os
+import time
+import shutil
+import sqlite3
+import logging
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+from kaa.errors import GameDataValidationError
+
+from .manifest import FileEntry
+from .md5_cache import Md5Cache
+
+logger = logging.getLogger(__name__)
+
+_SKIP_DIRS = {'downloads'}
+"""不复制到暂存目录的子目录"""
+
+
+class StagedGameData:
+    def __init__(self, live: Path, staging: Path, backup: Path):
+        """
+        :param live: 当前的游戏数据目录。
+        :param staging: 暂存目录。
+        :param backup: 替换时旧目录的临时位置。
+        """
+        self.live = live
+        self.staging = staging
+        self.backup = backup
+
+    def path(self, live_path: Path) -> Path:
+        """将当前数据目录中的路径映射到暂存目录"""
+        return self.staging / live_path.relative_to(self.live)
+
+    def write_text(self, live_path: Path, text: str):
+        """
+        在暂存目录中写入文本文件。
+
+        暂存目录中的文件可能是指向当前数据的硬链接，因此先删除再创建，不能原地覆盖。
+        :param live_path: 当前数据目录中的路径。
+        """
+        path = self.path(live_path)
+        path.unlink(missing_ok=True)
+        path.write_text(text)
+
+    def prepare(self):
+        """清理上次残留的暂存目录，并建立当前数据的副本。"""
+        self.discard()
+        use_link = True
+        linked = copied = 0
+        for root, dirs, files in os.walk(self.live):
+            rel = Path(root).relative_to(self.live)
+            if rel == Path('.'):
+                dirs[:] = [d for d in dirs if d not in _SKIP_DIRS]
+            target_dir = self.staging / rel
+            target_dir.mkdir(parents=True, exist_ok=True)
+            for name in files:
+                src, dst = Path(root) / name, target_dir / name
+                if use_link:
+                    try:
+                        os.link(src, dst)
+                        linked += 1
+                        continue
+                    except OSError as e:
+                        logger.info('Hard links not available, copying instead: %s', e)
+                        use_link = False
+                # copy2 会保留修改时间，md5 缓存仍然有效
+                shutil.copy2(src, dst)
+                copied += 1
+        logger.info('Staging prepared at %s. linked=%d, copied=%d', self.staging, linked, copied)
+
+    def validate(self, files: dict[str, FileEntry], optional: Iterable[str] = ()):
+        """
+        校验暂存目录中的文件。
+
+        :param files: 需要校验的文件，key 为相对于数据目录的路径（即 manifest 中的 key）。
+        :param optional: 可选文件。校验失败时只会被删除，不会导致验证失败。
+        :raises GameDataValidationError: 有文件缺失或 md5 不匹配时。
+        """
+        optional = set(optional)
+        md5_cache = Md5Cache(self.staging / 'md5_cache.json', self.staging)
+        paths = {name: self.staging / name for name in files}
+        hashes = md5_cache.md5_many(paths.values())
+        md5_cache.save()
+        failed: list[str] = []
+        for name, entry in files.items():
+            md5 = hashes[paths[name]]
+            if md5 == entry.md5:
+                continue
+            if name in optional:
+                if md5 is not None:
+                    logger.warning('Discarding stale optional file: %s', name)
+                    paths[name].unlink()
+                continue
+            failed.append(name)
+
+        db_path = self.staging / 'game.db'
+        if 'game.db' in files and 'game.db' not in failed:
+            conn = sqlite3.connect(db_path.resolve().as_uri() + '?mode=ro', uri=True)
+            try:
+                if conn.execute('PRAGMA quick_check;').fetchone()[0] != 'ok':
+                    failed.append('game.db')
+            except sqlite3.Error as e:
+                logger.warning('game.db quick_check failed: %s', e)
+                failed.append('game.db')
+            finally:
+                conn.close()
+
+        if failed:
+            raise GameDataValidationError(failed)
+        logger.info('Staging validated. files=%d, cached=%d', len(paths), md5_cache.hits)
+
+    def commit(self, before_swap: Optional[Callable[[], None]] = None, retries: int = 5):
+        """
+        用暂存目录替换当前的游戏数据目录。
+
+        :param before_swap: 移走当前目录前调用，用于关闭目录中仍然打开的文件。
+            Windows 下目录中有打开的文件时无法重命名，失败后会再次调用并重试。
+        """
+        if self.backup.exists():
+            shutil.rmtree(self.backup)
+        for attempt in range(1, retries + 1):
+            if before_swap:
+                before_swap()
+            try:
+                os.rename(self.live, self.backup)
+                break
+            except PermissionError as e:
+                if attempt == retries:
+                    raise
+                logger.warning('Game data directory is in use, retrying (%d/%d): %s', attempt, retries, e)
+                time.sleep(0.5 * attempt)
+        try:
+            os.rename(self.staging, self.live)
+        except OSError:
+            os.rename(self.backup, self.live)
+            raise
+        shutil.rmtree(self.backup, ignore_errors=True)
+        logger.info('Game data directory swapped.')
+
+    def discard(self):
+        """删除暂存目录"""
+        if self.staging.exists():
+            shutil.rmtree(self.staging)
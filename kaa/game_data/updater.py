@@ -1,14 +1,16 @@
 import concurrent.futures
-import hashlib
+import functools
 import io
 import logging
 import os
+import shutil
+import threading
 import time
 import zipfile
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import TYPE_CHECKING, Callable, Optional
+from typing import TYPE_CHECKING, BinaryIO, Callable, Optional
 
 if TYPE_CHECKING:
     from kaa.config.shared import SharedMiscConfig
@@ -17,17 +19,34 @@ import requests
 import zstandard
 
 from .manifest import parse as parse_manifest
+from .remote_zip import RemoteZip, RemoteZipError
+from .md5_cache import Md5Cache
+from .staging import StagedGameData
+from . import events
 from .paths import (
-    game_db_path, sprites_path, version_path
+    game_db_path, sprites_path, version_path, descriptors_path, downloads_path,
+    md5_cache_path, get_game_data_dir, staging_dir, backup_dir,
 )
 
 logger = logging.getLogger(__name__)
 
 _CATEGORIES = ('idol_cards', 'skill_cards', 'drinks')
 
+_DELTA_MAX_RATIO = 0.5
+"""增量更新需要下载的数据超过整个压缩包的这一比例时，改为下载整个压缩包"""
+
+def _descriptor_asset(category: str) -> str:
+    """
+    预先计算的描述符包在 Release 中的文件名。
+    manifest 中的路径为 `descriptors/<category>.npz`，但 Release 附件不支持目录，因此展平。
+    """
+    return f'descriptors-{category}.npz'
+
 # 不读取系统代理：镜像站本身就是代理，叠加系统代理会导致 SSL 握手失败
 _session = requests.Session()
 _session.trust_env = False
+# 增量更新时会并发发送多个 Range 请求
+_session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=16))
 
 # ── 镜像定义 ──────────────────────────────────────────────────────────────────
 
@@ -112,14 +131,6 @@ def _select_mirror(log_cb: Optional[Callable[[str], None]] = None) -> _Mirror:
 
 # ── 工具函数 ──────────────────────────────────────────────────────────────────
 
-def _md5(path: Path) -> str:
-    h = hashlib.md5()
-    with open(path, 'rb') as f:
-        for chunk in iter(lambda: f.read(65536), b''):
-            h.update(chunk)
-    return h.hexdigest()
-
-
 _RETRYABLE = (
     requests.exceptions.ChunkedEncodingError,
     requests.exceptions.ConnectionError,
@@ -127,18 +138,22 @@ _RETRYABLE = (
 )
 
 
-def _download(
+def _fetch(
     url: str,
+    f: BinaryIO,
     max_retries: int = 5,
     log_cb: Optional[Callable[[str], None]] = None,
     progress_cb: Optional[Callable[[int, int], None]] = None,
-) -> bytes:
-    """下载 URL 内容，支持断点续传和指数退避重试。
+) -> int:
+    """下载 URL 内容并写入 `f`，支持断点续传和指数退避重试。
+
+    `f` 必须可 seek/truncate。中断后以 Range 请求从已写入的位置继续，
+    若服务器不支持续传，则清空 `f` 重新下载。
 
     progress_cb(downloaded_bytes, total_bytes) 在每个 chunk 后调用。
     total_bytes 为完整文件大小（续传时也是全量值，不是剩余量）。
+    :return: 下载的总字节数
     """
-    buf = io.BytesIO()
     downloaded = 0
     size_logged = False
 
@@ -153,7 +168,8 @@ def _download(
             elif resp.status_code == 200:
                 if downloaded > 0:
                     logger.warning("服务器不支持断点续传，重新下载")
-                    buf = io.BytesIO()
+                    f.seek(0)
+                    f.truncate()
                     downloaded = 0
                     size_logged = False
                 resp.raise_for_status()
@@ -168,13 +184,12 @@ def _download(
                 size_logged = True
 
             for chunk in resp.iter_content(chunk_size=65536):
-                buf.write(chunk)
+                f.write(chunk)
                 downloaded += len(chunk)
                 if progress_cb:
                     progress_cb(downloaded, total)
 
-            buf.seek(0)
-            return buf.read()
+            return downloaded
 
         except _RETRYABLE as e:
             if attempt == max_retries:
@@ -188,6 +203,137 @@ def _download(
 
     raise RuntimeError(f"下载失败，已重试 {max_retries} 次")
 
+
+def _download(
+    url: str,
+    max_retries: int = 5,
+    log_cb: Optional[Callable[[str], None]] = None,
+    progress_cb: Optional[Callable[[int, int], None]] = None,
+) -> bytes:
+    """下载 URL 内容到内存。仅用于 manifest 等小文件，大文件请使用 `_download_file`。"""
+    buf = io.BytesIO()
+    _fetch(url, buf, max_retries, log_cb, progress_cb)
+    return buf.getvalue()
+
+
+def _download_file(
+    url: str,
+    dest: Path,
+    max_retries: int = 5,
+    log_cb: Optional[Callable[[str], None]] = None,
+    progress_cb: Optional[Callable[[int, int], None]] = None,
+) -> Path:
+    """
+    下载 URL 内容到文件。内存占用与文件大小无关。
+
+    数据先写入 `<dest>.part`，下载完成后原子地重命名为 `dest`，
+    因此 `dest` 要么不存在，要么是完整的文件。
+    :return: `dest`
+    """
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    part = dest.with_name(dest.name + '.part')
+    try:
+        with open(part, 'wb') as f:
+            _fetch(url, f, max_retries, log_cb, progress_cb)
+        os.replace(part, dest)
+    except BaseException:
+        part.unlink(missing_ok=True)
+        raise
+    return dest
+
+
+def _decompress_zst(src: Path, dest: Path):
+    """流式解压 zstd 文件。先写入 `<dest>.tmp`，完成后原子地替换 `dest`。"""
+    tmp = dest.with_name(dest.name + '.tmp')
+    dctx = zstandard.ZstdDecompressor()
+    try:
+        with open(src, 'rb') as f_in, dctx.stream_reader(f_in) as reader, open(tmp, 'wb') as f_out:
+            shutil.copyfileobj(reader, f_out, 1024 * 1024)
+        os.replace(tmp, dest)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def _open_new(path: Path) -> BinaryIO:
+    """
+    创建并以写入方式打开文件。
+
+    暂存目录中的文件可能是指向当前数据的硬链接，因此先删除再创建，不能原地覆盖。
+    """
+    path.unlink(missing_ok=True)
+    return open(path, 'wb')
+
+
+def _extract_members(zip_path: Path, dest_dir: Path, names: set[str]) -> int:
+    """
+    从 zip 文件中流式解压指定的 png 文件（按文件名匹配，忽略目录）。
+
+    :return: 解压的文件数
+    """
+    count = 0
+    with zipfile.ZipFile(zip_path) as z:
+        for member in z.namelist():
+            fname = os.path.basename(member)
+            if fname and fname.endswith('.png') and fname in names:
+                with z.open(member) as src, _open_new(dest_dir / fname) as dst:
+                    shutil.copyfileobj(src, dst)
+                count += 1
+    return count
+
+def _extract_delta(
+    url: str,
+    dest_dir: Path,
+    names: set[str],
+    progress_cb: Optional[Callable[[int, int], None]] = None,
+) -> bool:
+    """
+    只下载 zip 中指定的 png 文件（按文件名匹配，忽略目录）。
+
+    :return: 是否成功。服务器不支持 Range、需要下载的数据过多或下载失败时返回 False，
+        调用方应回退到下载整个压缩包。
+    """
+    z = RemoteZip(url, _session)
+    try:
+        members = [
+            m for m in z.members()
+            if m.name.endswith('.png') and os.path.basename(m.name) in names
+        ]
+        needed = sum(m.end - m.offset for m in members)
+        assert z.size is not None
+        if needed > z.size * _DELTA_MAX_RATIO:
+            logger.info("增量数据 %.1f KB 超过阈值，下载完整压缩包", needed / 1024)
+            return False
+        logger.info("增量更新 %d 个文件（%.1f KB / %.1f MB）",
+                    len(members), needed / 1024, z.size / 1024 / 1024)
+        for member, data in z.read(members, progress_cb=progress_cb):
+            with _open_new(dest_dir / os.path.basename(member.name)) as f:
+                f.write(data)
+    except (RemoteZipError, requests.RequestException) as e:
+        logger.warning("增量更新失败，下载完整压缩包: %s", e)
+        return False
+    return True
+
+def _run_jobs(jobs: list[tuple[str, Callable[[], None]]], max_workers: int):
+    """
+    并发执行下载任务。
+
+    任一任务失败时，取消尚未开始的任务，等待正在执行的任务结束后抛出第一个异常。
+    :param jobs: `(名称, 任务)` 列表，按顺序提交。
+    """
+    if not jobs:
+        return
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='game-data') as pool:
+        futures = {pool.submit(job): name for name, job in jobs}
+        done, _ = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_EXCEPTION)
+        failed = [f for f in done if f.exception() is not None]
+        if failed:
+            for future in futures:
+                future.cancel()
+            concurrent.futures.wait(futures)
+            logger.error("下载任务失败: %s", futures[failed[0]])
+            raise failed[0].exception()  # type: ignore[misc]
+
 # ── 检查时机 ──────────────────────────────────────────────────────────────────
 
 def should_check(misc: 'SharedMiscConfig') -> bool:
@@ -222,6 +368,13 @@ def should_check(misc: 'SharedMiscConfig') -> bool:
 # ── 更新器 ────────────────────────────────────────────────────────────────────
 
 class GameDataUpdater:
+    def __init__(self, max_parallel_downloads: int = 3):
+        """
+        :param max_parallel_downloads: 同时进行的下载任务数。
+            每个任务包含一个文件的下载与解压，因此解压与其他文件的下载可以重叠。
+        """
+        self.max_parallel_downloads = max_parallel_downloads
+
     def check_and_update(
         self,
         progress_cb: Optional[Callable[[str], None]] = None,
@@ -231,7 +384,8 @@ class GameDataUpdater:
         自动选择最优镜像，检查并更新游戏数据。
 
         file_progress_cb(filename, downloaded_bytes, total_bytes) 在每个下载
-        chunk 后调用，供 UI 层展示实时进度。
+        chunk 后调用，供 UI 层展示实时进度。多个文件会并发下载，
+        但回调不会被同时调用。
         :return: 是否执行了更新
         """
         from kaa.config import manager as config_manager
@@ -241,11 +395,15 @@ class GameDataUpdater:
         def log(msg: str):
             logger.info(msg)
 
+        progress_lock = threading.Lock()
         def make_progress(name: str) -> Optional[Callable[[int, int], None]]:
             cb = file_progress_cb
             if cb is None:
                 return None
-            return lambda dl, total: cb(name, dl, total)
+            def report(dl: int, total: int):
+                with progress_lock:
+                    cb(name, dl, total)
+            return report
 
         # 0. 选择最优镜像（首次调用时并发探测，后续命中缓存）
         mirror = _select_mirror(log_cb=progress_cb)
@@ -277,30 +435,52 @@ class GameDataUpdater:
 
         log("开始更新...")
 
-        # 3. 检查 game.db
+        # 3. 计算本地文件的 md5。大小与修改时间未变的文件直接使用缓存
         db_path = game_db_path()
         db_entry = manifest.files.get('game.db')
+        descriptor_files = manifest.get_category_files('descriptors')
+        to_check: list[Path] = [db_path] if db_entry else []
+        for category in _CATEGORIES:
+            cat_dir = sprites_path(category)
+            cat_dir.mkdir(parents=True, exist_ok=True)
+            to_check.extend(cat_dir / fname for fname in manifest.get_category_files(category))
+            if f'{category}.npz' in descriptor_files:
+                to_check.append(descriptors_path(category))
+        md5_cache = Md5Cache(md5_cache_path(), get_game_data_dir())
+        hashes = md5_cache.md5_many(to_check)
+        md5_cache.save()
+        logger.info("已校验 %d 个文件（%d 个使用缓存）", len(to_check), md5_cache.hits)
+
+        # 3.1 检查 game.db
         needs_db = (
             not db_path.exists() or
-            (db_entry and _md5(db_path) != db_entry.md5)
+            (db_entry and hashes[db_path] != db_entry.md5)
         )
 
         # 4. 检查所有 sprite 分类（先全部算完，再统一通知 UI 预填充）
         category_missing: dict[str, set[str]] = {}
         for category in _CATEGORIES:
             cat_dir = sprites_path(category)
-            cat_dir.mkdir(parents=True, exist_ok=True)
             cat_files = manifest.get_category_files(category)
             missing: set[str] = set()
             for fname, entry in cat_files.items():
-                path = cat_dir / fname
-                if not path.exists():
+                md5 = hashes[cat_dir / fname]
+                if md5 is None:
                     missing.add(fname)
-                elif _md5(path) != entry.md5:
+                elif md5 != entry.md5:
                     logger.warning("文件损坏（md5 不匹配），将重新下载: %s", fname)
                     missing.add(fname)
             category_missing[category] = missing
 
+        # 4.1 检查预先计算的描述符包（可选，manifest 中没有则由本地计算）
+        descriptors_missing: list[str] = []
+        for category in _CATEGORIES:
+            entry = descriptor_files.get(f'{category}.npz')
+            if entry is None:
+                continue
+            if hashes[descriptors_path(category)] != entry.md5:
+                descriptors_missing.append(category)
+
         # 通知 UI 预先展示所有待下载文件（0 进度占位）
         if file_progress_cb:
             if needs_db:
@@ -308,35 +488,97 @@ class GameDataUpdater:
             for category, missing in category_missing.items():
                 if missing:
                     file_progress_cb(f'{category}.zip', 0, 0)
+            for category in descriptors_missing:
+                file_progress_cb(_descriptor_asset(category), 0, 0)
 
-        # 5. 下载 game.db
-        if needs_db:
+        # 5~7. 并发下载 game.db、sprites 与描述符包，写入暂存目录
+        tmp_dir = downloads_path()
+        staged = StagedGameData(get_game_data_dir(), staging_dir(), backup_dir())
+        jobs: list[tuple[str, Callable[[], None]]] = []
+
+        def update_db():
             log("正在下载 game.db.zst ...")
-            zst_bytes = _download(mirror.make_url('game.db.zst'), log_cb=log,
-                                  progress_cb=make_progress('game.db.zst'))
+            zst_path = _download_file(mirror.make_url('game.db.zst'), tmp_dir / 'game.db.zst',
+                                      log_cb=log, progress_cb=make_progress('game.db.zst'))
             log("正在解压 game.db ...")
-            dctx = zstandard.ZstdDecompressor()
-            with open(db_path, 'wb') as f_out:
-                dctx.copy_stream(io.BytesIO(zst_bytes), f_out)
-            log(f"game.db 更新完成（{db_path.stat().st_size // 1024 // 1024} MB）")
+            staged_db = staged.path(db_path)
+            try:
+                _decompress_zst(zst_path, staged_db)
+            finally:
+                zst_path.unlink(missing_ok=True)
+            log(f"game.db 解压完成（{staged_db.stat().st_size // 1024 // 1024} MB）")
+
+        def update_sprites(category: str, missing: set[str]):
+            zip_url = mirror.make_url(f'{category}.zip')
+            cat_dir = staged.path(sprites_path(category))
+            log(f"{category}: 需更新 {len(missing)} 个文件")
+            if _extract_delta(zip_url, cat_dir, missing,
+                              progress_cb=make_progress(f'{category}.zip')):
+                log(f"{category}: 增量更新完成")
+                return
+            log(f"{category}: 正在下载 {category}.zip ...")
+            zip_path = _download_file(zip_url, tmp_dir / f'{category}.zip',
+                                      log_cb=log, progress_cb=make_progress(f'{category}.zip'))
+            try:
+                _extract_members(zip_path, cat_dir, missing)
+            finally:
+                zip_path.unlink(missing_ok=True)
+            log(f"{category}: 解压完成")
 
-        # 6. 下载 sprites
+        # 失败不影响更新，图像数据库会在本地计算特征
+        def update_descriptors(category: str):
+            asset = _descriptor_asset(category)
+            log(f"{category}: 正在下载描述符包 {asset} ...")
+            try:
+                _download_file(mirror.make_url(asset), staged.path(descriptors_path(category)),
+                               log_cb=log, progress_cb=make_progress(asset))
+            except Exception as e:
+                logger.warning("描述符包下载失败，将在本地计算: %s", e)
+                return
+            log(f"{category}: 描述符包下载完成")
+
+        # game.db 最大，最先开始
+        if needs_db:
+            jobs.append(('game.db.zst', update_db))
         for category, missing in category_missing.items():
             if not missing:
                 log(f"{category}: 无需更新")
                 continue
-            log(f"{category}: 需更新 {len(missing)} 个文件，正在下载 {category}.zip ...")
-            zip_bytes = _download(mirror.make_url(f'{category}.zip'), log_cb=log,
-                                  progress_cb=make_progress(f'{category}.zip'))
-            cat_dir = sprites_path(category)
-            with zipfile.ZipFile(io.BytesIO(zip_bytes)) as z:
-                for member in z.namelist():
-                    fname = os.path.basename(member)
-                    if fname and fname.endswith('.png') and fname in missing:
-                        (cat_dir / fname).write_bytes(z.read(member))
-            log(f"{category}: 解压完成")
+            jobs.append((f'{category}.zip', functools.partial(update_sprites, category, missing)))
+        for category in descriptors_missing:
+            jobs.append((_descriptor_asset(category), functools.partial(update_descriptors, category)))
+
+        if not jobs:
+            ver_file.write_text(manifest.version)
+            log("游戏数据已是最新版本")
+            return True
 
-        # 5. 写入版本号
-        ver_file.write_text(manifest.version)
+        staged.prepare()
+        try:
+            _run_jobs(jobs, self.max_parallel_downloads)
+            staged.write_text(ver_file, manifest.version)
+
+            # 8. 验证暂存的数据，然后整体替换
+            log("正在验证游戏数据...")
+            to_validate = {
+                name: entry for name, entry in manifest.files.items()
+                if name == 'game.db' or name.split('/', 1)[0] in _CATEGORIES
+            }
+            optional = set()
+            for category in _CATEGORIES:
+                entry = descriptor_files.get(f'{category}.npz')
+                if entry is not None:
+                    to_validate[f'descriptors/{category}.npz'] = entry
+                    optional.add(f'descriptors/{category}.npz')
+            staged.validate(to_validate, optional)
+            # Windows 下打开的连接会阻止移走目录。正在查询的连接不会被关闭，commit 会稍后重试
+            from kaa.db.sqlite import manager as db_manager
+            staged.commit(before_swap=db_manager().release_idle)
+        except BaseException:
+            staged.discard()
+            raise
+
+        # 9. 通知依赖游戏数据的缓存重新加载
+        events.publish_changed()
         log("游戏数据更新完成")
         return True
@@ -1,6 +1,6 @@
 from .toolbar import toolbar_home, toolbar_menu
 from .commu_event_buttons import CommuEventButtonUI, web2cv, DEFAULT_COLORS
 from .common import WhiteFilter
-from .scrollable import Scrollable, ScrollableIterator
+from .scrollable import Scrollable, ScrollableIterator, ScrollScanner
 from . import dialog
 from . import badge
\ No newline at end of file
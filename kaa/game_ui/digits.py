@@ -0,0 +1,333 @@
+"""
+基于字形模板的数字识别。
+
+游戏中的数值使用少数几种固定字体绘制，因此可以将每个字符切分出来，
+与预先从截图中提取的字形模板逐个比较，而不必调用 OCR 模型。
+识别置信度不足时，再回退到 OCR。
+
+字形模板保存在 `kaa/resources/glyphs/<字体名>/` 下，
+由 `tools/make_glyphs.py` 从 kotonebot-resource 中的截图生成。
+"""
+import os
+import re
+import json
+import logging
+from dataclasses import dataclass
+from functools import cache
+from typing import Callable, NamedTuple
+
+import cv2
+import numpy as np
+from cv2.typing import MatLike
+
+from kaa.util import paths
+
+logger = logging.getLogger(__name__)
+
+GLYPH_HEIGHT = 24
+"""字形归一化后的高度"""
+GLYPH_WIDTH = 32
+"""字形归一化后的宽度。字形按高度缩放后居中放置，保留宽高比信息。"""
+DEFAULT_MIN_CONFIDENCE = 0.85
+"""默认的最低置信度。任意一个字符低于此值时，整体视为识别失败。"""
+
+_META_FILE = 'font.json'
+"""字形文件夹中保存字体参数的文件"""
+_CHAR_NAMES = {'/': 'slash', ',': 'comma', ':': 'colon', '+': 'plus'}
+"""不能直接作为文件名的字符"""
+_NAME_CHARS = {v: k for k, v in _CHAR_NAMES.items()}
+
+
+def binarize(img: MatLike, threshold: int) -> np.ndarray:
+    """将图像二值化，亮度大于 `threshold` 的像素视为文字。"""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    _, bw = cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY)
+    return bw
+
+
+class Segmentation(NamedTuple):
+    glyphs: list[np.ndarray]
+    """每个字符的二值图像，按从左到右的顺序排列"""
+    clipped: bool
+    """是否有连通区域与左右边缘相接。此时可能有字符被裁切掉了一部分，识别结果不可靠"""
+
+
+def segment(bw: np.ndarray, *, min_height_ratio: float = 0.6) -> Segmentation:
+    """
+    从二值图像中切分出各个字符。
+
+    * 与上下边缘相接的连通区域视为背景，会被忽略；
+    * 与左右边缘相接的连通区域会被忽略，并标记为 `clipped`；
+    * 水平方向大幅重叠的连通区域视为同一字符（字形上的高光可能将一个字符分成几块）；
+    * 高度小于最高字符 `min_height_ratio` 倍的区域视为噪点，会被忽略。
+
+    :param bw: 二值图像，文字为白色。
+    """
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(bw, connectivity=8)
+    h, w_img = bw.shape[:2]
+    clipped = False
+    # [x1, y1, x2, y2, [label, ...]]
+    groups: list[list] = []
+    for i in sorted(range(1, count), key=lambda i: stats[i][0]):
+        x, y, w, ch, area = stats[i]
+        if y == 0 or y + ch >= h or area < 4:
+            continue
+        if x == 0 or x + w >= w_img:
+            clipped = True
+            continue
+        if groups:
+            last = groups[-1]
+            overlap = min(last[2], x + w) - max(last[0], x)
+            if overlap >= 0.5 * min(last[2] - last[0], w):
+                last[0], last[1] = min(last[0], x), min(last[1], y)
+                last[2], last[3] = max(last[2], x + w), max(last[3], y + ch)
+                last[4].append(i)
+                continue
+        groups.append([x, y, x + w, y + ch, [i]])
+    if not groups:
+        return Segmentation([], clipped)
+    max_height = max(g[3] - g[1] for g in groups)
+    glyphs = []
+    for x1, y1, x2, y2, members in groups:
+        if y2 - y1 < max_height * min_height_ratio or y2 - y1 < 3:
+            continue
+        glyph = np.isin(labels[y1:y2, x1:x2], members).astype(np.uint8) * 255
+        glyphs.append(glyph)
+    return Segmentation(glyphs, clipped)
+
+
+def segment_glyphs(bw: np.ndarray, *, min_height_ratio: float = 0.6) -> list[np.ndarray]:
+    """
+    从二值图像中切分出各个字符，按从左到右的顺序返回。见 `segment`。
+
+    :param bw: 二值图像，文字为白色。
+    :return: 每个字符的二值图像。
+    """
+    return segment(bw, min_height_ratio=min_height_ratio).glyphs
+
+
+def normalize_glyph(glyph: np.ndarray) -> np.ndarray:
+    """将字符缩放到固定高度，并居中放置在固定大小的画布上。"""
+    h, w = glyph.shape[:2]
+    new_w = min(GLYPH_WIDTH, max(1, round(w * GLYPH_HEIGHT / h)))
+    resized = cv2.resize(glyph, (new_w, GLYPH_HEIGHT), interpolation=cv2.INTER_AREA)
+    canvas = np.zeros((GLYPH_HEIGHT, GLYPH_WIDTH), dtype=np.float32)
+    x = (GLYPH_WIDTH - new_w) // 2
+    canvas[:, x:x+new_w] = resized
+    return canvas
+
+
+def _correlations(matrix: np.ndarray, glyph: np.ndarray) -> np.ndarray:
+    """计算 glyph 与 matrix 每一行的皮尔逊相关系数。matrix 的每一行需已中心化并归一化。"""
+    v = glyph.ravel() - glyph.mean()
+    norm = np.linalg.norm(v)
+    if norm == 0:
+        return np.zeros(matrix.shape[0], dtype=np.float32)
+    return matrix @ (v / norm)
+
+
+class GlyphSet:
+    """一种字体的字形模板集合。同一字符可以有多个模板。"""
+    def __init__(self, name: str, threshold: int = 200):
+        """
+        :param name: 字体名称。
+        :param threshold: 二值化阈值。
+        """
+        self.name = name
+        self.threshold = threshold
+        self.labels: list[str] = []
+        self.glyphs: list[np.ndarray] = []
+        """归一化后的字形"""
+        self.__matrix: np.ndarray | None = None
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @property
+    def chars(self) -> set[str]:
+        return set(self.labels)
+
+    def add(self, label: str, glyph: np.ndarray):
+        """
+        添加字形。
+
+        :param label: 字符。
+        :param glyph: 由 `segment_glyphs` 切分出的字符图像。
+        """
+        if len(label) != 1:
+            raise ValueError(f'Glyph label must be a single character, got "{label}".')
+        self.labels.append(label)
+        self.glyphs.append(normalize_glyph(glyph))
+        self.__matrix = None
+
+    def add_sample(self, img: MatLike, text: str) -> bool:
+        """
+        从一张已知内容的图像中提取字形。
+
+        :param img: 图像。
+        :param text: 图像中的文字，不包括空白。
+        :return: 若有字符被裁切，或切分出的字符数量与文字长度不一致，返回 False，且不添加任何字形。
+        """
+        seg = segment(binarize(img, self.threshold))
+        if seg.clipped or len(seg.glyphs) != len(text):
+            return False
+        for label, glyph in zip(text, seg.glyphs):
+            self.add(label, glyph)
+        return True
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """所有字形中心化并归一化后堆叠而成的矩阵，形状为 (N, H*W)"""
+        if self.__matrix is None:
+            if not self.glyphs:
+                self.__matrix = np.empty((0, GLYPH_HEIGHT * GLYPH_WIDTH), dtype=np.float32)
+            else:
+                m = np.stack([g.ravel() for g in self.glyphs]).astype(np.float32)
+                m -= m.mean(axis=1, keepdims=True)
+                norms = np.linalg.norm(m, axis=1, keepdims=True)
+                norms[norms == 0] = 1
+                self.__matrix = m / norms
+        return self.__matrix
+
+    def classify(self, glyph: np.ndarray) -> tuple[str, float]:
+        """
+        识别单个字符。
+
+        :param glyph: 由 `segment_glyphs` 切分出的字符图像。
+        :return: `(字符, 相关系数)`。字形集为空时返回 `('', 0)`。
+        """
+        if len(self.labels) == 0:
+            return '', 0.0
+        scores = _correlations(self.matrix, normalize_glyph(glyph))
+        best = int(np.argmax(scores))
+        return self.labels[best], float(scores[best])
+
+    def save(self, path: str):
+        """
+        将字形保存为 PNG 文件，文件名为 `<字符>_<序号>.png`。
+        字体参数保存在同一文件夹下的 `font.json` 中。
+        """
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, _META_FILE), 'w', encoding='utf-8') as f:
+            json.dump({'threshold': self.threshold}, f)
+        counters: dict[str, int] = {}
+        for label, glyph in zip(self.labels, self.glyphs):
+            name = _CHAR_NAMES.get(label, label)
+            index = counters.get(name, 0)
+            counters[name] = index + 1
+            cv2.imwrite(os.path.join(path, f'{name}_{index}.png'), np.clip(glyph, 0, 255).astype(np.uint8))
+
+    @staticmethod
+    def load(path: str, name: str | None = None) -> 'GlyphSet':
+        """
+        从文件夹中读取字形。
+
+        :param path: 字形文件夹。
+        :param name: 字体名称。默认为文件夹名。
+        """
+        name = name or os.path.basename(os.path.normpath(path))
+        if not os.path.isdir(path):
+            logger.warning('Glyph folder %s does not exist.', path)
+            return GlyphSet(name)
+        meta = {}
+        meta_path = os.path.join(path, _META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        glyph_set = GlyphSet(name, meta.get('threshold', 200))
+        for file in sorted(os.listdir(path)):
+            if not file.endswith('.png'):
+                continue
+            label = file.rsplit('_', 1)[0]
+            label = _NAME_CHARS.get(label, label)
+            img = cv2.imread(os.path.join(path, file), cv2.IMREAD_GRAYSCALE)
+            if img is None or len(label) != 1:
+                logger.warning('Invalid glyph file: %s', file)
+                continue
+            # 已经是归一化后的字形，直接使用
+            glyph_set.labels.append(label)
+            glyph_set.glyphs.append(img.astype(np.float32))
+        logger.debug('Loaded %d glyphs for font "%s".', len(glyph_set), glyph_set.name)
+        return glyph_set
+
+
+@dataclass
+class DigitReadResult:
+    text: str
+    """识别出的文字"""
+    confidence: float
+    """置信度，为所有字符中最低的相关系数。有字符可能被裁切时为 0"""
+    fallback: bool = False
+    """是否使用了 OCR 回退"""
+
+    @property
+    def numbers(self) -> list[int]:
+        return [int(n) for n in re.findall(r'\d+', self.text)]
+
+
+OcrFallback = Callable[[MatLike], str | None]
+"""OCR 回退函数。输入图像，返回识别出的文字。"""
+
+
+class DigitReader:
+    """
+    基于字形模板的数字读取器。
+
+    用法：
+    ```python
+    reader = DigitReader(glyph_set('outlined'), fallback=lambda img: ocr.raw().ocr(img).squash().text)
+    value = reader.read_int(img)
+    ```
+    """
+    def __init__(
+        self,
+        glyphs: GlyphSet,
+        *,
+        min_confidence: float = DEFAULT_MIN_CONFIDENCE,
+        fallback: OcrFallback | None = None,
+    ):
+        """
+        :param glyphs: 字形集。
+        :param min_confidence: 最低置信度。
+        :param fallback: 置信度不足时使用的 OCR 函数。为 None 时不回退。
+        """
+        self.glyphs = glyphs
+        self.min_confidence = min_confidence
+        self.fallback = fallback
+
+    def recognize(self, img: MatLike) -> DigitReadResult:
+        """仅使用字形模板识别，不回退。"""
+        seg = segment(binarize(img, self.glyphs.threshold))
+        if not seg.glyphs:
+            return DigitReadResult('', 0.0)
+        text = []
+        # 被裁切的字符不会出现在结果中，其余字符即使匹配良好，整体也不可信
+        confidence = 0.0 if seg.clipped else 1.0
+        for glyph in seg.glyphs:
+            label, score = self.glyphs.classify(glyph)
+            text.append(label)
+            confidence = min(confidence, score)
+        return DigitReadResult(''.join(text), confidence)
+
+    def read(self, img: MatLike) -> DigitReadResult:
+        """识别图像中的文字。置信度不足时回退到 OCR。"""
+        result = self.recognize(img)
+        if result.confidence >= self.min_confidence or self.fallback is None:
+            return result
+        logger.debug(
+            'Glyph match confidence too low (font=%s, text=%s, confidence=%.3f). Falling back to OCR.',
+            self.glyphs.name, result.text, result.confidence
+        )
+        text = self.fallback(img)
+        return DigitReadResult(text or '', result.confidence, fallback=True)
+
+    def read_int(self, img: MatLike) -> int | None:
+        """读取图像中的第一个整数。"""
+        numbers = self.read(img).numbers
+        return numbers[0] if numbers else None
+
+
+@cache
+def glyph_set(font: str) -> GlyphSet:
+    """读取随程序发布的字形集"""
+    return GlyphSet.load(paths.glyphs(font), font)
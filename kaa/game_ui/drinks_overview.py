@@ -9,11 +9,27 @@ from kotonebot.primitives import RectTuple
 
 from kaa.tasks import R
 from kaa.util import paths
+from kaa.game_data import events as game_data_events
 from kaa.db.drink import Drink
-from kaa.image_db import ImageDatabase, HistDescriptor, FileDataSource
+from kaa.image_db import ImageDatabase, FastHistDescriptor, FileDataSource, DatabaseQueryResult
 
 logger = logging.getLogger(__name__)
 _db: ImageDatabase | None = None
+_db_generation: int | None = None
+"""`_db` 载入时的游戏数据版本号"""
+
+DRINK_DELTA_THRESHOLD = 0.7
+"""默认的饮品距离差值阈值，见 `match_first_drinks`"""
+
+_BLUE_THRESHOLD = 255
+_FLOOD_BLUE_THRESHOLD = 240
+_FLOOD_COLOR_THRESHOLD = 230
+
+def _whiten_blue(img: MatLike) -> MatLike:
+    """把 b==255 的像素修正为纯白，返回新图像"""
+    img = img.copy()
+    img[img[:, :, 0] >= _BLUE_THRESHOLD] = 255
+    return img
 
 def preprocess_drink_slot_img(img: MatLike) -> MatLike:
     """预处理饮品图像，使得图像识别结果更正确
@@ -21,22 +37,41 @@ def preprocess_drink_slot_img(img: MatLike) -> MatLike:
     :param img: 输入的饮品槽图像，大小 68x68 (BGR)
     :return: 处理后的图像，大小 68x68，其中会出现更大量的纯白色，便于识别
     """
-    BLUE_THRESHOLD = 255
-    FLOOD_BLUE_THRESHOLD = 240
-    FLOOD_COLOR_THRESHOLD = 230
-
     assert img.shape[2] == 3
     h, w, _ = img.shape
 
-    # 分通道
-    b, g, r = cv2.split(img)
-
     # 把 b==255 的像素修正为纯白
-    mask = (b >= BLUE_THRESHOLD)
-    g[mask] = 255
-    b[mask] = 255
-    r[mask] = 255
-    img = cv2.merge([b, g, r])
+    img = _whiten_blue(img)
+
+    # 可被染白的像素：非近白色、非高蓝色
+    eligible = ~(
+        np.all(img >= _FLOOD_COLOR_THRESHOLD, axis=2)
+        | (img[:, :, 0] >= _FLOOD_BLUE_THRESHOLD)
+    )
+    # 右上角禁止传播，因为一些饮料的管子会插到圈圈外面，导致白色泄露
+    ys, xs = np.ogrid[:h, :w]
+    eligible &= ~((xs > w / 2) & (ys < h / 4))
+
+    # 边缘像素本身总会被染白，并向相邻的可染白像素传播。
+    # 因此与边缘或次边缘相接的可染白连通区域都会被染白。
+    _, labels = cv2.connectedComponents(eligible.astype(np.uint8), connectivity=4)
+    near_edge = np.zeros((h, w), dtype=bool)
+    near_edge[:2, :] = near_edge[-2:, :] = True
+    near_edge[:, :2] = near_edge[:, -2:] = True
+    seeds = np.unique(labels[near_edge & eligible])
+    flood = np.isin(labels, seeds) & eligible
+
+    flood[0, :] = flood[-1, :] = True
+    flood[:, 0] = flood[:, -1] = True
+    img[flood] = 255
+    return img
+
+def _preprocess_drink_slot_img_bfs(img: MatLike) -> MatLike:
+    """`preprocess_drink_slot_img` 的逐像素 BFS 参考实现，仅用于测试与性能对比。"""
+    assert img.shape[2] == 3
+    h, w, _ = img.shape
+
+    img = _whiten_blue(img)
 
     # BFS 把边缘连通区域染成纯白
     visited = np.zeros((h, w), dtype=bool)
@@ -68,21 +103,27 @@ def preprocess_drink_slot_img(img: MatLike) -> MatLike:
         # 四邻域扩展
         for dy, dx in [(-1,0), (1,0), (0,-1), (0,1)]:
             ny, nx = y + dy, x + dx
-            if 0 <= nx < w and 0 <= ny < h and not (nx > right_top_x and ny < right_top_y) and not visited[ny, nx] and not np.all(img[ny, nx] >= FLOOD_COLOR_THRESHOLD) and not (img[ny, nx][0] >= FLOOD_BLUE_THRESHOLD):
+            if 0 <= nx < w and 0 <= ny < h and not (nx > right_top_x and ny < right_top_y) and not visited[ny, nx] and not np.all(img[ny, nx] >= _FLOOD_COLOR_THRESHOLD) and not (img[ny, nx][0] >= _FLOOD_BLUE_THRESHOLD):
                 q.append((ny, nx))
 
     return img
 
 def drinks_db() -> ImageDatabase:
-    global _db
-    if _db is None:
+    global _db, _db_generation
+    # 游戏数据被替换后重新载入。数据库会与新的图片增量同步
+    generation = game_data_events.generation()
+    if _db is None or _db_generation != generation:
         logger.info('Loading drinks database...')
+        # 先释放旧实例，使其映射的旧矩阵文件在新实例保存后可以被删除
+        _db = None
         path = paths.resource('drinks')
-        db_path = paths.cache('drinks.pkl')
-        _db = ImageDatabase(FileDataSource(str(path)), db_path, HistDescriptor(8), name='drinks')
+        db_path = paths.cache('drinks.npy')
+        bundle_path = paths.descriptors('drinks')
+        _db = ImageDatabase(FileDataSource(str(path)), db_path, FastHistDescriptor(8), name='drinks', bundle_path=bundle_path)
+        _db_generation = generation
     return _db
 
-def match_first_drinks(img: MatLike, delta_threshold: float = 0.7) -> Drink | None:
+def match_first_drinks(img: MatLike, delta_threshold: float = DRINK_DELTA_THRESHOLD) -> Drink | None:
     """
     将给定图像与所有饮品 进行匹配，并返回最接近的一个饮品
 
@@ -99,7 +140,16 @@ def match_first_drinks(img: MatLike, delta_threshold: float = 0.7) -> Drink | No
     # cv2.destroyAllWindows()
     
     db = drinks_db()
-    matches = db.match_all(img, threshold=114514)
+    matches = db.match_topk(img, 3)
+    return _resolve_drink(matches, delta_threshold)
+
+def _resolve_drink(matches: list[DatabaseQueryResult], delta_threshold: float) -> Drink | None:
+    """
+    根据前 1~3 个数据库查询结果确定饮品。
+
+    :param matches: 按距离升序排列的查询结果。
+    :param delta_threshold: 见 `match_first_drinks`。
+    """
     if len(matches) == 0:
         return None
 
@@ -112,7 +162,6 @@ def match_first_drinks(img: MatLike, delta_threshold: float = 0.7) -> Drink | No
         logger.info("Only 1 drink match result: %s", str(drink.name))
         return drink
     
-    matches = matches[:3]
     matches_distance = [round(m.distance, 2) for m in matches]
 
     if matches[1].distance - matches[0].distance <= delta_threshold:
@@ -149,11 +198,15 @@ def locate_all_drinks_in_3_drink_slots(img: MatLike) -> list[tuple[Drink, RectTu
 
     results = list[tuple[Drink, RectTuple]]()
 
+    slots = []
     for rect in potential_rects:
         x, y, w, h = rect
-        img_slot = img[y:y+h, x:x+w]
+        slots.append(preprocess_drink_slot_img(img[y:y+h, x:x+w]))
 
-        drink = match_first_drinks(img_slot)
+    # 3 个饮品槽一次性批量查询
+    batch = drinks_db().match_batch(slots, k=3)
+    for rect, matches in zip(potential_rects, batch):
+        drink = _resolve_drink(matches, DRINK_DELTA_THRESHOLD)
 
         if drink is not None:
             results.append((drink, rect))
@@ -0,0 +1,141 @@
+"""
+帧级查找结果缓存。
+
+同一轮循环中，多个函数往往会在同一张截图上查找同一个 Prefab，
+每次都会重新进行一次模板匹配。本模块以 (帧, Prefab, 搜索区域) 为键缓存查找结果，
+截图更新（`vars.screenshot_data` 变为另一张图像）后自动失效。
+
+注意：Prefab 的查找总是作用于上下文中的当前截图，
+因此缓存只适用于手动截图模式（`screenshot_mode='manual'`）。
+"""
+import logging
+from typing import Any, Callable, Hashable, TypeVar
+
+from cv2.typing import MatLike
+from kotonebot.primitives import Rect
+from kotonebot.core import GameObject, Prefab, TemplateMatchPrefab
+from kotonebot.backend.context.context import vars
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+_MISSING = object()
+
+
+class FrameCache:
+    """
+    帧级查找结果缓存。
+
+    用法：
+    ```python
+    device.screenshot()
+    if frame_cache().exists(R.Common.ButtonConfirm):
+        ...
+    frame_cache().try_click(R.Common.ButtonConfirm)  # 不会再次匹配
+    ```
+    """
+    def __init__(self, current_frame: Callable[[], MatLike | None] | None = None):
+        """
+        :param current_frame: 返回当前截图的函数。默认为上下文中的 `vars.screenshot_data`。
+        """
+        self.__current_frame = current_frame or (lambda: vars.screenshot_data)
+        self.__frame: MatLike | None = None
+        self.__results: dict[Hashable, Any] = {}
+        self.frame_id: int = 0
+        """当前帧的编号。每出现一张新截图递增。"""
+        self.hits: int = 0
+        """缓存命中次数"""
+        self.misses: int = 0
+        """缓存未命中次数"""
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def reset_stats(self):
+        """清零命中计数。"""
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self):
+        """立即使缓存失效。"""
+        self.__frame = None
+        self.__results.clear()
+
+    def __sync(self) -> MatLike | None:
+        """检查上下文中的截图是否已更新，若已更新则清空缓存。返回当前截图。"""
+        current = self.__current_frame()
+        if current is not self.__frame:
+            if self.__frame is not None and self.__results:
+                logger.debug(
+                    'Frame %d done. cached=%d, hits=%d, misses=%d',
+                    self.frame_id, len(self.__results), self.hits, self.misses
+                )
+            self.__frame = current
+            self.__results.clear()
+            self.frame_id += 1
+        return current
+
+    def __get(self, key: Hashable, func: Callable[[], T]) -> T:
+        if self.__sync() is None:
+            # 尚未截图，无法缓存
+            return func()
+        value = self.__results.get(key, _MISSING)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = func()
+        # 自动截图模式下，查找过程中可能截取了新图像，此时结果属于新的一帧
+        self.__sync()
+        self.__results[key] = value
+        return value
+
+    def memo(self, key: Hashable, func: Callable[[], T], *, image: MatLike | None = None) -> T:
+        """
+        缓存任意计算结果。
+
+        :param key: 缓存键，需要在同一帧内唯一。
+        :param func: 计算函数。
+        :param image: 计算所用的图像。若指定且不是当前截图，则不使用缓存。
+        """
+        if image is not None and image is not self.__current_frame():
+            return func()
+        return self.__get(('memo', key), func)
+
+    def find(self, prefab: type[Prefab], *, region: Rect | None = None) -> GameObject | None:
+        """
+        在当前截图中查找 Prefab。同一帧内相同的查找只会执行一次。
+
+        :param prefab: 要查找的 Prefab。
+        :param region: 搜索区域。仅对 `TemplateMatchPrefab` 有效，覆盖其默认区域。
+        """
+        if region is not None and not (isinstance(prefab, type) and issubclass(prefab, TemplateMatchPrefab)):
+            raise TypeError(f'Region is only supported for TemplateMatchPrefab, got {prefab.__name__}.')
+        roi = None if region is None else region.xywh
+        def _find():
+            if region is None:
+                return prefab.find()
+            return prefab.q(region=region).find()  # type: ignore[attr-defined]
+        return self.__get((prefab, roi), _find)
+
+    def exists(self, prefab: type[Prefab], *, region: Rect | None = None) -> bool:
+        """判断 Prefab 是否存在于当前截图中。见 `find`。"""
+        return self.find(prefab, region=region) is not None
+
+    def try_click(self, prefab: type[Prefab], *, region: Rect | None = None) -> bool:
+        """若 Prefab 存在于当前截图中则点击。见 `find`。"""
+        obj = self.find(prefab, region=region)
+        if obj is None:
+            return False
+        obj.click()
+        return True
+
+
+_cache = FrameCache()
+
+
+def frame_cache() -> FrameCache:
+    """返回全局的帧级查找结果缓存"""
+    return _cache
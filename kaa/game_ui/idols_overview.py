@@ -7,20 +7,24 @@ from cv2.typing import MatLike
 
 from kaa.tasks import R
 from kaa.util import paths
+from kaa.game_data import events as game_data_events
 from kotonebot.primitives import RectTuple, Rect
-from kaa.game_ui import Scrollable
+from kaa.game_ui import Scrollable, ScrollScanner
 from kotonebot import device, action
 from kotonebot.util import cv2_imread
-from kaa.image_db import ImageDatabase, HistDescriptor, FileDataSource, DatabaseQueryResult
+from kaa.image_db import ImageDatabase, FastHistDescriptor, FileDataSource, DatabaseQueryResult
 from kotonebot.backend.preprocessor import HsvColorsRemover
 
 logger = logging.getLogger(__name__)
 _db: ImageDatabase | None = None
+_db_generation: int | None = None
+"""`_db` 载入时的游戏数据版本号"""
 
 # OpenCV HSV 颜色范围
 RED_DOT = ((157, 205, 255), (179, 255, 255)) # 红点
 ORANGE_SELECT_BORDER = ((9, 50, 106), (19, 255, 255)) # 当前选中的偶像的橙色边框
 WHITE_BACKGROUND = ((0, 0, 234), (179, 40, 255)) # 白色背景
+IDOL_TILE_MARGIN = 220 # 增量扫描时，新区域向上扩展的高度。需不小于一张偶像卡的高度（约 190px）
 
 def extract_idols(img: MatLike) -> list[RectTuple]:
     """
@@ -99,12 +103,18 @@ def draw_idol_preview(img: MatLike, rects: list[RectTuple], db: ImageDatabase, i
     return preview_img
 
 def idols_db() -> ImageDatabase:
-    global _db
-    if _db is None:
+    global _db, _db_generation
+    # 游戏数据被替换后重新载入。数据库会与新的图片增量同步
+    generation = game_data_events.generation()
+    if _db is None or _db_generation != generation:
         logger.info('Loading idols database...')
+        # 先释放旧实例，使其映射的旧矩阵文件在新实例保存后可以被删除
+        _db = None
         path = paths.resource('idol_cards')
-        db_path = paths.cache('idols.pkl')
-        _db = ImageDatabase(FileDataSource(str(path)), db_path, HistDescriptor(8), name='idols')
+        db_path = paths.cache('idols.npy')
+        bundle_path = paths.descriptors('idol_cards')
+        _db = ImageDatabase(FileDataSource(str(path)), db_path, FastHistDescriptor(8), name='idols', bundle_path=bundle_path)
+        _db_generation = generation
     return _db
 
 def match_idol(skin_id: str, idol_img: MatLike) -> DatabaseQueryResult | None:
@@ -115,12 +125,7 @@ def match_idol(skin_id: str, idol_img: MatLike) -> DatabaseQueryResult | None:
     :param idol_img: 待匹配偶像图像。
     :return: 若匹配成功，则返回匹配结果，否则返回 None。
     """
-    db = idols_db()
-    match = db.match(idol_img, 20)
-    if match and match.key.startswith(skin_id):
-        return match
-    else:
-        return None
+    return idols_db().match_prefix(idol_img, skin_id, 20)
 
 @action('定位偶像', screenshot_mode='manual-inherit')
 def locate_idol(skin_id: str) -> Rect | None:
@@ -135,9 +140,8 @@ def locate_idol(skin_id: str) -> Rect | None:
     """
     device.screenshot()
     logger.info('Locating idol %s', skin_id)
-    x, y, w, h = R.Produce.BoxIdolOverviewIdols.xywh
-    db = idols_db()
     sc = Scrollable(color_schema='light')
+    scanner = ScrollScanner(R.Produce.BoxIdolOverviewIdols)
 
     sc.update()
     logger.debug('Idol preview pages count: %s', repr(sc.page_count))
@@ -153,23 +157,29 @@ def locate_idol(skin_id: str) -> Rect | None:
     # 一次只翻 0.8 行。
     for _ in iterator:
         img = device.screenshot()
-        # 只保留 BoxIdolOverviewIdols 区域
+        # 只处理上一页中没有完整显示的区域
+        region = scanner.feed(img, margin=IDOL_TILE_MARGIN)
+        if region is None:
+            logger.debug('Idol list did not move.')
+            continue
+        # 只保留 BoxIdolOverviewIdols 中需要处理的区域
+        rx1, ry1, rx2, ry2 = region.x1, region.y1, region.x2, region.y2
         mask = np.zeros_like(img)
-        mask[y:y+h, x:x+w] = img[y:y+h, x:x+w]
+        mask[ry1:ry2, rx1:rx2] = img[ry1:ry2, rx1:rx2]
         img = mask
         # 检测 & 查询
-        rects = extract_idols(img)
+        rects = [rect for rect in extract_idols(img) if scanner.is_new(rect)]
         # cv2.imshow('Detected Idols', cv2.resize(display_rects(img, rects), (0, 0), fx=0.5, fy=0.5))
         # cv2.imshow('Idols Preview', cv2.resize(draw_idol_preview(img, rects, db, paths.resource('idol_cards')), (0, 0), fx=0.5, fy=0.5))
         # cv2.waitKey(0)
         for rect in rects:
             rx, ry, rw, rh = rect
             idol_img = img[ry:ry+rh, rx:rx+rw]
-            match = db.match(idol_img, 20)
-            logger.debug('Result rect: %s, match: %s', repr(rect), repr(match))
             # Key 格式：{skin_id}_{index}
             # 同一张卡升级前后图片不一样，index 分别为 0 和 1
-            if match and match.key.startswith(skin_id):
+            match = match_idol(skin_id, idol_img)
+            logger.debug('Result rect: %s, match: %s', repr(rect), repr(match))
+            if match:
                 logger.info('Found idol %s', skin_id)
                 return Rect(rx, ry, rw, rh)
     return None
@@ -0,0 +1,254 @@
+"""
+单帧场景分类器。
+
+在同一张截图上按优先级依次判断各个场景规则，命中即返回。
+与逐个调用 `Prefab.exists()` 相比：
+
+* 整帧只转换一次灰度图，模板的灰度图也只计算一次；
+* 未指定搜索区域的模板，只在其截取位置（`template.slice_rect`）附近搜索，而不是全屏；
+* 同一帧内每个 Prefab 最多匹配一次，结果在多次分类之间共享；
+* 记录每条规则的耗时，便于分析每一轮循环的开销。
+"""
+import time
+import logging
+from dataclasses import dataclass, field
+from typing import Iterable, Sequence
+
+import cv2
+import numpy as np
+from cv2.typing import MatLike
+from kotonebot.primitives import Rect
+from kotonebot.core import AnyOf, Prefab, TemplateMatchPrefab
+from kotonebot.backend.image import template_match
+from kotonebot.backend.context.context import vars
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROI_MARGIN = (48, 160)
+"""
+未指定搜索区域时，在模板截取位置四周扩展的边距 (x, y)，单位像素。
+对话框标题等元素的纵向位置会随对话框高度变化，因此纵向边距更大。
+"""
+
+
+def _expand_prefabs(prefabs: Iterable[type[Prefab]]) -> tuple[type[Prefab], ...]:
+    """展开 `AnyOf`，得到实际需要匹配的 Prefab 列表。"""
+    result: list[type[Prefab]] = []
+    for prefab in prefabs:
+        if isinstance(prefab, type) and issubclass(prefab, AnyOf):
+            result.extend(_expand_prefabs(prefab.options))
+        else:
+            result.append(prefab)
+    return tuple(result)
+
+
+class SceneRule:
+    """场景规则。任意一个 Prefab 存在即视为命中。"""
+    def __init__(self, name: str, *prefabs: type[Prefab], full_frame: bool = False):
+        """
+        :param name: 规则名称。
+        :param prefabs: 需要判断的 Prefab，可以是 `AnyOf`。
+        :param full_frame: 是否强制全屏搜索。用于位置不固定的元素。
+        """
+        if len(prefabs) == 0:
+            raise ValueError(f'Scene rule "{name}" has no prefab.')
+        self.name = name
+        self.prefabs = _expand_prefabs(prefabs)
+        self.full_frame = full_frame
+
+    def __repr__(self) -> str:
+        names = ', '.join(p.__name__ for p in self.prefabs)
+        return f'SceneRule({self.name}: {names})'
+
+
+@dataclass
+class _PreparedTemplate:
+    gray: np.ndarray
+    """灰度模板。仅在非彩色匹配时使用。"""
+    roi: tuple[int, int, int, int] | None
+    """搜索区域 (x1, y1, x2, y2)。None 表示全屏。"""
+
+
+@dataclass
+class SceneFrame:
+    """一帧截图，以及在这一帧上的匹配结果与耗时。"""
+    image: MatLike
+    results: dict[type[Prefab], bool] = field(default_factory=dict)
+    """各个 Prefab 的匹配结果"""
+    timings: dict[str, float] = field(default_factory=dict)
+    """各条规则的耗时，单位秒"""
+    started_at: float = field(default_factory=time.perf_counter)
+    _gray: np.ndarray | None = None
+
+    @property
+    def gray(self) -> np.ndarray:
+        if self._gray is None:
+            if self.image.ndim == 3:
+                self._gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+            else:
+                self._gray = self.image
+        return self._gray
+
+    @property
+    def total_time(self) -> float:
+        """所有规则的总耗时，单位秒"""
+        return sum(self.timings.values())
+
+    @property
+    def elapsed(self) -> float:
+        """自创建以来经过的时间（包括规则之外的处理），单位秒"""
+        return time.perf_counter() - self.started_at
+
+    def summary(self) -> str:
+        items = ', '.join(f'{name}={t * 1000:.1f}ms' for name, t in self.timings.items())
+        return f'{self.total_time * 1000:.1f}ms ({items})'
+
+
+class SceneClassifier:
+    """
+    单帧场景分类器。
+
+    用法：
+    ```python
+    classifier = SceneClassifier([
+        SceneRule('dialog', R.DialogTitle),
+        SceneRule('battle', AnyOf[R.A, R.B]),
+    ])
+    frame = classifier.frame()
+    name = classifier.classify(frame)
+    ```
+    """
+    def __init__(
+        self,
+        rules: Sequence[SceneRule],
+        *,
+        roi_margin: tuple[int, int] = DEFAULT_ROI_MARGIN,
+    ):
+        """
+        :param rules: 场景规则，按优先级从高到低排列。
+        :param roi_margin: 见 `DEFAULT_ROI_MARGIN`。
+        """
+        self.rules = list(rules)
+        self.__rules = {rule.name: rule for rule in self.rules}
+        if len(self.__rules) != len(self.rules):
+            raise ValueError('Duplicate scene rule names.')
+        self.roi_margin = roi_margin
+        self.__full_frame = {
+            prefab for rule in self.rules if rule.full_frame for prefab in rule.prefabs
+        }
+        self.__prepared: dict[type[Prefab], _PreparedTemplate] = {}
+        self.last_frame: SceneFrame | None = None
+        """最近一次创建的帧。可用于查看上一轮的耗时。"""
+
+    def frame(self, image: MatLike | None = None) -> SceneFrame:
+        """
+        创建一帧。
+
+        :param image: 截图。默认为当前上下文中的截图，不会重新截图。
+        """
+        if image is None:
+            image = vars.screenshot_data
+            if image is None:
+                raise ValueError('No screenshot data found. Did you forget to call `device.screenshot()`?')
+        frame = SceneFrame(image)
+        self.last_frame = frame
+        return frame
+
+    def classify(self, frame: SceneFrame, names: Iterable[str] | None = None) -> str | None:
+        """
+        按优先级判断场景，返回第一个命中的规则名称。
+
+        :param frame: 目标帧。
+        :param names: 若指定，则只判断这些规则（仍按优先级顺序）。
+        :return: 命中的规则名称。若都未命中，返回 None。
+        """
+        if names is None:
+            rules = self.rules
+        else:
+            selected = set(names)
+            unknown = selected - self.__rules.keys()
+            if unknown:
+                raise ValueError(f'Unknown scene rules: {", ".join(sorted(unknown))}')
+            rules = [rule for rule in self.rules if rule.name in selected]
+        for rule in rules:
+            if self.__test(frame, rule):
+                return rule.name
+        return None
+
+    def test(self, frame: SceneFrame, name: str) -> bool:
+        """判断单条规则是否命中。"""
+        return self.__test(frame, self.__rules[name])
+
+    def __test(self, frame: SceneFrame, rule: SceneRule) -> bool:
+        start = time.perf_counter()
+        try:
+            return any(self.match(frame, prefab) for prefab in rule.prefabs)
+        finally:
+            frame.timings[rule.name] = frame.timings.get(rule.name, 0) + time.perf_counter() - start
+
+    def match(self, frame: SceneFrame, prefab: type[Prefab]) -> bool:
+        """判断 Prefab 是否存在于帧中。同一帧内结果会被缓存。"""
+        cached = frame.results.get(prefab)
+        if cached is not None:
+            return cached
+        if isinstance(prefab, type) and issubclass(prefab, TemplateMatchPrefab):
+            result = self.__match_template(frame, prefab)
+        else:
+            # 非模板匹配的 Prefab，使用其自身的实现（作用于上下文中的当前截图）
+            result = prefab.exists()
+        frame.results[prefab] = result
+        return result
+
+    def __prepare(self, prefab: type[TemplateMatchPrefab], image_shape: tuple[int, ...]) -> _PreparedTemplate:
+        prepared = self.__prepared.get(prefab)
+        if prepared is not None:
+            return prepared
+        template = prefab.template.pixels
+        gray = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY) if template.ndim == 3 else template
+        th, tw = template.shape[:2]
+        ih, iw = image_shape[:2]
+
+        _, _, region = prefab._resolve_match_options(prefab.Query())
+        if region is not None:
+            roi = (region.x1, region.y1, region.x2, region.y2)
+        elif prefab not in self.__full_frame and prefab.template.slice_rect is not None:
+            # 只在模板截取位置附近搜索
+            rect = prefab.template.slice_rect
+            mx, my = self.roi_margin
+            roi = (
+                max(0, rect.x1 - mx), max(0, rect.y1 - my),
+                min(iw, rect.x2 + mx), min(ih, rect.y2 + my),
+            )
+        else:
+            roi = None
+        if roi is not None:
+            x1, y1, x2, y2 = roi
+            if x2 - x1 < tw or y2 - y1 < th or (x1, y1, x2, y2) == (0, 0, iw, ih):
+                roi = None
+        prepared = _PreparedTemplate(gray=gray, roi=roi)
+        self.__prepared[prefab] = prepared
+        logger.debug('Prepared template %s. roi=%s', prefab.__name__, roi)
+        return prepared
+
+    def __match_template(self, frame: SceneFrame, prefab: type[TemplateMatchPrefab]) -> bool:
+        threshold, colored, _ = prefab._resolve_match_options(prefab.Query())
+        prepared = self.__prepare(prefab, frame.image.shape)
+        if colored:
+            # 彩色匹配还需要比较颜色直方图，交给 kotonebot 处理
+            rect = None
+            if prepared.roi is not None:
+                x1, y1, x2, y2 = prepared.roi
+                rect = Rect(x1, y1, x2 - x1, y2 - y1)
+            return len(template_match(
+                prefab.template.pixels, frame.image,
+                rect=rect, threshold=threshold, colored=True, max_results=1,
+            )) > 0
+        image = frame.gray
+        if prepared.roi is not None:
+            x1, y1, x2, y2 = prepared.roi
+            image = image[y1:y2, x1:x2]
+        th, tw = prepared.gray.shape[:2]
+        if image.shape[0] < th or image.shape[1] < tw:
+            return False
+        result = cv2.matchTemplate(image, prepared.gray, cv2.TM_CCOEFF_NORMED)
+        return bool(np.any(result >= threshold))
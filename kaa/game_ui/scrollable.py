@@ -90,6 +90,106 @@ def find_scroll_bar2(img: MatLike) -> Rect | None:
         return Rect(xywh=longest_rect)
     return None
 
+def estimate_scroll_offset(prev: MatLike, curr: MatLike) -> tuple[int, float]:
+    """
+    基于相位相关估计两帧之间内容的纵向滚动距离。
+
+    :param prev: 上一帧中滚动内容区域的图像。
+    :param curr: 当前帧中同一区域的图像，大小须与 `prev` 一致。
+    :return: `(offset, response)`。offset 为内容向上移动的像素数（向下滚动时为正），
+        response 为相位相关的峰值响应，越接近 1 越可信。
+    """
+    if prev.shape[:2] != curr.shape[:2]:
+        raise ValueError(f'Image size mismatch: {prev.shape[:2]} != {curr.shape[:2]}')
+    def _prepare(img: MatLike) -> np.ndarray:
+        if img.ndim == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        return img.astype(np.float32)
+    h, w = prev.shape[:2]
+    window = cv2.createHanningWindow((w, h), cv2.CV_32F)
+    (_, dy), response = cv2.phaseCorrelate(_prepare(prev), _prepare(curr), window)
+    return -int(round(dy)), float(response)
+
+class ScrollScanner:
+    """
+    增量滚动扫描器。
+
+    逐页扫描滚动列表时，相邻两页的大部分内容是相同的。
+    此类估计相邻两帧之间的滚动距离，只返回新出现的区域，
+    调用方只需识别这部分区域中的元素。
+
+    例：
+    ```python
+    scanner = ScrollScanner(R.Produce.BoxIdolOverviewIdols)
+    for _ in sc(0.2):
+        img = device.screenshot()
+        region = scanner.feed(img, margin=200)
+        if region is None:
+            continue
+        for rect in find_items(img, region):
+            if scanner.is_new(rect):
+                ...
+    ```
+    """
+    def __init__(
+        self,
+        roi: HintBox | Rect,
+        *,
+        min_response: float = 0.1,
+        tolerance: int = 4
+    ):
+        """
+        :param roi: 滚动内容区域。
+        :param min_response: 相位相关的最低峰值响应。低于此值时认为估计失败，整个区域都视为新区域。
+        :param tolerance: 估计误差容许值，单位像素。
+        """
+        self.roi = Rect(xywh=roi.xywh)
+        self.min_response = min_response
+        self.tolerance = tolerance
+        self.__prev: np.ndarray | None = None
+        self.offset: int | None = None
+        """最近一次估计出的滚动距离。None 表示整个区域都是新区域。"""
+        self.boundary: int = self.roi.y1
+        """新区域的上边界（屏幕坐标）。底边在此之下的元素视为新元素。"""
+
+    def reset(self):
+        """重置状态。下一帧的整个区域都会视为新区域。"""
+        self.__prev = None
+        self.offset = None
+        self.boundary = self.roi.y1
+
+    def feed(self, img: MatLike, *, margin: int = 0) -> Rect | None:
+        """
+        输入新的一帧，返回需要处理的区域。
+
+        :param img: 截图。
+        :param margin: 新区域向上扩展的像素数。
+            元素可能跨越新旧区域的边界，应设为不小于单个元素的高度。
+        :return: 需要处理的区域（屏幕坐标）。若内容没有移动，返回 None。
+        """
+        x1, y1, x2, y2 = self.roi.x1, self.roi.y1, self.roi.x2, self.roi.y2
+        gray = img[y1:y2, x1:x2]
+        if gray.ndim == 3:
+            gray = cv2.cvtColor(gray, cv2.COLOR_BGR2GRAY)
+        prev, self.__prev = self.__prev, gray
+        self.offset = None
+        self.boundary = y1
+        if prev is not None:
+            offset, response = estimate_scroll_offset(prev, gray)
+            logger.debug('Scroll offset: %d px, response: %.3f', offset, response)
+            if response >= self.min_response and 0 <= offset < y2 - y1:
+                if offset == 0:
+                    return None
+                self.offset = offset
+                self.boundary = y2 - offset - self.tolerance
+        top = max(y1, self.boundary - margin)
+        return Rect(x1, top, x2 - x1, y2 - top)
+
+    def is_new(self, rect: RectTuple | Rect) -> bool:
+        """判断元素是否为本帧新出现的元素，即上一帧中未完整显示。"""
+        _, y, _, h = rect.xywh if isinstance(rect, Rect) else rect
+        return y + h > self.boundary
+
 class ScrollableIterator:
     def __init__(
             self,
@@ -253,6 +353,9 @@ class Scrollable:
             raise ValueError('percentage must be in range [-1, 1].')
         if pixels is not None and pixels < 0:
             raise ValueError('pixels must be positive.')
+        if self.position >= 1 and (pixels is not None or (percentage or 0) > 0):
+            logger.debug('Already at the end of the scrollbar. Skip scrolling.')
+            return False
         if not self.thumb_height or not self.thumb_position or not self.track_height:
             self.update()
         if not self.thumb_height or not self.thumb_position or not self.track_height:
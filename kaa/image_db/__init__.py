@@ -1,4 +1,6 @@
-from .db import ImageDatabase, Db, DatabaseQueryResult, FileDataSource, DataSource
-from .descriptors import HistDescriptor
+from .db import ImageDatabase, Db, DatabaseQueryResult, FileDataSource, DataSource, IncrementalDataSource
+from .index import FeatureIndex
+from .store import DescriptorStore, DescriptorBundle
+from .descriptors import HistDescriptor, FastHistDescriptor
 
-__all__ = ['ImageDatabase', 'Db', 'DatabaseQueryResult', 'HistDescriptor', 'FileDataSource', 'DataSource']
+__all__ = ['ImageDatabase', 'Db', 'DatabaseQueryResult', 'HistDescriptor', 'FastHistDescriptor', 'FileDataSource', 'DataSource', 'IncrementalDataSource', 'FeatureIndex', 'DescriptorStore', 'DescriptorBundle']
@@ -1,20 +1,27 @@
 import os
-import pickle
+import json
 import logging
-from dataclasses import dataclass
-from typing import Any, NamedTuple, Protocol, Iterator
+import hashlib
+import concurrent.futures
+from dataclasses import dataclass, field
+from typing import Any, Callable, NamedTuple, Protocol, Iterator, Sequence, runtime_checkable
 
 import cv2
 import numpy as np
 from cv2.typing import MatLike
 
 from .descriptors import BaseDescriptor
+from .index import FeatureIndex, stack_features
+from .store import DescriptorStore, DescriptorBundle
 from kotonebot.backend.core import cv2_imread
 
 logger = logging.getLogger(__name__)
 
 DATABASE_INTERNAL_VERSION = 0
 
+ProgressCallback = Callable[[str, int, int], None]
+"""进度回调 `(key, done, total)`"""
+
 @dataclass
 class Db:
     """数据库"""
@@ -26,10 +33,16 @@ class Db:
     """数据库名称"""
     data: dict[str, Any]
     """数据"""
+    sources: dict[str, str] = field(default_factory=dict)
+    """数据来源的签名。key 为图片 ID，value 为来源文件的签名，用于增量同步。"""
 
     def insert(self, key: str, value: Any):
         self.data[key] = value
 
+    def remove(self, key: str):
+        self.data.pop(key, None)
+        self.sources.pop(key, None)
+
     def count(self):
         return len(self.data)
 
@@ -37,16 +50,70 @@ class DataSource(Protocol):
     def __iter__(self) -> Iterator[tuple[str, Any]]:
         ...
 
-class FileDataSource(DataSource):
+@runtime_checkable
+class IncrementalDataSource(DataSource, Protocol):
+    """
+    支持增量同步的数据源。
+
+    数据库会先比较每条数据的签名，只读取新增或签名发生变化的数据。
+    """
+    def signatures(self) -> dict[str, str]:
+        """
+        返回所有数据的签名。签名不变则视为数据未变化。
+
+        :return: key 为图片 ID，value 为签名。
+        """
+        ...
+
+    def load(self, key: str) -> Any:
+        """读取指定 key 的数据。"""
+        ...
+
+class FileDataSource(IncrementalDataSource):
     def __init__(self, folder_path: str, keep_ext: bool = True):
         self.path = os.path.abspath(folder_path)
         self.keep_ext = keep_ext
+        self.__files: dict[str, str] = {}
+
+    def __key(self, file: str) -> str:
+        return file if self.keep_ext else os.path.splitext(file)[0]
 
     def __iter__(self) -> Iterator[tuple[str, Any]]:
         for file in os.listdir(self.path):
-            if not self.keep_ext:
-                file = os.path.splitext(file)[0]
-            yield file, cv2_imread(os.path.join(self.path, file))
+            yield self.__key(file), cv2_imread(os.path.join(self.path, file))
+
+    def signatures(self) -> dict[str, str]:
+        """以文件大小与修改时间作为签名。只读取文件元数据，不解码图片。"""
+        self.__files.clear()
+        result = {}
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if not entry.is_file():
+                    continue
+                st = entry.stat()
+                key = self.__key(entry.name)
+                self.__files[key] = entry.name
+                result[key] = f'{st.st_size}:{st.st_mtime_ns}'
+        return result
+
+    def file_path(self, key: str) -> str:
+        """返回指定 key 对应的文件路径。"""
+        return os.path.join(self.path, self.__files.get(key, key))
+
+    def md5(self, key: str) -> str:
+        """计算指定 key 对应文件的 md5。"""
+        h = hashlib.md5()
+        with open(self.file_path(key), 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def load(self, key: str) -> Any:
+        path = self.file_path(key)
+        img = cv2_imread(path)
+        if img is None:
+            raise ValueError(f'Cannot read image from path: {path}')
+        return img
 
 class DatabaseQueryResult(NamedTuple):
     key: str
@@ -66,59 +133,242 @@ class ImageDatabase:
             db_path: str,
             descriptor: BaseDescriptor,
             *,
-            name: str | None = None
+            name: str | None = None,
+            progress_cb: ProgressCallback | None = None,
+            bundle_path: str | None = None
         ):
+        """
+        :param source: 数据源。
+        :param db_path: 数据库文件路径（`.npy`）。
+        :param descriptor: 特征描述符。
+        :param name: 数据库名称。
+        :param progress_cb: 构建特征时的进度回调，见 `sync`。
+        :param bundle_path: 预先计算的描述符包路径（`.npz`）。
+            若存在且参数一致，则直接使用其中的特征，只在本地计算缺失的部分。
+        """
         self.db_path = db_path
         self.__db: Db | None = None
+        self.__index = FeatureIndex()
+        self.__store = DescriptorStore(db_path)
+        self.__modified = False
         self.descriptor = descriptor
         self.source = source
 
         # 载入数据库
         logger.info('Loading database from %s...', db_path)
-        if os.path.exists(db_path):
-            try:
-                with open(db_path, 'rb') as f:
-                    self.__db = pickle.load(f)
-                logger.info('Database loaded. Name=%s, version=%s, count=%d', self.db.name, self.db.version, self.db.count())
-            except Exception as e:
-                logger.warning('Failed to load database from %s: %s', db_path, e)
-                self.__db = None
+        self.__load()
         if self.__db is None:
             self.__db = Db(DATABASE_INTERNAL_VERSION, None, name, {})
+            self.__modified = True
         
         # 检查版本
         if self.db.internal_version != DATABASE_INTERNAL_VERSION:
             logger.info('Database internal version is %d, expected %d. Clearing database...', self.db.internal_version, DATABASE_INTERNAL_VERSION)
             self.db.data.clear()
+            self.db.sources.clear()
             self.db.internal_version = DATABASE_INTERNAL_VERSION
+            self.__index.invalidate()
+            self.__modified = True
         
         # 载入数据源
         logger.debug('Loading data source...')
-        for key, value in self.source:
-            try:
-                self.insert(key, value)
-            except Exception as e:
-                logger.error(
-                    "\n"
-                    "Error inserting key: %s\n"
-                    "Error message: %s\n"
-                    "资源可能损坏，请检查并删除 `kaa/resources/idol_cards` 下的损坏文件，"
-                    "然后重新执行 `tools/db/extract_resources.py`",
-                    key,
-                    str(e).strip()
-                )
-                raise # 继续抛异常，让程序崩溃
-        self.save()
+        if isinstance(self.source, IncrementalDataSource):
+            if bundle_path is not None and isinstance(self.source, FileDataSource):
+                self.import_bundle(bundle_path, self.source)
+            self.sync(self.source, progress_cb=progress_cb)
+        else:
+            for key, value in self.source:
+                self.__insert_from_source(key, value)
+        if self.__modified:
+            self.save()
         
+    def __load(self):
+        """
+        从 `db_path` 载入数据库。
+
+        读取时的临时引用在返回后即被释放，之后只有索引引用内存映射的矩阵，
+        `save()` 时会改为引用新矩阵，旧矩阵文件随之可以被删除。
+        """
+        stored = self.__store.load()
+        if stored is None:
+            return
+        # 索引直接使用内存映射的矩阵；各条特征复制一份，
+        # 避免查询结果等外部引用使矩阵文件一直处于映射状态
+        data = {key: np.array(stored.matrix[i]) for i, key in enumerate(stored.keys)}
+        self.__db = Db(stored.internal_version, stored.version, stored.name, data, stored.sources)
+        self.__index.assign(stored.keys, stored.matrix)
+        logger.info('Database loaded. Name=%s, version=%s, count=%d', self.db.name, self.db.version, self.db.count())
+
+    def __insert_from_source(self, key: str, value: Any, *, overwrite: bool = False):
+        try:
+            self.insert(key, value, overwrite=overwrite)
+        except Exception as e:
+            self.__log_insert_error(key, e)
+            raise # 继续抛异常，让程序崩溃
+
+    def __log_insert_error(self, key: str, e: Exception):
+        logger.error(
+            "\n"
+            "Error inserting key: %s\n"
+            "Error message: %s\n"
+            "资源可能损坏，请检查并删除 `kaa/resources/idol_cards` 下的损坏文件，"
+            "然后重新执行 `tools/db/extract_resources.py`",
+            key,
+            str(e).strip()
+        )
+
+    def sync(
+            self,
+            source: IncrementalDataSource,
+            *,
+            max_workers: int | None = None,
+            progress_cb: ProgressCallback | None = None
+        ):
+        """
+        与数据源进行增量同步。
+
+        只解码并计算新增或签名变化的数据，并删除数据源中已不存在的记录。
+        解码与特征计算在线程池中并行进行（OpenCV 在计算时会释放 GIL）。
+
+        :param source: 数据源。
+        :param max_workers: 线程池大小。默认为 `min(8, CPU 核心数)`。
+        :param progress_cb: 进度回调 `progress_cb(key, done, total)`，每计算完一条数据后调用。
+        """
+        signatures = source.signatures()
+        removed = [key for key in self.db.data if key not in signatures]
+        for key in removed:
+            self.remove(key)
+        pending = [
+            key for key, signature in signatures.items()
+            if key not in self.db.data or self.db.sources.get(key) != signature
+        ]
+        if pending:
+            logger.info('Computing descriptors for %d images...', len(pending))
+            self.__build(source, pending, max_workers, progress_cb)
+            for key in pending:
+                self.db.sources[key] = signatures[key]
+        logger.info('Data source synced. updated=%d, removed=%d, total=%d', len(pending), len(removed), self.db.count())
+
+    def __build(
+            self,
+            source: IncrementalDataSource,
+            keys: list[str],
+            max_workers: int | None,
+            progress_cb: ProgressCallback | None
+        ):
+        def work(key: str) -> np.ndarray:
+            return self.describe(source.load(key))
+
+        if max_workers is None:
+            max_workers = min(8, os.cpu_count() or 1)
+        total = len(keys)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(work, key): key for key in keys}
+            for done, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+                key = futures[future]
+                try:
+                    feature = future.result()
+                except Exception as e:
+                    self.__log_insert_error(key, e)
+                    for f in futures:
+                        f.cancel()
+                    raise # 继续抛异常，让程序崩溃
+                self.__put(key, feature)
+                if progress_cb:
+                    progress_cb(key, done, total)
+
+    def descriptor_config(self) -> dict:
+        """
+        计算特征时使用的参数。只有参数完全一致时，预先计算的描述符包才会被使用。
+
+        若子类重写了 `describe` 并对图像进行了预处理，也应重写此方法，加入预处理参数。
+        """
+        return {
+            'internal_version': DATABASE_INTERNAL_VERSION,
+            'descriptor': self.descriptor.config,
+        }
+
+    def import_bundle(self, bundle_path: str, source: 'FileDataSource') -> int:
+        """
+        从预先计算的描述符包中导入特征。
+
+        只导入本地需要更新、且本地文件 md5 与包内记录一致的数据。
+
+        :param bundle_path: 描述符包路径。
+        :param source: 本地数据源。
+        :return: 导入的数量。
+        """
+        bundle = DescriptorBundle.load(bundle_path)
+        if bundle is None:
+            return 0
+        if bundle.config != json.loads(json.dumps(self.descriptor_config(), sort_keys=True)):
+            logger.info('Descriptor bundle config mismatch, ignored. bundle=%s, expected=%s', bundle.config, self.descriptor_config())
+            return 0
+        signatures = source.signatures()
+        imported = 0
+        for i, key in enumerate(bundle.keys):
+            signature = signatures.get(key)
+            if signature is None:
+                continue
+            if key in self.db.data and self.db.sources.get(key) == signature:
+                continue
+            if source.md5(key) != bundle.md5s[i]:
+                continue
+            self.__put(key, bundle.features[i])
+            self.db.sources[key] = signature
+            imported += 1
+        logger.info('Imported %d descriptors from bundle %s.', imported, bundle_path)
+        return imported
+
+    def export_bundle(self, bundle_path: str, source: 'FileDataSource'):
+        """
+        将当前数据库导出为描述符包，供发布游戏数据时使用。
+
+        :param bundle_path: 描述符包路径。
+        :param source: 本地数据源，用于计算源文件 md5。
+        """
+        keys = list(self.db.data.keys())
+        DescriptorBundle(
+            config=self.descriptor_config(),
+            keys=keys,
+            md5s=[source.md5(key) for key in keys],
+            features=stack_features(self.db.data.values()),
+        ).save(bundle_path)
+
     @property
     def db(self) -> Db:
         if not self.__db:
             raise RuntimeError('Database not loaded')
         return self.__db
 
+    @property
+    def index(self) -> FeatureIndex:
+        """特征矩阵索引。若数据有变化，会在访问时重建。"""
+        if self.__index.dirty:
+            self.__index.rebuild(self.db.data)
+        return self.__index
+
+    @property
+    def modified(self) -> bool:
+        """自上次保存以来数据是否有变化"""
+        return self.__modified
+
     def save(self):
-        with open(self.db_path, 'wb') as f:
-            pickle.dump(self.db, f)
+        """将数据库保存到 `db_path`。"""
+        keys = list(self.db.data.keys())
+        matrix = stack_features(self.db.data.values())
+        # 先让数据与索引改为引用内存中的新矩阵，释放对旧内存映射文件的引用
+        self.db.data = {key: matrix[i] for i, key in enumerate(keys)}
+        self.__index.assign(keys, matrix)
+        self.__store.save(
+            keys,
+            matrix,
+            internal_version=self.db.internal_version,
+            version=self.db.version,
+            name=self.db.name,
+            sources=self.db.sources,
+        )
+        self.__modified = False
 
     def insert(self, key: str, image: MatLike | str, *, overwrite: bool = False):
         """
@@ -132,8 +382,36 @@ class ImageDatabase:
         if isinstance(image, str):
             image = cv2_imread(image)
         if overwrite or key not in self.db.data:
-            self.db.insert(key, self.descriptor(image))
-            logger.debug('Inserted image: %s', key)
+            self.__put(key, self.describe(image))
+
+    def describe(self, image: MatLike) -> np.ndarray:
+        """
+        计算待插入图像的特征。子类可重写此方法，在计算前对图像进行预处理。
+
+        该方法可能在多个线程中同时调用。
+
+        :param image: 图片。必须为 BGR 格式。
+        :return: 特征向量。
+        """
+        return self.descriptor(image)
+
+    def __put(self, key: str, feature: np.ndarray):
+        self.db.insert(key, feature)
+        self.__index.invalidate()
+        self.__modified = True
+        logger.debug('Inserted image: %s', key)
+
+    def remove(self, key: str):
+        """
+        从图像数据库中删除一条记录。
+
+        :param key: 图片的 ID。
+        """
+        if key in self.db.data:
+            self.db.remove(key)
+            self.__index.invalidate()
+            self.__modified = True
+            logger.debug('Removed image: %s', key)
 
     def insert_many(self, images: dict[str, str | MatLike], *, overwrite: bool = False):
         """
@@ -155,22 +433,103 @@ class ImageDatabase:
         :return: 搜索结果。
         """
         query_feature = self.descriptor(query)
-        results = list[DatabaseQueryResult]()
-        for key, feature in self.db.data.items():
-            dist = chi2_distance(query_feature, feature)
-            if dist < threshold:
-                results.append(DatabaseQueryResult(key, feature, float(dist)))
-        results.sort(key=lambda x: x.distance)
-
-        # 可视化
-        # print("MinDist = ", results[0].distance, results[1].distance, results[2].distance)
-        # cv2.imshow("query", query)
-        # # cv2.imshow("query_feature", query_feature)
-        # cv2.waitKey(0)
-        # cv2.destroyAllWindows()
+        index = self.index
+        dists = index.distances(query_feature)
+        (candidates, ) = np.nonzero(dists < threshold)
+        candidates = candidates[np.argsort(dists[candidates], kind='stable')]
+        return [self._make_result(index.keys[i], dists[i]) for i in candidates]
+
+    def match_topk(self, query: MatLike, k: int, threshold: float = float('inf')) -> list[DatabaseQueryResult]:
+        """
+        搜索图片，返回距离最近的 k 条记录，并按相似度降序排序。
+
+        :param query: 待搜索的图片。必须为 BGR 格式。
+        :param k: 最多返回的数量。
+        :param threshold: 距离阈值。阈值越大，对相似度的要求越低。
+        :return: 搜索结果。
+        """
+        query_feature = self.descriptor(query)
+        index = self.index
+        indices, dists = index.topk(query_feature, k)
+        return [
+            self._make_result(index.keys[i], d)
+            for i, d in zip(indices, dists)
+            if d < threshold
+        ]
 
+    def match_batch(
+            self,
+            queries: Sequence[MatLike],
+            k: int = 1,
+            threshold: float = float('inf')
+        ) -> list[list[DatabaseQueryResult]]:
+        """
+        批量搜索多张图片。所有查询会在一次矩阵运算中与整个数据库比较。
+
+        :param queries: 待搜索的图片列表。必须为 BGR 格式。
+        :param k: 每张图片最多返回的数量。
+        :param threshold: 距离阈值。阈值越大，对相似度的要求越低。
+        :return: 搜索结果列表，与 `queries` 一一对应，每项均按相似度降序排序。
+        """
+        if len(queries) == 0:
+            return []
+        index = self.index
+        features = np.stack([
+            np.asarray(self.descriptor(q), dtype=np.float32).ravel()
+            for q in queries
+        ])
+        dists = index.distances_batch(features)
+        results = list[list[DatabaseQueryResult]]()
+        for row in dists:
+            indices, top = index.select_topk(row, k)
+            results.append([
+                self._make_result(index.keys[i], d)
+                for i, d in zip(indices, top)
+                if d < threshold
+            ])
         return results
 
+    def match_prefix(
+            self,
+            query: MatLike,
+            prefix: str,
+            threshold: float = 10,
+            *,
+            rejection_size: int = 8
+        ) -> DatabaseQueryResult | None:
+        """
+        匹配图片，只有当最相似的图片 key 以 `prefix` 开头时才返回结果。
+
+        结果与 `match()` 后再判断 `key.startswith(prefix)` 相同，但只需要与目标记录
+        和拒绝集（见 `FeatureIndex.partition`）比较，就能排除绝大多数不匹配的图片。
+        只有疑似命中时，才会与整个数据库比较以确认。
+
+        :param query: 待匹配的图片。必须为 BGR 格式。
+        :param prefix: key 前缀。
+        :param threshold: 距离阈值。阈值越大，对相似度的要求越低。
+        :param rejection_size: 拒绝集大小。
+        :return: 匹配结果。
+        """
+        index = self.index
+        rows, n = index.partition(prefix, rejection_size)
+        if n == 0:
+            return None
+        feature = np.asarray(self.descriptor(query), dtype=np.float32).ravel()
+        dists = index.distances(feature, rows)
+        best = int(np.argmin(dists))
+        # 拒绝集中有更相似的记录，或目标记录本身不够相似
+        if best >= n or dists[best] >= threshold:
+            return None
+        # 与整个数据库比较，确认没有更相似的记录
+        indices, top = index.topk(feature, 1)
+        key = index.keys[indices[0]]
+        if top[0] < threshold and key.startswith(prefix):
+            return self._make_result(key, top[0])
+        return None
+
+    def _make_result(self, key: str, distance: Any) -> DatabaseQueryResult:
+        return DatabaseQueryResult(key, self.db.data[key], float(distance))
+
     def match(self, query: MatLike, threshold: float = 10) -> DatabaseQueryResult | None:
         """
         匹配图片，寻找与输入图片最相似的图片。
@@ -179,7 +538,7 @@ class ImageDatabase:
         :param threshold: 距离阈值。阈值越大，对相似度的要求越低。
         :return: 匹配结果。
         """
-        results = self.match_all(query, threshold)
+        results = self.match_topk(query, 1, threshold)
         if len(results) > 0:
             return results[0]
         else:
@@ -192,7 +551,7 @@ if __name__ == '__main__':
     logging.basicConfig(level=logging.DEBUG, format='[%(asctime)s] [%(levelname)s] [%(name)s] [%(funcName)s] [%(lineno)d] %(message)s')
     imgs_path = r'E:\GithubRepos\KotonesAutoAssistant.worktrees\dev\kotonebot\tasks\resources\idol_cards'
     needle_path = r'D:\05.png'
-    db = ImageDatabase(FileDataSource(imgs_path), r'D:\idols.pkl', HistDescriptor(8), name='idols')
+    db = ImageDatabase(FileDataSource(imgs_path), r'D:\idols.npy', HistDescriptor(8), name='idols')
     # if db.db.count() == 0:
     #     db.insert({file: os.path.join(imgs_path, file) for file in os.listdir(imgs_path)})
     needle = cv2_imread(needle_path)
@@ -1,5 +1,5 @@
-from .hist import HistDescriptor
+from .hist import HistDescriptor, FastHistDescriptor
 from .hog import HogDescriptor
 from .base import BaseDescriptor
 
-__all__ = ['HistDescriptor', 'HogDescriptor', 'BaseDescriptor']
+__all__ = ['HistDescriptor', 'FastHistDescriptor', 'HogDescriptor', 'BaseDescriptor']
@@ -6,4 +6,12 @@ if TYPE_CHECKING:
 
 class BaseDescriptor(Protocol):
     def __call__(self, image: 'MatLike') -> 'ndarray':
-        ...
\ No newline at end of file
+        ...
+
+    @property
+    def config(self) -> dict:
+        """
+        描述符参数。参数相同的描述符对同一图像必须输出相同的特征，
+        用于判断预先计算的特征是否可以直接使用。
+        """
+        ...
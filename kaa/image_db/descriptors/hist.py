@@ -6,6 +6,10 @@ class HistDescriptor:
     def __init__(self, bin_count: int):
         self.bin_count = bin_count
 
+    @property
+    def config(self) -> dict:
+        return {'type': 'hist', 'bin_count': self.bin_count}
+
     def __call__(self, image: MatLike):
         img = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
         # 将图像均分为九个区域
@@ -32,6 +36,61 @@ class HistDescriptor:
             features = np.append(features, hist.flatten())
         return features
 
+class FastHistDescriptor:
+    """
+    与 `HistDescriptor` 输出相同特征的快速实现。
+
+    先把 HSV 图像一次性量化为 bin 编号，再与区域编号合并为一个标签，
+    最后用一次 `np.bincount` 统计出九个区域的直方图，
+    避免了九张全尺寸掩码与九次 `cv2.calcHist`。
+    """
+    def __init__(self, bin_count: int):
+        self.bin_count = bin_count
+        values = np.arange(256, dtype=np.int32)
+        # 与 cv2.calcHist 在 uint8 + 均匀区间下的分桶方式一致
+        self.__lut_h = values * bin_count // 180 * bin_count * bin_count
+        self.__lut_s = values * bin_count // 256 * bin_count
+        self.__lut_v = values * bin_count // 256
+        self.__regions: dict[tuple[int, int], np.ndarray] = {}
+
+    @property
+    def config(self) -> dict:
+        return {'type': 'hist', 'bin_count': self.bin_count}
+
+    def __region_map(self, height: int, width: int) -> np.ndarray:
+        """返回每个像素所属区域编号与 bin 总数的乘积，按尺寸缓存。"""
+        key = (height, width)
+        regions = self.__regions.get(key)
+        if regions is None:
+            rows = np.empty(height, dtype=np.int32)
+            cols = np.empty(width, dtype=np.int32)
+            for i in range(3):
+                rows[i * height // 3:(i + 1) * height // 3] = i
+                cols[i * width // 3:(i + 1) * width // 3] = i
+            regions = (rows[:, np.newaxis] * 3 + cols[np.newaxis, :]) * self.bin_count ** 3
+            self.__regions[key] = regions
+        return regions
+
+    def __call__(self, image: MatLike):
+        img = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        height, width = img.shape[:2]
+        bins = self.bin_count ** 3
+        labels = (
+            self.__region_map(height, width)
+            + self.__lut_h[img[:, :, 0]]
+            + self.__lut_s[img[:, :, 1]]
+            + self.__lut_v[img[:, :, 2]]
+        )
+        counts = np.bincount(labels.ravel(), minlength=9 * bins).reshape(9, bins)
+        features = np.empty(9 * bins, dtype=np.float32)
+        region_features = features.reshape(9, bins)
+        region_features[:] = counts
+        # 与 cv2.normalize 默认的 L2 归一化一致：在 double 下求范数，再以 float 缩放
+        norms = np.sqrt(np.einsum('ij,ij->i', counts, counts, dtype=np.float64))
+        scale = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0).astype(np.float32)
+        region_features *= scale[:, np.newaxis]
+        return features
+
 if __name__ == '__main__':
     from kotonebot.backend.core import cv2_imread
     d = HistDescriptor(8)
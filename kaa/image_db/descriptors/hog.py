@@ -6,6 +6,17 @@ class HogDescriptor:
         self.size = size
         self.hog = cv2.HOGDescriptor(_winSize=size, _blockSize=(16,16), _blockStride=(8,8), _cellSize=(8,8), _nbins=9)
 
+    @property
+    def config(self) -> dict:
+        return {
+            'type': 'hog',
+            'size': list(self.size),
+            'block_size': [16, 16],
+            'block_stride': [8, 8],
+            'cell_size': [8, 8],
+            'nbins': 9,
+        }
+
     def __call__(self, image: MatLike):
         img_resized = cv2.resize(image, self.size)
         hist = self.hog.compute(img_resized)
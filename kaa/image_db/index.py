@@ -0,0 +1,198 @@
+import logging
+import bisect
+from typing import Any, Iterable, Mapping
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def chi2_distances(matrix: np.ndarray, query: np.ndarray, eps=1e-10) -> np.ndarray:
+    """
+    计算 query 与 matrix 中每一行之间的卡方距离。
+
+    :param matrix: 特征矩阵，形状为 (N, D)。
+    :param query: 查询特征，形状为 (D,)。
+    :return: 距离数组，形状为 (N,)。
+    """
+    diff = matrix - query
+    return 0.5 * np.sum(diff * diff / (matrix + query + eps), axis=1)
+
+
+def stack_features(features: Iterable[Any]) -> np.ndarray:
+    """
+    将多个特征向量堆叠为一个连续的 float32 矩阵。
+
+    :return: 特征矩阵，形状为 (N, D)。若没有特征，返回形状为 (0, 0) 的空矩阵。
+    """
+    rows = [np.asarray(v, dtype=np.float32).ravel() for v in features]
+    if len(rows) == 0:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.ascontiguousarray(np.stack(rows))
+
+
+class FeatureIndex:
+    """
+    特征矩阵索引。
+
+    将所有特征按行堆叠为一个连续的 float32 矩阵，
+    查询时一次广播计算出与所有记录的距离，而不是逐条循环。
+    """
+    def __init__(self):
+        self.keys: list[str] = []
+        """每一行对应的 key"""
+        self.matrix: np.ndarray = np.empty((0, 0), dtype=np.float32)
+        """特征矩阵，形状为 (N, D)"""
+        self.__dirty = True
+        self.__sorted_keys: list[str] | None = None
+        self.__sorted_rows: np.ndarray | None = None
+        self.__partitions: dict[tuple[str, int], tuple[np.ndarray, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def dirty(self) -> bool:
+        """索引是否需要重建"""
+        return self.__dirty
+
+    def invalidate(self):
+        """标记索引需要重建。下次查询时会自动重建。"""
+        self.__dirty = True
+
+    def rebuild(self, data: Mapping[str, Any]):
+        """
+        从数据字典重建索引。
+
+        :param data: key 为图片 ID，value 为特征向量。
+        """
+        self.assign(list(data.keys()), stack_features(data.values()))
+        logger.debug('Feature index rebuilt. count=%d, dim=%d', *self.matrix.shape)
+
+    def assign(self, keys: list[str], matrix: np.ndarray):
+        """
+        直接使用已有的特征矩阵作为索引，不进行复制。
+
+        :param keys: 每一行对应的 key。
+        :param matrix: 特征矩阵，形状为 (N, D)，必须为 float32。
+        """
+        if matrix.shape[0] != len(keys):
+            raise ValueError(f'Key count {len(keys)} does not match matrix rows {matrix.shape[0]}.')
+        self.keys = keys
+        self.matrix = matrix
+        self.__dirty = False
+        self.__sorted_keys = None
+        self.__sorted_rows = None
+        self.__partitions.clear()
+
+    def distances(self, query: np.ndarray, rows: np.ndarray | None = None) -> np.ndarray:
+        """
+        计算查询特征与所有记录的卡方距离。
+
+        :param query: 查询特征。
+        :param rows: 若指定，则只计算这些行。
+        :return: 距离数组，顺序与 `keys`（或 `rows`）一致。
+        """
+        if len(self.keys) == 0 or (rows is not None and len(rows) == 0):
+            return np.empty((0,), dtype=np.float32)
+        query = np.asarray(query, dtype=np.float32).ravel()
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        return chi2_distances(matrix, query)
+
+    def prefix_rows(self, prefix: str) -> np.ndarray:
+        """
+        查找 key 以 `prefix` 开头的所有行。
+
+        首次调用时对 key 排序，之后每次查找为二分查找。
+
+        :return: 行号数组，升序排列。
+        """
+        if self.__sorted_keys is None or self.__sorted_rows is None:
+            order = sorted(range(len(self.keys)), key=self.keys.__getitem__)
+            self.__sorted_keys = [self.keys[i] for i in order]
+            self.__sorted_rows = np.asarray(order, dtype=np.intp)
+        start = bisect.bisect_left(self.__sorted_keys, prefix)
+        end = start
+        while end < len(self.__sorted_keys) and self.__sorted_keys[end].startswith(prefix):
+            end += 1
+        return np.sort(self.__sorted_rows[start:end])
+
+    def partition(self, prefix: str, rejection_size: int) -> tuple[np.ndarray, int]:
+        """
+        取出 key 以 `prefix` 开头的所有行，以及与它们最相似的若干其他行（拒绝集）。
+
+        拒绝集由库内特征之间的距离决定，结果会被缓存，直到索引重建。
+
+        :param prefix: key 前缀。
+        :param rejection_size: 拒绝集大小。
+        :return: `(rows, n)`。`rows[:n]` 为目标行，`rows[n:]` 为拒绝集。
+        """
+        cache_key = (prefix, rejection_size)
+        cached = self.__partitions.get(cache_key)
+        if cached is not None:
+            return cached
+        targets = self.prefix_rows(prefix)
+        n = len(targets)
+        rejection = np.empty((0,), dtype=np.intp)
+        if n > 0 and rejection_size > 0 and len(self.keys) > n:
+            # 其他记录到任意一个目标记录的最近距离
+            dists = self.distances_batch(self.matrix[targets]).min(axis=0)
+            dists[targets] = np.inf
+            k = min(rejection_size, len(self.keys) - n)
+            rejection, _ = self.select_topk(dists, k)
+        result = (np.concatenate([targets, rejection]).astype(np.intp), n)
+        self.__partitions[cache_key] = result
+        return result
+
+    def distances_batch(self, queries: np.ndarray, max_elements: int = 1 << 24) -> np.ndarray:
+        """
+        批量计算多个查询特征与所有记录的卡方距离。
+
+        :param queries: 查询特征矩阵，形状为 (M, D)。
+        :param max_elements: 单次广播计算允许的最大元素数量，用于限制临时内存占用。
+        :return: 距离矩阵，形状为 (M, N)。
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        queries = queries.reshape(queries.shape[0], -1)
+        m, n = queries.shape[0], len(self.keys)
+        if m == 0 or n == 0:
+            return np.empty((m, n), dtype=np.float32)
+        matrix = self.matrix[np.newaxis, :, :]
+        # 按块计算，避免 (M, N, D) 的临时数组过大
+        step = max(1, max_elements // (n * self.matrix.shape[1]))
+        result = np.empty((m, n), dtype=np.float32)
+        for start in range(0, m, step):
+            q = queries[start:start + step, np.newaxis, :]
+            diff = matrix - q
+            result[start:start + step] = 0.5 * np.sum(diff * diff / (matrix + q + 1e-10), axis=2)
+        return result
+
+    def topk(self, query: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        查询与输入特征距离最近的 k 条记录。
+
+        :param query: 查询特征。
+        :param k: 返回数量。若大于记录总数，则返回全部记录。
+        :return: `(indices, distances)`，均按距离升序排列。
+        """
+        dists = self.distances(query)
+        return self.select_topk(dists, k)
+
+    @staticmethod
+    def select_topk(dists: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        从距离数组中选出最小的 k 个，并按距离升序排列。
+
+        :param dists: 距离数组。
+        :param k: 返回数量。
+        :return: `(indices, distances)`。
+        """
+        n = dists.shape[0]
+        if n == 0 or k <= 0:
+            return np.empty((0,), dtype=np.intp), np.empty((0,), dtype=dists.dtype)
+        if k < n:
+            idx = np.argpartition(dists, k - 1)[:k]
+        else:
+            idx = np.arange(n)
+        idx = idx[np.argsort(dists[idx], kind='stable')]
+        return idx, dists[idx]
@@ -0,0 +1,222 @@
+import os
+import json
+import logging
+from dataclasses import dataclass, field
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STORE_FORMAT_VERSION = 2
+"""存储格式版本号。格式不兼容时递增。"""
+
+
+@dataclass
+class StoredDescriptors:
+    """从存储中读取出的描述符数据"""
+    internal_version: int
+    version: str | None
+    name: str | None
+    keys: list[str]
+    matrix: np.ndarray
+    """特征矩阵，形状为 (N, D)。通常是只读的内存映射数组。"""
+    sources: dict[str, str] = field(default_factory=dict)
+    """数据来源的签名，见 `Db.sources`"""
+
+
+class DescriptorStore:
+    """
+    描述符存储。
+
+    特征矩阵保存在 `.npy` 文件中，读取时以内存映射方式打开，不需要解析或复制；
+    key 及元数据保存在同名的 `.json` 索引文件中。
+    与 pickle 不同，读取过程不会执行任意代码。
+
+    每次保存都会写入一个新的矩阵文件 `<名称>.<generation>.npy`，最后再替换索引文件指向它：
+
+    * 不会覆盖正在被内存映射的文件（Windows 下无法替换被映射的文件）；
+    * 在两步之间中断时，索引仍指向完整的旧矩阵，不会出现新 key 与旧矩阵配对的情况。
+
+    不再被引用的矩阵文件在之后保存或读取时删除。仍被映射而无法删除的文件会留到下一次。
+    """
+    def __init__(self, path: str):
+        """
+        :param path: `.npy` 文件路径。索引文件路径为将扩展名替换为 `.json` 后的路径，
+            矩阵文件路径为在扩展名前插入 generation 后的路径。
+        """
+        self.path = path
+        self.__stem = os.path.splitext(path)[0]
+        self.index_path = self.__stem + '.json'
+        self.legacy_paths = [path, self.__stem + '.pkl']
+        """旧版本使用的缓存文件。保存时删除。"""
+
+    def matrix_path(self, generation: int) -> str:
+        """指定 generation 的矩阵文件路径"""
+        return f'{self.__stem}.{generation}.npy'
+
+    def exists(self) -> bool:
+        return os.path.exists(self.index_path)
+
+    def __read_index(self) -> dict | None:
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def load(self) -> StoredDescriptors | None:
+        """
+        读取描述符。
+
+        :return: 读取结果。若文件不存在、格式不兼容或已损坏，返回 None。
+        """
+        try:
+            meta = self.__read_index()
+            if meta is None:
+                return None
+            if meta.get('format') != STORE_FORMAT_VERSION:
+                logger.info('Descriptor store format is %s, expected %d.', meta.get('format'), STORE_FORMAT_VERSION)
+                return None
+            keys: list[str] = meta['keys']
+            generation: int = meta['generation']
+            if len(keys) == 0:
+                matrix = np.empty((0, 0), dtype=np.float32)
+            else:
+                matrix = np.load(self.matrix_path(generation), mmap_mode='r', allow_pickle=False)
+            if matrix.ndim != 2 or matrix.shape[0] != len(keys) or matrix.dtype != np.float32:
+                logger.warning('Descriptor store %s is inconsistent with its index.', self.path)
+                return None
+            self.__remove_stale(generation)
+            return StoredDescriptors(
+                internal_version=meta['internal_version'],
+                version=meta.get('version'),
+                name=meta.get('name'),
+                keys=keys,
+                matrix=matrix,
+                sources=meta.get('sources', {}),
+            )
+        except Exception as e:
+            logger.warning('Failed to load descriptor store from %s: %s', self.path, e)
+            return None
+
+    def save(
+        self,
+        keys: list[str],
+        matrix: np.ndarray,
+        *,
+        internal_version: int,
+        version: str | None,
+        name: str | None,
+        sources: dict[str, str] | None = None,
+    ):
+        """
+        保存描述符。矩阵写入新的文件后再替换索引，旧矩阵即使仍被映射也不受影响。
+
+        :param keys: 每一行对应的 key。
+        :param matrix: 特征矩阵，形状为 (N, D)。
+        :param sources: 数据来源的签名。
+        """
+        try:
+            old = self.__read_index()
+        except Exception:
+            old = None
+        generation = old['generation'] + 1 if isinstance(old, dict) and isinstance(old.get('generation'), int) else 0
+        # 跳过仍然存在（可能仍被映射，无法删除）的文件
+        while os.path.exists(self.matrix_path(generation)):
+            generation += 1
+        meta = {
+            'format': STORE_FORMAT_VERSION,
+            'generation': generation,
+            'internal_version': internal_version,
+            'version': version,
+            'name': name,
+            'keys': keys,
+            'sources': sources or {},
+        }
+        matrix_path = self.matrix_path(generation)
+        tmp_path = matrix_path + '.tmp'
+        tmp_index_path = self.index_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.asarray(matrix, dtype=np.float32), allow_pickle=False)
+        os.replace(tmp_path, matrix_path)
+        # 索引最后写入：在此之前中断时，索引仍指向完整的旧矩阵
+        with open(tmp_index_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_index_path, self.index_path)
+        self.__remove_stale(generation)
+        logger.debug('Descriptor store saved to %s. count=%d', matrix_path, len(keys))
+
+    def __remove_stale(self, generation: int):
+        """删除不再被索引引用的矩阵文件及旧版本的缓存文件。"""
+        directory = os.path.dirname(self.__stem) or '.'
+        prefix = os.path.basename(self.__stem) + '.'
+        current = os.path.basename(self.matrix_path(generation))
+        stale = list(self.legacy_paths)
+        for file in os.listdir(directory):
+            if file == current or not file.startswith(prefix):
+                continue
+            middle = file[len(prefix):].split('.', 1)[0]
+            if middle.isdigit() and file.endswith(('.npy', '.npy.tmp')):
+                stale.append(os.path.join(directory, file))
+        for path in stale:
+            if not os.path.exists(path):
+                continue
+            try:
+                os.remove(path)
+                logger.debug('Removed stale descriptor cache %s.', path)
+            except OSError as e:
+                # Windows 下仍被其他实例映射的文件无法删除，下次再试
+                logger.debug('Failed to remove stale descriptor cache %s: %s', path, e)
+
+
+@dataclass
+class DescriptorBundle:
+    """
+    预先计算好的描述符包，随游戏数据一同发布。
+
+    以 `.npz` 格式保存，不包含任何 pickle 数据。
+    """
+    config: dict
+    """计算特征时使用的参数，见 `ImageDatabase.descriptor_config`"""
+    keys: list[str]
+    md5s: list[str]
+    """每个 key 对应源文件的 md5"""
+    features: np.ndarray
+    """特征矩阵，形状为 (N, D)"""
+
+    def save(self, path: str):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                config=np.array(json.dumps(self.config, sort_keys=True)),
+                keys=np.array(self.keys, dtype=np.str_),
+                md5s=np.array(self.md5s, dtype=np.str_),
+                features=np.asarray(self.features, dtype=np.float32),
+            )
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path: str) -> 'DescriptorBundle | None':
+        """
+        读取描述符包。
+
+        :return: 读取结果。若文件不存在或已损坏，返回 None。
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as npz:
+                bundle = DescriptorBundle(
+                    config=json.loads(str(npz['config'])),
+                    keys=[str(k) for k in npz['keys']],
+                    md5s=[str(m) for m in npz['md5s']],
+                    features=np.asarray(npz['features'], dtype=np.float32),
+                )
+        except Exception as e:
+            logger.warning('Failed to load descriptor bundle from %s: %s', path, e)
+            return None
+        if len(bundle.keys) != len(bundle.md5s) or len(bundle.keys) != bundle.features.shape[0]:
+            logger.warning('Descriptor bundle %s is inconsistent.', path)
+            return None
+        return bundle
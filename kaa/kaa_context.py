@@ -58,5 +58,4 @@ def produce_solution() -> 'ProduceSolution':
     id = conf().tasks.produce.selected_solution_id
     if id is None:
         raise NoProduceSolutionSelectedError()
-    # TODO: 这里需要缓存，不能每次都从磁盘读取
-    return ProduceSolutionManager().read(id)
+    return ProduceSolutionManager().get(id)
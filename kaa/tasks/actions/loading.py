@@ -3,27 +3,67 @@ from logging import getLogger
 
 import cv2
 import numpy as np
+from cv2.typing import MatLike
 
 from kotonebot import device, action, sleep
 from kaa.tasks import R
 
 logger = getLogger(__name__)
 
-@action('检测加载页面', screenshot_mode='manual')
-def loading() -> bool:
-    """检测是否在场景加载页面"""
-    img = device.screenshot()
-    original_img = img.copy()
+LOADING_REGION_RATIO = 0.35
+"""只检测画面上方的这一部分"""
+LOADING_SAMPLE_STRIDE = 4
+"""预检查时的采样步长"""
+
+
+def _binary_color_count(img: MatLike) -> int:
+    """
+    统计二值化后的颜色数量。
+
+    每个通道二值化后只有 0/1 两种取值，因此 BGR 可以压缩为 3 bit 的编码，
+    颜色数量即 8 格直方图中非零格的数量。
+    """
+    _, binary = cv2.threshold(img, 127, 1, cv2.THRESH_BINARY)
+    b, g, r = cv2.split(binary)
+    codes = b | (g << 1) | (r << 2)
+    hist = cv2.calcHist([codes], [0], None, [8], [0, 8])
+    return int(np.count_nonzero(hist))
+
+
+def is_loading_image(img: MatLike, stride: int = LOADING_SAMPLE_STRIDE) -> bool:
+    """
+    判断图片是否为加载画面：二值化后，画面上方 35% 的颜色数量 <= 2。
+
+    先按 `stride` 间隔采样检查。采样得到的颜色是全部颜色的子集，
+    因此采样颜色数量已经超过 2 时可以直接返回 False；
+    否则再对完整区域检查一次，结果与逐像素统计完全一致。
+
+    :param img: BGR 图片。
+    :param stride: 预检查时的采样步长。为 1 时不进行预检查。
+    """
+    region = img[:int(img.shape[0] * LOADING_REGION_RATIO), :]
+    if stride > 1 and _binary_color_count(region[::stride, ::stride]) > 2:
+        return False
+    return _binary_color_count(region) <= 2
+
+
+def _is_loading_image_unique(img: MatLike) -> bool:
+    """`is_loading_image` 的原始实现，用于对比测试。"""
     # 二值化图片
     _, img = cv2.threshold(img, 127, 255, cv2.THRESH_BINARY)
     # 裁剪上面 35%
-    img = img[:int(img.shape[0] * 0.35), :]
+    img = img[:int(img.shape[0] * LOADING_REGION_RATIO), :]
     # 判断图片中颜色数量是否 <= 2
     # https://stackoverflow.com/questions/56606294/count-number-of-unique-colours-in-image
     b,g,r = cv2.split(img)
     shiftet_im = b.astype(np.int64) + 1000 * (g.astype(np.int64) + 1) + 1000 * 1000 * (r.astype(np.int64) + 1)
-    ret = len(np.unique(shiftet_im)) <= 2
-    return ret
+    return len(np.unique(shiftet_im)) <= 2
+
+
+@action('检测加载页面', screenshot_mode='manual')
+def loading() -> bool:
+    """检测是否在场景加载页面"""
+    return is_loading_image(device.screenshot())
 
 @action('等待加载开始')
 def wait_loading_start(timeout: float = 60):
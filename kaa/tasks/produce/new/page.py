@@ -3,6 +3,7 @@ from typing import Any, Callable, Literal, TypeVar, ParamSpec, cast, TYPE_CHECKI
 
 import cv2
 import numpy as np
+from cv2.typing import MatLike
 from kotonebot.primitives import Rect
 from kotonebot.core import BoundPrefab, GameObject, AnyOf, Prefab
 from kotonebot.errors import UnrecoverableError
@@ -13,6 +14,8 @@ from kaa.tasks.common import skip
 from kaa.config.const import ProduceAction
 from kaa.tasks.actions.loading import loading
 from kaa.game_ui import CommuEventButtonUI, dialog, badge
+from kaa.game_ui.scene_classifier import SceneClassifier, SceneFrame, SceneRule
+from kaa.game_ui.digits import DigitReader, glyph_set
 from .consts import Drink, Scene, SceneType, SelectDrinkDialog, PerformanceMetricsVal
 from kaa.tasks.produce.shared.cards import CardDetectResult, detect_recommended_card, skill_card_count
 if TYPE_CHECKING:
@@ -102,16 +105,66 @@ class Flow:
         raise NotImplementedError # pragma: no cover
 
 
+@functools.cache
+def scene_classifier() -> SceneClassifier:
+    """培育中场景判断使用的分类器。规则按优先级从高到低排列。"""
+    return SceneClassifier([
+        # 中断/弹窗
+        SceneRule('pdrink_max', R.InPurodyuusu.TextPDrinkMax),
+        SceneRule('pdrink_max_confirm', R.InPurodyuusu.TextPDrinkMaxConfirmTitle),
+        SceneRule('skill_card_select_guide', R.InPurodyuusu.TextSkillCardSelectGuideDialogTitle),
+        # 对话框
+        SceneRule('select_card', R.InPurodyuusu.TextSkillCard),
+        SceneRule('select_pitem', R.InPurodyuusu.TextPItem),
+        SceneRule('select_drink', R.InPurodyuusu.TextPDrink),
+        # 全屏对话框
+        SceneRule('skill_card_enhance', R.InPurodyuusu.IconTitleSkillCardEnhance),
+        SceneRule('skill_card_removal', R.InPurodyuusu.IconTitleSkillCardRemoval),
+        # 行动-like 场景
+        SceneRule('review_criteria', R.InPurodyuusu.TextReviewCriteria),
+        SceneRule('action_select', R.InPurodyuusu.TextPDiary, R.InPurodyuusu.ButtonFinalPracticeVisual),
+        SceneRule('study', R.InPurodyuusu.IconTitleStudy),
+        SceneRule('outing', R.InPurodyuusu.TitleIconOuting),
+        SceneRule('consult', R.InPurodyuusu.IconTitleConsult),
+        SceneRule('allowance', R.InPurodyuusu.IconTitleAllowance),
+        # 打牌
+        SceneRule('practice', R.InPurodyuusu.TextClearUntil, R.InPurodyuusu.TextPerfectUntil),
+        SceneRule('exam', R.InPurodyuusu.TextExamRankSmallFirst, R.InPurodyuusu.TextExamRankLargeFirst),
+    ])
+
+_INTERRUPT_RULES = ('pdrink_max', 'pdrink_max_confirm', 'skill_card_select_guide')
+_DIALOG_RULES = ('select_card', 'select_pitem', 'select_drink')
+_FULLSCREEN_DIALOG_RULES = ('skill_card_enhance', 'skill_card_removal')
+_ACTION_LIKE_RULES = ('action_select', 'study', 'outing', 'consult', 'allowance')
+_BATTLE_RULES = ('practice', 'exam')
+
+
 class _SceneCheckMixin:
+    """
+    场景判断。
+
+    每一轮只截图一次（由 `_check_loading` 完成），
+    之后的所有判断都在同一帧上通过 `scene_classifier()` 完成。
+    各规则的耗时可通过 `last_scene_frame` 查看。
+    """
+    @property
+    def last_scene_frame(self) -> SceneFrame | None:
+        """上一轮场景判断使用的帧，包含各规则的耗时"""
+        return scene_classifier().last_frame
+
     def check_scene(self) -> Scene | None:
-        return (
-            self._check_loading()
-            or self._check_interrupt_dialogs()
-            or self._check_dialogs()
-            or self._check_fullscreen_dialogs()
-            or self._check_action_like()
-            or self._battle_scene()
+        if scene := self._check_loading():
+            return scene
+        frame = scene_classifier().frame()
+        scene = (
+            self._check_interrupt_dialogs(frame)
+            or self._check_dialogs(frame)
+            or self._check_fullscreen_dialogs(frame)
+            or self._check_action_like(frame)
+            or self._battle_scene(frame)
         )
+        logger.verbose(f"Scene check: {scene.type.name if scene else None} in {frame.summary()}")
+        return scene
 
     def check_interrupt_scene(self) -> Scene | None:
         """仅检测可在“子循环(pump)”中处理的中断/对话框类场景。
@@ -119,11 +172,13 @@ class _SceneCheckMixin:
         注意：这里刻意不包含 ACTION_SELECT / PRACTICE / EXAM 等主流程场景，
         以避免在弹窗处理的阻塞循环中误触发主状态机逻辑。
         """
+        if scene := self._check_loading():
+            return scene
+        frame = scene_classifier().frame()
         return (
-            self._check_loading()
-            or self._check_interrupt_dialogs()
-            or self._check_dialogs()
-            or self._check_fullscreen_dialogs()
+            self._check_interrupt_dialogs(frame)
+            or self._check_dialogs(frame)
+            or self._check_fullscreen_dialogs(frame)
         )
 
     def _check_loading(self) -> Scene | None:
@@ -132,17 +187,21 @@ class _SceneCheckMixin:
             return Scene(SceneType.LOADING)
         return None
 
-    def _check_interrupt_dialogs(self) -> Scene | None:
+    def _check_interrupt_dialogs(self, frame: SceneFrame) -> Scene | None:
         """判断各种中断/弹窗场景"""
-        # P饮料到达上限
-        if R.InPurodyuusu.TextPDrinkMax.exists():
-            logger.debug("Scene detected: PDRINK_MAX")
-            return Scene(SceneType.PDRINK_MAX)
-
-        # P饮料到达上限确认
-        if R.InPurodyuusu.TextPDrinkMaxConfirmTitle.exists():
-            logger.debug("Scene detected: PDRINK_MAX_CONFIRM")
-            return Scene(SceneType.PDRINK_MAX_CONFIRM)
+        match scene_classifier().classify(frame, _INTERRUPT_RULES):
+            # P饮料到达上限
+            case 'pdrink_max':
+                logger.debug("Scene detected: PDRINK_MAX")
+                return Scene(SceneType.PDRINK_MAX)
+            # P饮料到达上限确认
+            case 'pdrink_max_confirm':
+                logger.debug("Scene detected: PDRINK_MAX_CONFIRM")
+                return Scene(SceneType.PDRINK_MAX_CONFIRM)
+            # 第一次技能卡自选引导对话框
+            case 'skill_card_select_guide':
+                dialog.yes()
+                return Scene(SceneType.IDLE)
 
         # # 网络错误弹窗
         # if R.Common.TextNetworkError.exists():
@@ -153,82 +212,69 @@ class _SceneCheckMixin:
         # if R.Daily.TextDateChangeDialog.exists():
         #     logger.debug("Scene detected: DATE_CHANGE")
         #     return Scene(SceneType.DATE_CHANGE)
-        
-        # 第一次技能卡自选引导对话框
-        if R.InPurodyuusu.TextSkillCardSelectGuideDialogTitle.exists():
-            dialog.yes()
-            return Scene(SceneType.IDLE)
-
         return None
 
-    def _check_dialogs(self) -> Scene | None:
-        # 卡片选择
-        logger.verbose("Check skill card select...")
-        if R.InPurodyuusu.TextSkillCard.exists():
-            return Scene(SceneType.SELECT_CARD)
-        
-        # P道具选择
-        logger.verbose("Check PItem select...")
-        if R.InPurodyuusu.TextPItem.exists():
-            return Scene(SceneType.SELECT_PITEM)
-
-        # P饮料选择
-        logger.verbose("Check PDrink select...")
-        if R.InPurodyuusu.TextPDrink.exists():
-            # HACK: 有一定概率 scene check 会识别到动画未结束状态的对话框
-            # 因此这里加一个短暂的延时，确保动画结束
-            # TODO: 也许有更好的方法。此时选择饮料的文本提示已存在，选择按钮也存在，
-            # 三个饮料的图标似乎是从左到右依次出现的，最后跳过领取的勾选框才加载出来。
-            # 如果此时命中，有可能误识别成没有跳过领取的状态
-            sleep(0.3)
-            device.screenshot()
-            return Scene(SceneType.SELECT_DRINK)
+    def _check_dialogs(self, frame: SceneFrame) -> Scene | None:
+        match scene_classifier().classify(frame, _DIALOG_RULES):
+            # 卡片选择
+            case 'select_card':
+                return Scene(SceneType.SELECT_CARD)
+            # P道具选择
+            case 'select_pitem':
+                return Scene(SceneType.SELECT_PITEM)
+            # P饮料选择
+            case 'select_drink':
+                # HACK: 有一定概率 scene check 会识别到动画未结束状态的对话框
+                # 因此这里加一个短暂的延时，确保动画结束
+                # TODO: 也许有更好的方法。此时选择饮料的文本提示已存在，选择按钮也存在，
+                # 三个饮料的图标似乎是从左到右依次出现的，最后跳过领取的勾选框才加载出来。
+                # 如果此时命中，有可能误识别成没有跳过领取的状态
+                sleep(0.3)
+                device.screenshot()
+                return Scene(SceneType.SELECT_DRINK)
+        return None
 
-    def _check_fullscreen_dialogs(self) -> Scene | None:
-        # 技能卡自选强化
-        if R.InPurodyuusu.IconTitleSkillCardEnhance.exists():
-            return Scene(SceneType.SKILL_CARD_ENHANCE)
-        
-        # 技能卡自选删除
-        if R.InPurodyuusu.IconTitleSkillCardRemoval.exists():
-            return Scene(SceneType.SKILL_CARD_REMOVAL)
+    def _check_fullscreen_dialogs(self, frame: SceneFrame) -> Scene | None:
+        match scene_classifier().classify(frame, _FULLSCREEN_DIALOG_RULES):
+            # 技能卡自选强化
+            case 'skill_card_enhance':
+                return Scene(SceneType.SKILL_CARD_ENHANCE)
+            # 技能卡自选删除
+            case 'skill_card_removal':
+                return Scene(SceneType.SKILL_CARD_REMOVAL)
+        return None
 
-    def _check_action_like(self) -> Scene | None:
+    def _check_action_like(self, frame: SceneFrame) -> Scene | None:
         """判断行动-like场景，右上角展示目标值的场景"""
-        if not R.InPurodyuusu.TextReviewCriteria.exists():
+        classifier = scene_classifier()
+        if not classifier.test(frame, 'review_criteria'):
             return None
-        
-        # 行动选择
-        if AnyOf[
-            R.InPurodyuusu.TextPDiary,
-            R.InPurodyuusu.ButtonFinalPracticeVisual
-        ].exists():
-            return Scene(SceneType.ACTION_SELECT)
-
-        # 授業
-        if R.InPurodyuusu.IconTitleStudy.exists():
-            buttons = CommuEventButtonUI().all(False, False)
-            if len(buttons) > 1:
-                return Scene(SceneType.STUDY)
-            else:
-                return Scene(SceneType.IDLE)
-        
-        # おでかけ
-        if R.InPurodyuusu.TitleIconOuting.exists():
-            buttons = CommuEventButtonUI().all(False, False)
-            if len(buttons) > 1:
-                return Scene(SceneType.OUTING)
-            else:
-                return Scene(SceneType.IDLE)
 
-        # 相談
-        if R.InPurodyuusu.IconTitleConsult.exists():
-            return Scene(SceneType.CONSULT)
+        match classifier.classify(frame, _ACTION_LIKE_RULES):
+            # 行动选择
+            case 'action_select':
+                return Scene(SceneType.ACTION_SELECT)
+            # 授業
+            case 'study':
+                buttons = CommuEventButtonUI().all(False, False)
+                if len(buttons) > 1:
+                    return Scene(SceneType.STUDY)
+                else:
+                    return Scene(SceneType.IDLE)
+            # おでかけ
+            case 'outing':
+                buttons = CommuEventButtonUI().all(False, False)
+                if len(buttons) > 1:
+                    return Scene(SceneType.OUTING)
+                else:
+                    return Scene(SceneType.IDLE)
+            # 相談
+            case 'consult':
+                return Scene(SceneType.CONSULT)
+            # 活動支給
+            case 'allowance':
+                return Scene(SceneType.ALLOWANCE)
 
-        # 活動支給
-        if R.InPurodyuusu.IconTitleAllowance.exists():
-            return Scene(SceneType.ALLOWANCE)
-        
         # 培育初始饮料、卡片二选一
         ui = CommuEventButtonUI([ORANGE_RANGE])
         buttons = ui.all(description=False, title=False)
@@ -236,21 +282,15 @@ class _SceneCheckMixin:
             # return InitialDrinkOrCardSelectScene(type=SceneType.INITIAL_DRINK_OR_CARD_SELECT, buttons=buttons)
             device.double_click(buttons[0])
             return Scene(SceneType.IDLE)
-        
-    def _battle_scene(self) -> Scene | None:
-        """判断打牌场景"""
-        if AnyOf[
-            R.InPurodyuusu.TextClearUntil,
-            R.InPurodyuusu.TextPerfectUntil,
-        ].exists():
-            return Scene(SceneType.PRACTICE)
-        
-        if AnyOf[
-            R.InPurodyuusu.TextExamRankSmallFirst,
-            R.InPurodyuusu.TextExamRankLargeFirst,
-        ].exists():
-            return Scene(SceneType.EXAM)
+        return None
 
+    def _battle_scene(self, frame: SceneFrame) -> Scene | None:
+        """判断打牌场景"""
+        match scene_classifier().classify(frame, _BATTLE_RULES):
+            case 'practice':
+                return Scene(SceneType.PRACTICE)
+            case 'exam':
+                return Scene(SceneType.EXAM)
         return None
 
 
@@ -358,6 +398,15 @@ class PItemSelectContext(Context):
         logger.debug("Clicked Acquire button for PItem.")
 
 
+@functools.cache
+def _param_reader() -> DigitReader:
+    """行动页属性值读取器。字形模板置信度不足时，回退到 OCR。"""
+    return DigitReader(
+        glyph_set('outlined'),
+        fallback=lambda img: ocr.raw().ocr(img).squash().text,
+    )
+
+
 class ActionSelectContext(Context):
     """行动页面相关操作"""
     @eval_once
@@ -459,22 +508,17 @@ class ActionSelectContext(Context):
         else:
             raise ValueError("Unrecognized sensei tip action.")
 
-    def _read_number(self, box: Rect) -> int:
-        all_number = ocr.ocr(rect=box)
-        all_number = all_number.squash().numbers()
-        if all_number:
-            try:
-                return int(all_number[0])
-            except Exception:
-                return 0
-        return 0
+    def _read_number(self, img: MatLike, box: Rect) -> int:
+        value = _param_reader().read_int(img[box.y1:box.y2, box.x1:box.x2])
+        return value if value is not None else 0
 
     @eval_once
     def fetch_perf_metrics(self) -> list[PerformanceMetricsVal]:
-        cur_vo = self._read_number(R.InPurodyuusu.CurVoValue)
-        cur_da = self._read_number(R.InPurodyuusu.CurDaValue)
-        cur_vi = self._read_number(R.InPurodyuusu.CurViValue)
-        max_val = self._read_number(R.InPurodyuusu.MaxDaValue)
+        img = device.screenshot()
+        cur_vo = self._read_number(img, R.InPurodyuusu.CurVoValue)
+        cur_da = self._read_number(img, R.InPurodyuusu.CurDaValue)
+        cur_vi = self._read_number(img, R.InPurodyuusu.CurViValue)
+        max_val = self._read_number(img, R.InPurodyuusu.MaxDaValue)
 
         return [
             PerformanceMetricsVal(current=cur_vi, max=max_val, lesson=ProduceAction.VISUAL),
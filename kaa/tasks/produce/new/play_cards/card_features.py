@@ -0,0 +1,281 @@
+"""
+技能卡特征表与专家系统评分。
+
+每张卡的出牌效果按效果类型汇总为一个特征向量：
+`[各类型效果数量 | 各类型 effect_value1 之和 | 各类型 effect_turn 之和]`。
+所有卡的特征向量在首次使用时从 game.db 一次性计算并缓存。
+
+评分时，一手牌的效果分数即为特征矩阵与权重向量的点积；
+分数倍率同样是特征矩阵与"当前阶段"权重向量的点积。
+因此替换权重（`ScoringWeights`）即可离线批量比较不同的评分方案。
+"""
+import threading
+from dataclasses import dataclass
+from logging import getLogger
+from typing import NamedTuple, Sequence
+
+import numpy as np
+
+from kaa.db.catalog import SkillCatalog, skill_catalog
+from kaa.db.constants import ProduceExamEffectType
+from kaa.db.skill_card import SkillCard
+
+logger = getLogger(__name__)
+
+_T = ProduceExamEffectType
+EFFECT_TYPES: tuple[ProduceExamEffectType, ...] = tuple(ProduceExamEffectType)
+"""特征向量中效果类型的顺序"""
+_TYPE_INDEX = {t: i for i, t in enumerate(EFFECT_TYPES)}
+N_TYPES = len(EFFECT_TYPES)
+N_FEATURES = N_TYPES * 3
+"""特征向量长度"""
+
+Stage = str
+"""阶段。`late`=回合后期，`early`=回合前期，`low_stamina`=元气不足"""
+STAGES: tuple[Stage, ...] = ('late', 'early', 'low_stamina')
+
+STAGE_BOOSTS: dict[Stage, float] = {
+    'late': 0.15,
+    'early': 0.1,
+    'low_stamina': 0.2,
+}
+"""处于对应阶段时，每个相关效果使分数倍率增加的值"""
+
+
+class EffectRule(NamedTuple):
+    """单个效果的评分规则。分数 = base + per_value * effect_value1 + per_turn * effect_turn"""
+    base: float = 0.0
+    per_value: float = 0.0
+    per_turn: float = 0.0
+    stages: tuple[Stage, ...] = ()
+    """处于这些阶段时，该效果会提高分数倍率"""
+
+
+_EARLY = ('early',)
+_LATE = ('late',)
+EFFECT_RULES: dict[ProduceExamEffectType, EffectRule] = {
+    _T.ExamLesson: EffectRule(per_value=1, stages=_LATE),
+    _T.ExamBlock: EffectRule(per_value=2, stages=('low_stamina', 'early')),
+    _T.ExamPlayableValueAdd: EffectRule(1000), # 技能卡使用次数追加
+    _T.ExamCardDraw: EffectRule(50),
+    _T.ExamCardUpgrade: EffectRule(20),
+    _T.ExamAntiDebuff: EffectRule(20),
+    _T.ExamDebuffRecover: EffectRule(100),
+    _T.ExamExtraTurn: EffectRule(1000), # 回合追加
+    _T.ExamHandGraveCountCardDraw: EffectRule(1000),
+    _T.ExamLessonValueMultiple: EffectRule(1000, stages=_EARLY),
+    _T.ExamSearchPlayCardStaminaConsumptionChange: EffectRule(100),
+    _T.ExamStatusEnchant: EffectRule(100),
+    _T.ExamAddGrowEffect: EffectRule(100, stages=_EARLY),
+    _T.ExamCardCreateSearch: EffectRule(100),
+    _T.ExamCardSearchEffectPlayCountBuff: EffectRule(1000),
+    _T.ExamLessonBuff: EffectRule(per_value=2, stages=_EARLY), # 集中
+    _T.ExamLessonAddMultipleLessonBuff: EffectRule(1000, stages=_EARLY), # 集中翻倍
+    _T.ExamParameterBuff: EffectRule(per_turn=4, stages=_EARLY), # 好调
+    _T.ExamParameterBuffMultiplePerTurn: EffectRule(per_turn=10, stages=_EARLY), # 绝好调
+    _T.ExamLessonDependParameterBuff: EffectRule(100, stages=_LATE),
+    _T.ExamMultipleLessonBuffLesson: EffectRule(200, stages=_LATE),
+    _T.ExamCardPlayAggressive: EffectRule(per_value=2, stages=_EARLY),
+    _T.ExamAggressiveValueMultiple: EffectRule(1000, stages=_EARLY),
+    _T.ExamReview: EffectRule(per_value=2, stages=_EARLY),
+    _T.ExamReviewAdditive: EffectRule(1000, stages=_EARLY),
+    _T.ExamReviewValueMultiple: EffectRule(1000, stages=_EARLY),
+    _T.ExamBlockAddMultipleAggressive: EffectRule(100, stages=_EARLY),
+    _T.ExamBlockPerUseCardCount: EffectRule(100, stages=_EARLY),
+    _T.ExamLessonDependExamCardPlayAggressive: EffectRule(per_value=1 / 100, stages=_LATE),
+    _T.ExamLessonDependBlock: EffectRule(per_value=1 / 50, stages=_LATE),
+    _T.ExamLessonDependExamReview: EffectRule(per_value=1 / 50, stages=_LATE),
+    _T.ExamConcentration: EffectRule(100, stages=_EARLY),
+    _T.ExamPreservation: EffectRule(200, stages=_EARLY),
+    _T.ExamFullPowerPoint: EffectRule(per_value=2, stages=_EARLY),
+    _T.ExamEnthusiasticAdditive: EffectRule(per_value=2, stages=_EARLY),
+    _T.ExamLessonFullPowerPoint: EffectRule(100, stages=_LATE),
+    _T.ExamLessonAddMultipleParameterBuff: EffectRule(200, stages=_LATE),
+    _T.ExamStaminaConsumptionAdd: EffectRule(-10),
+    _T.ExamStaminaConsumptionDown: EffectRule(per_turn=2),
+    _T.ExamStaminaConsumptionDownFix: EffectRule(per_value=2),
+    _T.ExamStaminaRecoverFix: EffectRule(10, stages=('low_stamina',)),
+    _T.ExamStaminaRecoverMultiple: EffectRule(10, stages=('low_stamina',)),
+}
+"""效果评分规则。未列出的效果类型不计分。"""
+
+
+def card_features(card: SkillCard) -> np.ndarray:
+    """
+    计算单张卡的特征向量。
+
+    :return: 形状为 (N_FEATURES,) 的 float64 数组。
+    """
+    row = np.zeros(N_FEATURES, dtype=np.float64)
+    for effect in card.play_effects:
+        produce_effect = effect.produce_exam_effect
+        if not produce_effect or not produce_effect.effect_type:
+            continue
+        i = _TYPE_INDEX[produce_effect.effect_type]
+        row[i] += 1
+        row[N_TYPES + i] += produce_effect.effect_value1 or 0
+        row[N_TYPES * 2 + i] += produce_effect.effect_turn or 0
+    return row
+
+
+def card_cost(card: SkillCard) -> tuple[int, bool]:
+    """
+    :return: `(费用, 是否消耗元气)`。不消耗元气时，表示直接消耗体力。
+    """
+    return card.stamina or card.force_stamina or 0, (card.stamina or 0) > 0
+
+
+@dataclass(frozen=True)
+class ScoringWeights:
+    """评分权重。各向量的长度均为 `N_FEATURES`。"""
+    effect: np.ndarray
+    """效果分数权重"""
+    boosts: dict[Stage, np.ndarray]
+    """各阶段的分数倍率权重"""
+    free_cost: int = 4
+    """不扣分的最高费用"""
+    low_hp_cost_weight: float = 2.0
+    """体力不足时，消耗体力的费用惩罚倍率"""
+
+    @staticmethod
+    def from_rules(
+        rules: dict[ProduceExamEffectType, EffectRule] = EFFECT_RULES,
+        stage_boosts: dict[Stage, float] = STAGE_BOOSTS,
+    ) -> 'ScoringWeights':
+        """由效果评分规则生成权重。"""
+        effect = np.zeros(N_FEATURES, dtype=np.float64)
+        boosts = {stage: np.zeros(N_FEATURES, dtype=np.float64) for stage in STAGES}
+        for effect_type, rule in rules.items():
+            i = _TYPE_INDEX[effect_type]
+            effect[i] = rule.base
+            effect[N_TYPES + i] = rule.per_value
+            effect[N_TYPES * 2 + i] = rule.per_turn
+            for stage in rule.stages:
+                boosts[stage][i] = stage_boosts[stage]
+        return ScoringWeights(effect, boosts)
+
+    def boost(self, stages: Sequence[Stage]) -> np.ndarray:
+        """当前所处各阶段的分数倍率权重之和"""
+        result = np.zeros(N_FEATURES, dtype=np.float64)
+        for stage in stages:
+            result += self.boosts[stage]
+        return result
+
+
+class BattleState(NamedTuple):
+    """评分时使用的战斗状态"""
+    stamina: int
+    """元气"""
+    hp: int
+    """体力"""
+    remaining_turns: int
+    """剩余回合数"""
+
+    @property
+    def stages(self) -> tuple[Stage, ...]:
+        turn_ratio = (10 - self.remaining_turns) / 10
+        stages: list[Stage] = []
+        if turn_ratio < 0.3:
+            stages.append('late')
+        if turn_ratio > 0.6:
+            stages.append('early')
+        if self.stamina / 20 < 0.3:
+            stages.append('low_stamina')
+        return tuple(stages)
+
+
+class CardFeatureTable:
+    """
+    技能卡特征表。
+
+    首次使用时为技能卡目录中的所有卡（包括各强化等级）计算特征，
+    以 `(id, upgrade_count)` 为 key 建立索引。目录重新加载后自动重建。
+    """
+    def __init__(self, catalog: SkillCatalog | None = None):
+        self.__catalog = catalog
+        self.__lock = threading.Lock()
+        self.__generation: int | None = None
+        self.__rows: dict[tuple[str, int | None], int] = {}
+        self.features = np.empty((0, N_FEATURES), dtype=np.float64)
+        """特征矩阵，形状为 (N, N_FEATURES)"""
+        self.costs = np.empty((0,), dtype=np.float64)
+        """费用"""
+        self.uses_stamina = np.empty((0,), dtype=bool)
+        """是否消耗元气"""
+
+    @property
+    def catalog(self) -> SkillCatalog:
+        return self.__catalog or skill_catalog()
+
+    def __ensure_built(self):
+        generation = self.catalog.generation
+        if self.__generation == generation:
+            return
+        with self.__lock:
+            if self.__generation == generation:
+                return
+            cards = self.catalog.all_cards()
+            self.__rows = {}
+            self.features = np.empty((0, N_FEATURES), dtype=np.float64)
+            self.costs = np.empty((0,), dtype=np.float64)
+            self.uses_stamina = np.empty((0,), dtype=bool)
+            self.__append(cards)
+            self.__generation = generation
+            logger.info('Card feature table built. cards=%d', len(self.__rows))
+
+    def __append(self, cards: Sequence[SkillCard]):
+        new_cards = []
+        for card in cards:
+            key = (card._id, card.upgrade_count)
+            if key not in self.__rows:
+                self.__rows[key] = len(self.__rows)
+                new_cards.append(card)
+        if not new_cards:
+            return
+        costs = [card_cost(card) for card in new_cards]
+        self.features = np.concatenate([self.features, np.stack([card_features(c) for c in new_cards])])
+        self.costs = np.concatenate([self.costs, np.array([c for c, _ in costs], dtype=np.float64)])
+        self.uses_stamina = np.concatenate([self.uses_stamina, np.array([s for _, s in costs], dtype=bool)])
+
+    def rows(self, cards: Sequence[SkillCard]) -> np.ndarray:
+        """
+        返回各张卡在特征表中的行号。不在目录中的卡会被追加到表中。
+        """
+        self.__ensure_built()
+        missing = [c for c in cards if (c._id, c.upgrade_count) not in self.__rows]
+        if missing:
+            with self.__lock:
+                self.__append(missing)
+        return np.array([self.__rows[(c._id, c.upgrade_count)] for c in cards], dtype=np.intp)
+
+
+def score_cards(
+    table: CardFeatureTable,
+    cards: Sequence[SkillCard],
+    state: BattleState,
+    weights: ScoringWeights,
+) -> np.ndarray:
+    """
+    为一组卡评分。
+
+    :return: 各张卡的分数，顺序与 `cards` 一致。
+    """
+    rows = table.rows(cards)
+    features = table.features[rows]
+    # 效果分数 * 倍率
+    score_effects = features @ weights.effect
+    multiplier = 1 + features @ weights.boost(state.stages)
+    # 费用惩罚：超出部分按权重扣分，体力越少惩罚越大
+    costs = table.costs[rows]
+    hp_weight = weights.low_hp_cost_weight if state.hp / 20 < 0.3 else 1.0
+    cost_weight = np.where(table.uses_stamina[rows], 1.0, hp_weight)
+    score_cost = -np.maximum(costs - weights.free_cost, 0) * cost_weight
+    return score_effects * multiplier + score_cost
+
+
+_table = CardFeatureTable()
+
+
+def card_feature_table() -> CardFeatureTable:
+    """返回全局技能卡特征表"""
+    return _table
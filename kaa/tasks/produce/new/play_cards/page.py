@@ -10,6 +10,7 @@ from kotonebot.primitives import Rect
 from kotonebot import logging, device, Loop, Countdown
 
 from kaa.tasks import R
+from kaa.game_ui.digits import DigitReader, glyph_set
 from .ui import CardGameObject, locate_cards
 from kaa.tasks.produce.new.page import eval_once
 
@@ -40,17 +41,63 @@ def _digits_from_image(img: MatLike) -> list[int]:
     return [int(n) for n in nums]
 
 
-def _fetch_int(box: Rect) -> int | None:
-    screen = device.screenshot()
+@lru_cache(maxsize=1)
+def _digit_reader() -> DigitReader:
+    # 字形模板置信度不足时，回退到 ddddocr
+    return DigitReader(
+        glyph_set('outlined'),
+        fallback=lambda img: ' '.join(str(n) for n in _digits_from_image(img)),
+    )
+
+
+def _fetch_int(box: Rect, screen: MatLike | None = None) -> int | None:
+    if screen is None:
+        screen = device.screenshot()
     crop = screen[box.y1:box.y2, box.x1:box.x2]
-    nums = _digits_from_image(crop)
-    return nums[0] if nums else None
+    return _digit_reader().read_int(crop)
 
 class HudInfo(NamedTuple):
     remaining_turns: int | None
     hp: int | None
     genki: int | None
 
+
+class HudReader:
+    """
+    从单帧截图中读取 HUD 上的所有数值。
+
+    同一帧只识别一次，结果按帧缓存。帧以截图数组本身作为标识，
+    缓存期间持有该数组的引用，因此不会与之后的截图混淆。
+    """
+    def __init__(self):
+        self.__frame: MatLike | None = None
+        self.__info: HudInfo | None = None
+
+    def read(self, screen: MatLike) -> HudInfo:
+        """
+        读取 HUD 数值。
+
+        :param screen: 截图。
+        """
+        if self.__frame is screen and self.__info is not None:
+            return self.__info
+        boxes = (
+            R.InPurodyuusu.InLesson.BoxRemainingTurns,
+            R.InPurodyuusu.InLesson.BoxHp,
+            R.InPurodyuusu.InLesson.BoxGenki,
+        )
+        info = HudInfo(*(_fetch_int(box, screen) for box in boxes))
+        logger.debug('HUD: %s', info)
+        self.__frame = screen
+        self.__info = info
+        return info
+
+
+@lru_cache(maxsize=1)
+def hud_reader() -> HudReader:
+    return HudReader()
+
+
 def _screenshot_hud() -> MatLike:
     screen = device.screenshot()
     h, w, _ = screen.shape
@@ -58,34 +105,39 @@ def _screenshot_hud() -> MatLike:
     return hud
 
 class LessonBattleContext:
-    """课程打牌页面"""
+    """
+    课程打牌页面
+
+    所有数据都从同一帧截图中读取，该截图在首次获取数据时截取。
+    """
+    def __init__(self):
+        self.__screen: MatLike | None = None
+
+    def _screenshot(self) -> MatLike:
+        if self.__screen is None:
+            self.__screen = device.screenshot()
+        return self.__screen
 
-    @eval_once
     def fetch_remaining_turns(self) -> int | None:
         """获取剩余回合数"""
-        return _fetch_int(R.InPurodyuusu.InLesson.BoxRemainingTurns)
+        return self.fetch_all().remaining_turns
     
-    @eval_once
     def fetch_hp(self) -> int | None:
         """获取当前体力"""
-        return _fetch_int(R.InPurodyuusu.InLesson.BoxHp)
+        return self.fetch_all().hp
     
-    @eval_once
     def fetch_stamina(self) -> int | None:
         """获取当前元气值"""
-        return _fetch_int(R.InPurodyuusu.InLesson.BoxGenki)
+        return self.fetch_all().genki
     
-    @eval_once
-    def fetch_all(self):
-        remaining_turns = _fetch_int(R.InPurodyuusu.InLesson.BoxRemainingTurns)
-        hp = _fetch_int(R.InPurodyuusu.InLesson.BoxHp)
-        genki = _fetch_int(R.InPurodyuusu.InLesson.BoxGenki)
-        return HudInfo(remaining_turns, hp, genki)
+    def fetch_all(self) -> HudInfo:
+        """获取 HUD 上的所有数值"""
+        return hud_reader().read(self._screenshot())
     
     @eval_once
     def fetch_hands(self):
         """获取手牌信息"""
-        img = device.screenshot()
+        img = self._screenshot()
         cards = locate_cards(img)
         return cards
 
@@ -0,0 +1,347 @@
+"""
+离线出牌模拟器。
+
+在不连接模拟器的情况下，用 game.db 中的技能卡数据模拟课程/考试的出牌过程，
+以便大规模评估 `AbstractBattleStrategy` 的效果与耗时。
+
+模拟器只实现了常见效果（参数、元气、好调、绝好调、集中、好印象、やる気、抽卡、
+回合追加、使用次数追加、体力消耗增减、体力回复及依赖元气/好印象的参数），
+其余效果会被忽略并计入 `LessonResult.ignored_effects`。
+数值规则是对游戏的近似，适合比较策略的相对优劣，而不是预测真实得分。
+
+策略通过 `SimulatedBattleContext` 接入。它实现了 `LessonBattleContext` 的接口，
+因此依赖截图的策略（如 `BandaiStrategy`）无法在此运行。
+"""
+import math
+import time
+import random
+from dataclasses import dataclass, field
+from logging import getLogger
+from typing import Any, Sequence
+
+from kaa.db.constants import ProduceExamEffectType
+from kaa.db.skill_card import SkillCard
+from .page import HudInfo
+from .strategy import AbstractBattleStrategy
+
+logger = getLogger(__name__)
+
+_T = ProduceExamEffectType
+PERMANENT_TURNS = 99
+"""effect_turn 为 -1（永久）时使用的回合数"""
+
+
+@dataclass
+class LessonConfig:
+    """模拟参数"""
+    turns: int = 10
+    """回合数"""
+    hp: int = 30
+    """初始体力"""
+    max_hp: int = 30
+    """体力上限"""
+    genki: int = 0
+    """初始元气"""
+    draw_per_turn: int = 3
+    """每回合抽卡数"""
+    skip_recover: int = 2
+    """跳过回合时回复的体力"""
+    max_extra_turns: int = 5
+    """最多追加的回合数，避免无限循环"""
+    max_plays_per_turn: int = 10
+    """每回合最多使用的卡数，避免无限循环"""
+
+
+@dataclass
+class LessonState:
+    """模拟中的战斗状态"""
+    remaining_turns: int
+    hp: int
+    genki: int
+    score: int = 0
+    """获得的参数"""
+    good_condition: int = 0
+    """好调回合数"""
+    perfect_condition: int = 0
+    """绝好调回合数"""
+    concentration: int = 0
+    """集中"""
+    impression: int = 0
+    """好印象"""
+    motivation: int = 0
+    """やる気"""
+    cost_down: int = 0
+    """体力消耗减少回合数"""
+    cost_up: int = 0
+    """体力消耗增加回合数"""
+    plays_left: int = 1
+    """本回合剩余可使用卡数"""
+
+
+@dataclass
+class SimulatedCard:
+    """手牌中的一张卡。接口与 `CardGameObject` 中策略会用到的部分一致。"""
+    card: SkillCard
+    available: bool
+    index: int
+    """在手牌中的下标"""
+
+
+@dataclass
+class LessonResult:
+    score: int
+    """最终获得的参数"""
+    turns: int
+    """实际进行的回合数（包括追加回合）"""
+    cards_played: int
+    skips: int
+    decision_times: list[float] = field(default_factory=list)
+    """每次决策（`on_action` 调用）的耗时，单位秒"""
+    ignored_effects: dict[ProduceExamEffectType, int] = field(default_factory=dict)
+    """未被模拟的效果及其出现次数"""
+
+
+class LessonSimulator:
+    """
+    课程/考试模拟器。
+
+    用法：
+    ```python
+    sim = LessonSimulator(deck, rng=random.Random(0))
+    result = sim.run(ExpertSystemStrategy())
+    ```
+    """
+    def __init__(
+        self,
+        deck: Sequence[SkillCard],
+        config: LessonConfig | None = None,
+        *,
+        rng: random.Random | None = None,
+    ):
+        """
+        :param deck: 牌组。
+        :param config: 模拟参数。
+        :param rng: 随机数生成器，用于洗牌。
+        """
+        if len(deck) == 0:
+            raise ValueError('Deck is empty.')
+        self.config = config or LessonConfig()
+        self.rng = rng or random.Random()
+        self.draw_pile: list[SkillCard] = list(deck)
+        self.rng.shuffle(self.draw_pile)
+        self.discard_pile: list[SkillCard] = []
+        self.hand: list[SkillCard] = []
+        self.state = LessonState(
+            remaining_turns=self.config.turns,
+            hp=self.config.hp,
+            genki=self.config.genki,
+        )
+        self.turns = 0
+        self.cards_played = 0
+        self.skips = 0
+        self.ignored_effects: dict[ProduceExamEffectType, int] = {}
+
+    @property
+    def finished(self) -> bool:
+        return self.state.remaining_turns <= 0
+
+    # ====== 牌堆 ======
+    def draw(self, count: int):
+        for _ in range(count):
+            if not self.draw_pile:
+                if not self.discard_pile:
+                    return
+                self.draw_pile = self.discard_pile
+                self.discard_pile = []
+                self.rng.shuffle(self.draw_pile)
+            self.hand.append(self.draw_pile.pop())
+
+    def start_turn(self):
+        self.turns += 1
+        self.state.plays_left = 1
+        self.draw(self.config.draw_per_turn)
+
+    def end_turn(self):
+        s = self.state
+        # 好印象：回合结束时获得等量参数，然后减 1
+        if s.impression > 0:
+            s.score += s.impression
+            s.impression -= 1
+        s.good_condition = max(0, s.good_condition - 1)
+        s.perfect_condition = max(0, s.perfect_condition - 1)
+        s.cost_down = max(0, s.cost_down - 1)
+        s.cost_up = max(0, s.cost_up - 1)
+        s.remaining_turns -= 1
+        self.discard_pile.extend(self.hand)
+        self.hand = []
+
+    # ====== 出牌 ======
+    def cost(self, card: SkillCard) -> tuple[int, bool]:
+        """
+        :return: `(实际消耗, 是否可先扣元气)`
+        """
+        base = card.stamina or card.force_stamina or 0
+        by_genki = (card.stamina or 0) > 0
+        if self.state.cost_down > 0:
+            base = math.ceil(base * 0.5)
+        if self.state.cost_up > 0:
+            base = math.ceil(base * 1.5)
+        return base, by_genki
+
+    def playable(self, card: SkillCard) -> bool:
+        cost, by_genki = self.cost(card)
+        if by_genki:
+            return self.state.genki + self.state.hp >= cost
+        return self.state.hp >= cost
+
+    def hands(self) -> list[SimulatedCard]:
+        return [SimulatedCard(card, self.playable(card), i) for i, card in enumerate(self.hand)]
+
+    def play(self, index: int):
+        """打出手牌中的第 `index` 张卡。"""
+        card = self.hand[index]
+        if not self.playable(card):
+            raise ValueError(f'Card {card.name} is not playable.')
+        s = self.state
+        cost, by_genki = self.cost(card)
+        if by_genki:
+            absorbed = min(s.genki, cost)
+            s.genki -= absorbed
+            cost -= absorbed
+        s.hp -= cost
+        self.hand.pop(index)
+        self.discard_pile.append(card)
+        self.cards_played += 1
+        s.plays_left -= 1
+        for effect in card.play_effects:
+            if effect.produce_exam_effect is not None:
+                self.apply(effect.produce_exam_effect)
+
+    def skip(self):
+        """跳过本回合。"""
+        self.skips += 1
+        self.state.hp = min(self.config.max_hp, self.state.hp + self.config.skip_recover)
+        self.state.plays_left = 0
+
+    def apply(self, effect: Any):
+        """应用单个考试效果（`ProduceExamEffect`）。"""
+        effect_type = effect.effect_type
+        value = effect.effect_value1 or 0
+        turn = effect.effect_turn or 0
+        if turn < 0:
+            turn = PERMANENT_TURNS
+        s = self.state
+        match effect_type:
+            case _T.ExamLesson:
+                s.score += self.lesson_value(value)
+            case _T.ExamBlock:
+                s.genki += value + s.motivation
+            case _T.ExamParameterBuff:
+                s.good_condition += turn
+            case _T.ExamParameterBuffMultiplePerTurn:
+                s.perfect_condition += turn
+            case _T.ExamLessonBuff:
+                s.concentration += value
+            case _T.ExamReview:
+                s.impression += value
+            case _T.ExamCardPlayAggressive:
+                s.motivation += value
+            case _T.ExamCardDraw:
+                self.draw(value or 1)
+            case _T.ExamExtraTurn:
+                s.remaining_turns += value or 1
+            case _T.ExamPlayableValueAdd:
+                s.plays_left += value or 1
+            case _T.ExamStaminaConsumptionDown:
+                s.cost_down += turn
+            case _T.ExamStaminaConsumptionAdd:
+                s.cost_up += turn
+            case _T.ExamStaminaRecoverFix:
+                s.hp = min(self.config.max_hp, s.hp + value)
+            case _T.ExamLessonDependBlock:
+                # value1 为千分比
+                s.score += math.ceil(s.genki * value / 1000)
+            case _T.ExamLessonDependExamReview:
+                s.score += math.ceil(s.impression * value / 1000)
+            case _:
+                if effect_type is not None:
+                    self.ignored_effects[effect_type] = self.ignored_effects.get(effect_type, 0) + 1
+
+    def lesson_value(self, value: int) -> int:
+        """计算参数类效果实际获得的参数"""
+        s = self.state
+        multiplier = 1.0
+        if s.good_condition > 0:
+            multiplier += 0.5
+            if s.perfect_condition > 0:
+                multiplier += s.good_condition * 0.1
+        return math.ceil((value + s.concentration) * multiplier)
+
+    # ====== 运行 ======
+    def run(self, strategy: AbstractBattleStrategy) -> LessonResult:
+        """
+        使用指定策略模拟整场课程。
+
+        每回合反复调用 `strategy.on_action`，直到本回合不能再出牌。
+        若策略没有出牌，则视为跳过本回合。
+        """
+        decision_times: list[float] = []
+        max_turns = self.config.turns + self.config.max_extra_turns
+        while not self.finished and self.turns < max_turns:
+            self.start_turn()
+            plays = 0
+            while self.state.plays_left > 0 and self.hand and plays < self.config.max_plays_per_turn:
+                plays += 1
+                ctx = SimulatedBattleContext(self)
+                start = time.perf_counter()
+                strategy.on_action(ctx)  # type: ignore[arg-type]
+                decision_times.append(time.perf_counter() - start)
+                if ctx.committed is None:
+                    self.skip()
+                    break
+            self.end_turn()
+        return LessonResult(
+            score=self.state.score,
+            turns=self.turns,
+            cards_played=self.cards_played,
+            skips=self.skips,
+            decision_times=decision_times,
+            ignored_effects=dict(self.ignored_effects),
+        )
+
+
+class SimulatedBattleContext:
+    """
+    模拟器中的打牌页面。接口与 `LessonBattleContext` 一致。
+    """
+    def __init__(self, simulator: LessonSimulator):
+        self.simulator = simulator
+        self.committed: SimulatedCard | None = None
+        self.__hands: list[SimulatedCard] | None = None
+
+    def fetch_remaining_turns(self) -> int | None:
+        return self.simulator.state.remaining_turns
+
+    def fetch_hp(self) -> int | None:
+        return self.simulator.state.hp
+
+    def fetch_stamina(self) -> int | None:
+        return self.simulator.state.genki
+
+    def fetch_all(self) -> HudInfo:
+        s = self.simulator.state
+        return HudInfo(s.remaining_turns, s.hp, s.genki)
+
+    def fetch_hands(self) -> list[SimulatedCard]:
+        if self.__hands is None:
+            self.__hands = self.simulator.hands()
+        return self.__hands
+
+    def commit(self, card: SimulatedCard):
+        if self.committed is not None:
+            raise RuntimeError('A card has already been committed in this context.')
+        self.simulator.play(card.index)
+        self.committed = card
+
+    def wait_stablized(self, *, timeout: float = float('inf'), interval: float = 0.5, stable_time: float = 3) -> bool:
+        return True
@@ -15,8 +15,10 @@ from kotonebot.backend import color
 
 from kaa.tasks import R
 from kaa.util import paths
+from kaa.game_data import events as game_data_events
 from kaa.image_db import ImageDatabase, FileDataSource
 from kaa.db.skill_card import SkillCard
+from kaa.db.catalog import skill_catalog
 
 DEBUG = False
 CARD_OFFSET = (57, 148) # 从字母位置到卡片左上角的偏移量 x, y
@@ -24,6 +26,8 @@ CARD_SCALE = 168 / 256 # 原始卡面图像 到 1280x720 截图中卡面图像
 
 logger = logging.getLogger(__name__)
 _db: ImageDatabase | None = None
+_db_generation: int | None = None
+"""`_db` 载入时的游戏数据版本号"""
 
 @dataclass
 class CardGameObject(GameObject):
@@ -43,13 +47,8 @@ class CardGameObject(GameObject):
 
 class CardImageDatabase(ImageDatabase):
     @override
-    def insert(self, key, image, *, overwrite = False):
-        if isinstance(image, str):
-            img = cv2.imread(image)
-            if img is None:
-                raise ValueError(f'Cannot read image from path: {image}')
-        else:
-            img = image
+    def describe(self, image):
+        img = image
         # 截取从下边缘中点为右下角，
         # 到 CARD_OFFSET * CARD_SCALE 为左上角的区域
         h, w, _ = img.shape
@@ -64,15 +63,28 @@ class CardImageDatabase(ImageDatabase):
         #     cv2.imshow('original_with_rect', cv2.resize(debug_img, (0,0), fx=0.5, fy=0.5))
         #     cv2.imshow('half_img', cv2.resize(half_img, (0,0), fx=2, fy=2))
         #     cv2.waitKey(0)
-        return super().insert(key, half_img, overwrite=overwrite)
+        return super().describe(half_img)
+
+    @override
+    def descriptor_config(self) -> dict:
+        return {
+            **super().descriptor_config(),
+            'crop': {'card_offset': list(CARD_OFFSET), 'card_scale': CARD_SCALE},
+        }
 
 def skill_cards_db() -> ImageDatabase:
-    global _db
-    if _db is None:
+    global _db, _db_generation
+    # 游戏数据被替换后重新载入。数据库会与新的图片增量同步
+    generation = game_data_events.generation()
+    if _db is None or _db_generation != generation:
         logger.info('Loading skill_cards database...')
+        # 先释放旧实例，使其映射的旧矩阵文件在新实例保存后可以被删除
+        _db = None
         path = paths.resource('skill_cards')
-        db_path = paths.cache('skill_cards.pkl')
-        _db = CardImageDatabase(FileDataSource(str(path)), db_path, HogDescriptor(), name='skill_cards')
+        db_path = paths.cache('skill_cards.npy')
+        bundle_path = paths.descriptors('skill_cards')
+        _db = CardImageDatabase(FileDataSource(str(path)), db_path, HogDescriptor(), name='skill_cards', bundle_path=bundle_path)
+        _db_generation = generation
     return _db
 
 
@@ -121,11 +133,15 @@ def locate_cards(img: MatLike):
     _show_rects('cards', img, card_regions)
 
     # 根据图像查卡片
-    results: list[CardGameObject | None] = []
-    for region, letter in zip(card_regions, letters):
+    card_imgs = []
+    for region in card_regions:
         x, y, w, h = region.xywh
-        card_img = img[y:y+h, x:x+w]
-        result = skill_cards_db().match(card_img, threshold=150)
+        card_imgs.append(img[y:y+h, x:x+w])
+    # 一次性批量查询所有卡片
+    batch = skill_cards_db().match_batch(card_imgs, k=1, threshold=150)
+    results: list[CardGameObject | None] = []
+    for region, letter, matches in zip(card_regions, letters, batch):
+        result = matches[0] if len(matches) > 0 else None
         available = color.find(img, '#7a7d7d', rect=letter) is None
         if result is not None:
             # 从资源名称中提取 asset_id
@@ -134,7 +150,7 @@ def locate_cards(img: MatLike):
                 suffix = '-' + c.value
                 card_id = card_id.removesuffix(suffix)
             # 查数据库
-            db_card = SkillCard.from_asset_id(card_id)
+            db_card = skill_catalog().by_asset_id(card_id)
             card = CardGameObject(
                 rect=region,
                 res_name=result.key,
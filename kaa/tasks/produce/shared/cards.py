@@ -9,6 +9,7 @@ from kaa.tasks import R
 from kaa.tasks.common import skip
 from kaa.config import conf
 from kaa.game_ui import dialog
+from kaa.game_ui.frame_cache import frame_cache
 from kaa.tasks.produce.shared.common import acquisition_date_change_dialog
 from kaa.tasks.produce.new.play_cards.strategy import AbstractBattleStrategy
 from kotonebot.primitives import RectTuple, Rect
@@ -161,14 +162,15 @@ def do_cards(
     for _ in Loop(interval=1/30):
         skip()
         img = device.screenshot()
+        cache = frame_cache()
 
         # 技能卡自选移动对话框
-        if R.InPurodyuusu.IconTitleSkillCardMove.exists():
+        if cache.exists(R.InPurodyuusu.IconTitleSkillCardMove):
             if handle_skill_card_move():
                 sleep(4)  # 等待卡片刷新
                 continue
         # 饮品详细对话框（需要在 ButtonIconCheckMark 之前，因为ButtonUse也是√）
-        if R.InPurodyuusu.ButtonUse.try_click():
+        if cache.try_click(R.InPurodyuusu.ButtonUse):
             if enable_drink and drinks_list is not None:
                 if drink_selected_idx < 0 or drink_selected_idx >= len(drinks_list):
                     logger.warning('`drink_selected_idx` dismatches, internal error!')
@@ -185,7 +187,7 @@ def do_cards(
                 logger.warning('Unexpected use drink dialog.')
             continue
         # 技能卡效果无法发动对话框
-        if R.Common.ButtonIconCheckMark.try_click():
+        if cache.try_click(R.Common.ButtonIconCheckMark):
             logger.info("Confirmation dialog detected")
             sleep(4)  # 等待卡片刷新
             continue
@@ -360,6 +362,10 @@ def handle_recommended_card(
 def skill_card_count(img: MatLike | None = None):
     """获取当前持有的技能卡数量"""
     img = use_screenshot(img)
+    return frame_cache().memo('skill_card_count', lambda: _skill_card_count(img), image=img)
+
+
+def _skill_card_count(img: MatLike) -> int:
     x, y, w, h = R.InPurodyuusu.BoxCardLetter.xywh
     img = img[y:y+h, x:x+w]
     count = image.raw().count(img, R.InPurodyuusu.A.template)
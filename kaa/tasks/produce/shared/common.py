@@ -31,6 +31,7 @@ from kaa.kaa_context import produce_solution
 from kaa.tasks.start_game import wait_for_home
 from kaa.tasks.actions.commu import handle_unread_commu
 from kaa.game_ui import CommuEventButtonUI, dialog, badge
+from kaa.game_ui.frame_cache import frame_cache
 
 logger = getLogger(__name__)
 
@@ -255,7 +256,7 @@ def acquisition_date_change_dialog() -> AcquisitionType | None:
 
     # 日期变更（可以考虑加入版本更新，但因为我目前没有版本更新的720x1080素材，所以没法加）
     logger.debug("Check date change dialog...")
-    if R.Daily.TextDateChangeDialog.exists():
+    if frame_cache().exists(R.Daily.TextDateChangeDialog):
         logger.info("Date change dialog found.")
         # 点击确认
         R.Daily.TextDateChangeDialogConfirmButton.require().click()
@@ -1,7 +1,7 @@
 import os
 from importlib import resources
 
-from kaa.game_data.paths import get_game_data_dir
+from kaa.game_data.paths import get_game_data_dir, descriptors_path
 
 CACHE = os.path.join('cache')
 
@@ -17,6 +17,14 @@ def resource(path: str) -> str:
     """返回游戏数据文件的路径（idol_cards/skill_cards/drinks）"""
     return str(get_game_data_dir() / path)
 
+def descriptors(category: str) -> str:
+    """返回预先计算的描述符包的路径（idol_cards/skill_cards/drinks）"""
+    return str(descriptors_path(category))
+
+def glyphs(font: str) -> str:
+    """返回随程序发布的字形模板文件夹路径"""
+    return os.path.join(os.path.dirname(os.path.dirname(__file__)), 'resources', 'glyphs', font)
+
 def get_ahk_path() -> str:
     """获取 AutoHotkey 可执行文件路径"""
     return str(resources.files('kaa.res.bin') / 'AutoHotkey.exe')
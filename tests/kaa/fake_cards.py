@@ -0,0 +1,27 @@
+"""构造技能卡测试数据的辅助函数。只包含 `card_features` 等模块实际用到的字段。"""
+from types import SimpleNamespace
+
+from kaa.db.constants import ProduceExamEffectType
+
+
+def effect(effect_type: ProduceExamEffectType, value1: int | None = None, turn: int | None = None):
+    return SimpleNamespace(produce_exam_effect=SimpleNamespace(
+        effect_type=effect_type, effect_value1=value1, effect_turn=turn,
+    ))
+
+
+def card(card_id: str, effects: list, stamina: int = 0, force_stamina: int = 0, upgrade_count: int = 0):
+    return SimpleNamespace(
+        _id=card_id, upgrade_count=upgrade_count, name=card_id,
+        play_effects=effects, stamina=stamina, force_stamina=force_stamina,
+    )
+
+
+class FakeCatalog:
+    """代替 `SkillCatalog`，返回给定的技能卡。"""
+    def __init__(self, cards: list | None = None):
+        self.cards = cards or []
+        self.generation = 0
+
+    def all_cards(self):
+        return list(self.cards)
@@ -0,0 +1,65 @@
+from unittest import TestCase
+
+import numpy as np
+
+from kaa.db.constants import ProduceExamEffectType
+from kaa.tasks.produce.new.play_cards.card_features import (
+    N_TYPES, BattleState, CardFeatureTable, EffectRule, ScoringWeights,
+    card_features, score_cards, EFFECT_TYPES,
+)
+
+from .fake_cards import FakeCatalog, card, effect
+
+
+# 剩余 5 回合，元气、体力充足：不处于任何阶段
+NORMAL = BattleState(stamina=20, hp=20, remaining_turns=5)
+
+
+class TestCardFeatures(TestCase):
+    def setUp(self):
+        self.lesson = card('lesson', [effect(ProduceExamEffectType.ExamLesson, 10)], stamina=5)
+        self.block = card('block', [
+            effect(ProduceExamEffectType.ExamBlock, 6),
+            effect(ProduceExamEffectType.ExamBlock, 4),
+        ], force_stamina=7)
+        self.buff = card('buff', [effect(ProduceExamEffectType.ExamParameterBuff, turn=3)], stamina=2)
+        self.catalog = FakeCatalog([self.lesson, self.block])
+        self.table = CardFeatureTable(self.catalog)  # type: ignore[arg-type]
+        self.weights = ScoringWeights.from_rules()
+
+    def test_card_features(self):
+        row = card_features(self.block)  # type: ignore[arg-type]
+        i = EFFECT_TYPES.index(ProduceExamEffectType.ExamBlock)
+        self.assertEqual(row[i], 2)
+        self.assertEqual(row[N_TYPES + i], 10)
+        self.assertEqual(row.sum(), 12)
+
+    def test_score(self):
+        scores = score_cards(self.table, [self.lesson, self.block, self.buff], NORMAL, self.weights)  # type: ignore[list-item]
+        # lesson: 10 - (5 - 4)；block: 10 * 2 - (7 - 4)；buff: 3 * 4
+        np.testing.assert_allclose(scores, [9, 17, 12])
+
+    def test_stage_multiplier(self):
+        # 剩余 1 回合、元气不足、体力不足
+        state = BattleState(stamina=2, hp=2, remaining_turns=1)
+        self.assertEqual(set(state.stages), {'early', 'low_stamina'})
+        scores = score_cards(self.table, [self.block], state, self.weights)  # type: ignore[list-item]
+        # 2 个防御效果，每个 +0.2 (元气不足) +0.1 (前期)；消耗体力且体力不足，惩罚翻倍
+        np.testing.assert_allclose(scores, [20 * (1 + 2 * 0.3) - 3 * 2])
+
+    def test_custom_weights(self):
+        weights = ScoringWeights.from_rules({ProduceExamEffectType.ExamParameterBuff: EffectRule(base=1)})
+        scores = score_cards(self.table, [self.lesson, self.buff], NORMAL, weights)  # type: ignore[list-item]
+        np.testing.assert_allclose(scores, [-1, 1])
+
+    def test_table_rebuilt_on_catalog_reload(self):
+        self.table.rows([self.lesson])  # type: ignore[list-item]
+        self.assertEqual(len(self.table.features), 2)
+        # 不在目录中的卡会被追加
+        self.table.rows([self.buff])  # type: ignore[list-item]
+        self.assertEqual(len(self.table.features), 3)
+        self.catalog.cards = [card('lesson', [], stamina=1)]
+        self.catalog.generation += 1
+        scores = score_cards(self.table, [self.lesson], NORMAL, self.weights)  # type: ignore[list-item]
+        self.assertEqual(len(self.table.features), 1)
+        np.testing.assert_allclose(scores, [0])
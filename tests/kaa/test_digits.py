@@ -0,0 +1,119 @@
+import os
+import tempfile
+from unittest import TestCase
+
+import cv2
+import numpy as np
+
+from kaa.game_ui.digits import DigitReader, GlyphSet, glyph_set
+
+SPRITES_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'kotonebot-resource', 'sprites', 'jp', 'in_purodyuusu')
+# InPurodyuusu.CurVoValue/CurDaValue/CurViValue/MaxDaValue
+PARAM_BOXES = [(185, 680, 285, 720), (330, 680, 430, 720), (475, 680, 575, 720), (285, 720, 430, 750)]
+# InPurodyuusu.InLesson.BoxRemainingTurns
+TURNS_BOX = (54, 69, 148, 113)
+# 生成字形模板所用的行动页截图（见 tools/make_glyphs.py）
+PARAM_SAMPLES = {
+    'screenshot_action_1.png': ['211', '305', '345', '/1000'],
+    'screenshot_action_2.png': ['172', '184', '313', '/1500'],
+    'screenshot_sensei_tip_consult.png': ['159', '253', '283', '/1500'],
+    'screenshot_sp.png': ['521', '522', '684', '/1500'],
+}
+
+
+def _crop(name: str, box: tuple[int, int, int, int]) -> np.ndarray:
+    img = cv2.imread(os.path.join(SPRITES_PATH, name))
+    assert img is not None
+    x1, y1, x2, y2 = box
+    return img[y1:y2, x1:x2]
+
+
+class TestDigitReader(TestCase):
+    def test_outlined(self):
+        reader = DigitReader(glyph_set('outlined'))
+        cases = [
+            ('screenshot_action_1.png', ['211', '305', '345', '/1000']),
+            ('screenshot_sp.png', ['521', '522', '684', '/1500']),
+        ]
+        for name, texts in cases:
+            for box, text in zip(PARAM_BOXES, texts):
+                with self.subTest(name=name, text=text):
+                    result = reader.recognize(_crop(name, box))
+                    self.assertEqual(result.text, text)
+                    self.assertGreaterEqual(result.confidence, reader.min_confidence)
+        # HUD 中的体力
+        self.assertEqual(reader.read_int(_crop('screenshot_lesson_5_cards.png', (565, 168, 629, 210))), 22)
+
+    def test_held_out(self):
+        # 每次留出一张截图，用其余截图生成字形集后识别它。
+        # 留出的截图可能包含字形集中没有的字符（6、7、9 都只有一个样本），此时应回退而不是给出错误结果
+        correct = 0
+        for held_out, texts in PARAM_SAMPLES.items():
+            glyphs = GlyphSet('held_out', 220)
+            for name, sample_texts in PARAM_SAMPLES.items():
+                if name == held_out:
+                    continue
+                for box, text in zip(PARAM_BOXES, sample_texts):
+                    self.assertTrue(glyphs.add_sample(_crop(name, box), text))
+            reader = DigitReader(glyphs)
+            for box, text in zip(PARAM_BOXES, texts):
+                with self.subTest(name=held_out, text=text):
+                    result = reader.recognize(_crop(held_out, box))
+                    if result.confidence >= reader.min_confidence:
+                        self.assertEqual(result.text, text)
+                        correct += 1
+        self.assertGreaterEqual(correct, 10)
+
+    def test_clipped(self):
+        calls = []
+        def fallback(img):
+            calls.append(img)
+            return '12'
+        reader = DigitReader(glyph_set('outlined'), fallback=fallback)
+        # 新版课程界面中剩余回合数的位置偏左，“12” 的 “1” 被裁切，只剩 “2” 完整
+        for name in ['screenshot_lesson_no_card.png', 'screenshot_drink_test.png']:
+            with self.subTest(name=name):
+                crop = _crop(name, TURNS_BOX)
+                self.assertEqual(reader.recognize(crop).confidence, 0)
+                result = reader.read(crop)
+                self.assertTrue(result.fallback)
+                self.assertEqual(result.numbers, [12])
+        # 单个数字被裁切时同样回退
+        for name in ['screenshot_4_cards.png', 'screenshot_1_cards.png']:
+            with self.subTest(name=name):
+                self.assertTrue(reader.read(_crop(name, TURNS_BOX)).fallback)
+        self.assertEqual(len(calls), 4)
+        # 旧版界面中数字完整，不回退
+        self.assertEqual(reader.read_int(_crop('screenshot_skill_card_T.png', TURNS_BOX)), 5)
+        self.assertEqual(len(calls), 4)
+
+    def test_fallback(self):
+        calls = []
+        def fallback(img):
+            calls.append(img)
+            return '42'
+        # 只有部分字符的字形集，无法可靠识别其他字符
+        glyphs = GlyphSet('partial', 220)
+        glyphs.add_sample(_crop('screenshot_action_1.png', PARAM_BOXES[0]), '211')
+        reader = DigitReader(glyphs, fallback=fallback)
+
+        self.assertEqual(reader.read_int(_crop('screenshot_action_1.png', PARAM_BOXES[0])), 211)
+        self.assertEqual(calls, [])
+        result = reader.read(_crop('screenshot_sp.png', PARAM_BOXES[2]))
+        self.assertTrue(result.fallback)
+        self.assertEqual(result.numbers, [42])
+        self.assertEqual(len(calls), 1)
+        # 没有任何字符时同样回退
+        self.assertEqual(reader.read_int(np.zeros((40, 100, 3), dtype=np.uint8)), 42)
+
+    def test_save_load(self):
+        glyphs = GlyphSet('test', 220)
+        self.assertTrue(glyphs.add_sample(_crop('screenshot_action_1.png', PARAM_BOXES[3]), '/1000'))
+        self.assertFalse(glyphs.add_sample(_crop('screenshot_action_1.png', PARAM_BOXES[3]), '1000'))
+        with tempfile.TemporaryDirectory() as tmp:
+            glyphs.save(tmp)
+            loaded = GlyphSet.load(tmp, 'test')
+        self.assertEqual(loaded.threshold, 220)
+        self.assertEqual(sorted(loaded.labels), sorted(glyphs.labels))
+        reader = DigitReader(loaded)
+        self.assertEqual(reader.recognize(_crop('screenshot_action_1.png', PARAM_BOXES[3])).text, '/1000')
@@ -0,0 +1,41 @@
+import os
+from unittest import TestCase
+
+import cv2
+import numpy as np
+
+from kaa.game_ui.drinks_overview import preprocess_drink_slot_img, _preprocess_drink_slot_img_bfs
+
+SPRITES_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'kotonebot-resource', 'sprites', 'jp', 'in_purodyuusu')
+# InPurodyuusu.BoxDrink1~3 的 x 坐标，y 范围为 1166~1234
+DRINK_SLOTS_X = (53, 149, 245)
+
+
+class TestPreprocessDrinkSlot(TestCase):
+    def assertSameAsBfs(self, img: np.ndarray):
+        expected = _preprocess_drink_slot_img_bfs(img)
+        actual = preprocess_drink_slot_img(img)
+        np.testing.assert_array_equal(actual, expected)
+
+    def test_screenshots(self):
+        for name in ('screenshot_drink_test.png', 'screenshot_drink_test_3.png'):
+            img = cv2.imread(os.path.join(SPRITES_PATH, name))
+            self.assertIsNotNone(img)
+            for x in DRINK_SLOTS_X:
+                with self.subTest(name=name, x=x):
+                    self.assertSameAsBfs(img[1166:1234, x:x+68])
+
+    def test_random(self):
+        rng = np.random.default_rng(0)
+        for i in range(20):
+            img = rng.integers(0, 256, (68, 68, 3), dtype=np.uint8)
+            # 加入大片近白色区域，制造复杂的连通关系
+            img[rng.random((68, 68)) < 0.5] = 250
+            with self.subTest(i=i):
+                self.assertSameAsBfs(img)
+
+    def test_input_not_modified(self):
+        img = np.full((68, 68, 3), 100, dtype=np.uint8)
+        original = img.copy()
+        preprocess_drink_slot_img(img)
+        np.testing.assert_array_equal(img, original)
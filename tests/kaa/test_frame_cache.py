@@ -0,0 +1,62 @@
+from unittest import TestCase
+
+import numpy as np
+from kotonebot.primitives import Rect, ImageSlice
+from kotonebot.core import GameObject, TemplateMatchPrefab
+
+from kaa.game_ui.frame_cache import FrameCache
+
+
+class _CountingPrefab(TemplateMatchPrefab):
+    template = ImageSlice(pixels=np.zeros((10, 10, 3), dtype=np.uint8), slice_rect=Rect(0, 0, 10, 10))
+    calls: list[Rect | None] = []
+
+    @classmethod
+    def _find_impl(cls, query):
+        cls.calls.append(query.region)
+        obj = GameObject()
+        obj.rect = query.region or Rect(0, 0, 10, 10)
+        return obj
+
+
+class TestFrameCache(TestCase):
+    def setUp(self):
+        _CountingPrefab.calls = []
+        self.screenshot = np.zeros((1280, 720, 3), dtype=np.uint8)
+        self.cache = FrameCache(lambda: self.screenshot)
+
+    def test_find_cached_within_frame(self):
+        self.assertTrue(self.cache.exists(_CountingPrefab))
+        self.assertTrue(self.cache.exists(_CountingPrefab))
+        self.assertIsNotNone(self.cache.find(_CountingPrefab))
+        self.assertEqual(len(_CountingPrefab.calls), 1)
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 1))
+
+    def test_region_is_part_of_key(self):
+        region = Rect(0, 0, 100, 100)
+        self.cache.find(_CountingPrefab)
+        obj = self.cache.find(_CountingPrefab, region=region)
+        self.cache.find(_CountingPrefab, region=Rect(0, 0, 100, 100))
+        self.assertEqual(_CountingPrefab.calls, [None, region])
+        self.assertEqual(obj.rect, region)  # type: ignore[union-attr]
+
+    def test_invalidated_on_new_screenshot(self):
+        self.cache.find(_CountingPrefab)
+        frame_id = self.cache.frame_id
+        self.screenshot = np.zeros((1280, 720, 3), dtype=np.uint8)
+        self.cache.find(_CountingPrefab)
+        self.assertEqual(len(_CountingPrefab.calls), 2)
+        self.assertEqual(self.cache.frame_id, frame_id + 1)
+
+    def test_memo(self):
+        calls = []
+        def compute():
+            calls.append(1)
+            return 42
+        self.assertEqual(self.cache.memo('key', compute), 42)
+        self.assertEqual(self.cache.memo('key', compute, image=self.screenshot), 42)
+        self.assertEqual(len(calls), 1)
+        # 不是当前截图时不使用缓存
+        other = np.zeros((10, 10, 3), dtype=np.uint8)
+        self.assertEqual(self.cache.memo('key', compute, image=other), 42)
+        self.assertEqual(len(calls), 2)
@@ -0,0 +1,177 @@
+import os
+import shutil
+import sqlite3
+import hashlib
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+from kaa.errors import GameDataValidationError
+from kaa.game_data import events, paths, staging as staging_module
+from kaa.game_data.manifest import FileEntry
+from kaa.game_data.staging import StagedGameData
+from kaa.game_data.updater import _open_new
+
+
+def _entry(data: bytes) -> FileEntry:
+    return FileEntry(md5=hashlib.md5(data).hexdigest(), size=len(data))
+
+
+class TestStagedGameData(TestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.live = self.root / 'game_data'
+        (self.live / 'drinks').mkdir(parents=True)
+        (self.live / 'downloads').mkdir()
+        (self.live / 'drinks' / 'a.png').write_bytes(b'a')
+        (self.live / 'drinks' / 'b.png').write_bytes(b'b')
+        (self.live / 'downloads' / 'x.zip.part').write_bytes(b'partial')
+        (self.live / 'version.txt').write_text('v1')
+        self.staged = StagedGameData(self.live, self.root / 'game_data.staging', self.root / 'game_data.old')
+        self.staged.prepare()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_prepare(self):
+        staging = self.staged.staging
+        self.assertEqual((staging / 'drinks' / 'a.png').read_bytes(), b'a')
+        self.assertFalse((staging / 'downloads').exists())
+        self.assertEqual(self.staged.path(self.live / 'drinks' / 'b.png'), staging / 'drinks' / 'b.png')
+        # 写入暂存目录不影响当前数据
+        with _open_new(staging / 'drinks' / 'a.png') as f:
+            f.write(b'new')
+        self.assertEqual((self.live / 'drinks' / 'a.png').read_bytes(), b'a')
+
+    def test_validate(self):
+        staging = self.staged.staging
+        (staging / 'drinks' / 'b.png').unlink()
+        (staging / 'descriptors').mkdir()
+        (staging / 'descriptors' / 'drinks.npz').write_bytes(b'stale')
+        files = {
+            'drinks/a.png': _entry(b'a'),
+            'drinks/b.png': _entry(b'b'),
+            'descriptors/drinks.npz': _entry(b'npz'),
+        }
+        with self.assertRaises(GameDataValidationError) as ctx:
+            self.staged.validate(files, optional={'descriptors/drinks.npz'})
+        self.assertEqual(ctx.exception.files, ['drinks/b.png'])
+        # 校验失败的可选文件被删除
+        self.assertFalse((staging / 'descriptors' / 'drinks.npz').exists())
+
+        with _open_new(staging / 'drinks' / 'b.png') as f:
+            f.write(b'b')
+        self.staged.validate(files, optional={'descriptors/drinks.npz'})
+
+    def test_validate_game_db(self):
+        db_path = self.staged.staging / 'game.db'
+        conn = sqlite3.connect(db_path)
+        conn.execute('CREATE TABLE t (x INTEGER)')
+        conn.commit()
+        conn.close()
+        self.staged.validate({'game.db': _entry(db_path.read_bytes())})
+
+        db_path.unlink()
+        db_path.write_bytes(b'not a database' * 100)
+        with self.assertRaises(GameDataValidationError):
+            self.staged.validate({'game.db': _entry(db_path.read_bytes())})
+
+    def test_commit(self):
+        staging = self.staged.staging
+        self.staged.write_text(self.live / 'version.txt', 'v2')
+        # 提交前不影响当前数据
+        self.assertEqual((self.live / 'version.txt').read_text(), 'v1')
+        calls = []
+        self.staged.commit(before_swap=lambda: calls.append(1))
+        self.assertEqual(calls, [1])
+        self.assertEqual((self.live / 'version.txt').read_text(), 'v2')
+        self.assertEqual((self.live / 'drinks' / 'a.png').read_bytes(), b'a')
+        self.assertFalse(staging.exists())
+        self.assertFalse(self.staged.backup.exists())
+
+    def test_failed_validation_keeps_live_version(self):
+        self.staged.write_text(self.live / 'version.txt', 'v2')
+        (self.staged.staging / 'drinks' / 'b.png').unlink()
+        with self.assertRaises(GameDataValidationError):
+            self.staged.validate({'drinks/b.png': _entry(b'b')})
+        self.staged.discard()
+        self.assertEqual((self.live / 'version.txt').read_text(), 'v1')
+        self.assertEqual((self.live / 'drinks' / 'b.png').read_bytes(), b'b')
+
+    def test_discard(self):
+        self.staged.discard()
+        self.assertFalse(self.staged.staging.exists())
+        self.assertEqual(sorted(os.listdir(self.live)), ['downloads', 'drinks', 'version.txt'])
+
+
+class TestGameDataDir(TestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.live = self.root / 'game_data'
+        self.staging = self.root / 'game_data.staging'
+        self.backup = self.root / 'game_data.old'
+        for name, value in [
+            ('_GAME_DATA_DIR', self.live), ('_STAGING_DIR', self.staging),
+            ('_BACKUP_DIR', self.backup), ('_initialized', False),
+        ]:
+            p = patch.object(paths, name, value)
+            p.start()
+            self.addCleanup(p.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_recover_on_first_access(self):
+        (self.staging / 'drinks').mkdir(parents=True)
+        (self.staging / 'version.txt').write_text('v2')
+        self.backup.mkdir()
+        self.assertEqual(paths.get_game_data_dir(), self.live)
+        self.assertEqual((self.live / 'version.txt').read_text(), 'v2')
+        self.assertFalse(self.staging.exists())
+
+    def test_access_during_commit(self):
+        self.live.mkdir()
+        (self.live / 'version.txt').write_text('v1')
+        staged = StagedGameData(paths.get_game_data_dir(), paths.staging_dir(), paths.backup_dir())
+        staged.prepare()
+        staged.write_text(self.live / 'version.txt', 'v2')
+
+        rename = os.rename
+        def rename_then_access(src, dst):
+            rename(src, dst)
+            if Path(dst) == self.backup:
+                # 其他线程在两次重命名之间访问游戏数据目录
+                self.assertEqual(paths.get_game_data_dir(), self.live)
+                self.assertFalse(self.live.exists())
+        with patch.object(staging_module.os, 'rename', rename_then_access):
+            staged.commit()
+        self.assertEqual((self.live / 'version.txt').read_text(), 'v2')
+        self.assertFalse(self.staging.exists())
+        self.assertFalse(self.backup.exists())
+
+
+class TestGameDataEvents(TestCase):
+    def test_publish(self):
+        calls = []
+        def failing():
+            raise RuntimeError('listener failed')
+        unsubscribe_failing = events.subscribe(failing)
+        unsubscribe = events.subscribe(lambda: calls.append(events.generation()))
+        try:
+            generation = events.generation()
+            events.publish_changed()
+            self.assertEqual(events.generation(), generation + 1)
+            # 前一个回调失败不影响后续回调
+            self.assertEqual(calls, [generation + 1])
+        finally:
+            unsubscribe_failing()
+            unsubscribe()
+        events.publish_changed()
+        self.assertEqual(len(calls), 1)
+
+    def test_sqlite_connections_reset(self):
+        from kaa.db.sqlite import manager
+        generation = manager().generation
+        events.publish_changed()
+        self.assertEqual(manager().generation, generation + 1)
@@ -0,0 +1,201 @@
+import io
+import os
+import shutil
+import zipfile
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+import requests
+import zstandard
+
+from kaa.game_data import updater
+from kaa.game_data.remote_zip import RemoteZip
+
+
+class _Response:
+    def __init__(self, status_code: int, chunks: list[bytes], total: int, error: Exception | None = None):
+        self.status_code = status_code
+        self.headers = {'content-length': str(total)}
+        self.chunks = chunks
+        self.error = error
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size: int):
+        yield from self.chunks
+        if self.error:
+            raise self.error
+
+
+class _Session:
+    def __init__(self, responses: list[_Response]):
+        self.responses = responses
+        self.requests: list[dict] = []
+
+    def get(self, url, stream, timeout, headers):
+        self.requests.append(headers)
+        return self.responses.pop(0)
+
+
+class TestStreamingDownload(TestCase):
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.dest = self.temp_dir / 'sub' / 'file.bin'
+        sleep = patch.object(updater.time, 'sleep')
+        sleep.start()
+        self.addCleanup(sleep.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _download(self, responses: list[_Response]) -> _Session:
+        session = _Session(responses)
+        with patch.object(updater, '_session', session):
+            updater._download_file('http://example.com/file.bin', self.dest)
+        return session
+
+    def test_resume(self):
+        interrupted = requests.exceptions.ChunkedEncodingError()
+        session = self._download([
+            _Response(200, [b'abc', b'de'], 10, error=interrupted),
+            _Response(206, [b'fghij'], 5),
+        ])
+        self.assertEqual(session.requests, [{}, {'Range': 'bytes=5-'}])
+        self.assertEqual(self.dest.read_bytes(), b'abcdefghij')
+        self.assertEqual(os.listdir(self.dest.parent), ['file.bin'])
+
+    def test_restart_without_range_support(self):
+        interrupted = requests.exceptions.ConnectionError()
+        self._download([
+            _Response(200, [b'abc'], 6, error=interrupted),
+            _Response(200, [b'abc', b'def'], 6),
+        ])
+        self.assertEqual(self.dest.read_bytes(), b'abcdef')
+
+    def test_failed_download_leaves_no_file(self):
+        interrupted = requests.exceptions.Timeout()
+        with self.assertRaises(requests.exceptions.Timeout):
+            self._download([_Response(200, [b'abc'], 6, error=interrupted)] * 5)
+        self.assertEqual(os.listdir(self.dest.parent), [])
+
+    def test_decompress_and_extract(self):
+        data = os.urandom(1000) * 100
+        zst = self.temp_dir / 'game.db.zst'
+        zst.write_bytes(zstandard.ZstdCompressor().compress(data))
+        db = self.temp_dir / 'game.db'
+        db.write_bytes(b'old')
+        updater._decompress_zst(zst, db)
+        self.assertEqual(db.read_bytes(), data)
+        self.assertFalse((self.temp_dir / 'game.db.tmp').exists())
+
+        zip_path = self.temp_dir / 'sprites.zip'
+        with zipfile.ZipFile(zip_path, 'w') as z:
+            z.writestr('sprites/a.png', b'a')
+            z.writestr('sprites/b.png', b'b')
+            z.writestr('sprites/readme.txt', b'c')
+        out = self.temp_dir / 'out'
+        out.mkdir()
+        self.assertEqual(updater._extract_members(zip_path, out, {'a.png', 'readme.txt'}), 1)
+        self.assertEqual(os.listdir(out), ['a.png'])
+
+
+class _RangeSession:
+    """按 Range 头返回 `data` 中对应区间的会话"""
+    def __init__(self, data: bytes, support_range: bool = True):
+        self.data = data
+        self.support_range = support_range
+        self.ranges: list[str] = []
+
+    def get(self, url, headers, timeout):
+        spec = headers['Range']
+        self.ranges.append(spec)
+        resp = requests.Response()
+        if not self.support_range:
+            resp.status_code = 200
+            resp.raw = io.BytesIO(self.data)
+            return resp
+        start, end = spec.removeprefix('bytes=').split('-')
+        if start == '':
+            start, end = max(0, len(self.data) - int(end)), len(self.data) - 1
+        start, end = int(start), int(end)
+        resp.status_code = 206
+        resp.headers['content-range'] = f'bytes {start}-{end}/{len(self.data)}'
+        resp._content = self.data[start:end + 1]
+        return resp
+
+
+class TestDeltaUpdate(TestCase):
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.files = {f'sprites/{i}.png': os.urandom(2000) for i in range(20)}
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, 'w') as z:
+            for i, (name, data) in enumerate(self.files.items()):
+                z.writestr(name, data, zipfile.ZIP_DEFLATED if i % 2 else zipfile.ZIP_STORED)
+            z.writestr('sprites/readme.txt', b'text')
+        self.zip_data = buf.getvalue()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_remote_zip(self):
+        z = RemoteZip('http://example.com/a.zip', _RangeSession(self.zip_data))  # type: ignore[arg-type]
+        members = z.members()
+        self.assertEqual(z.size, len(self.zip_data))
+        self.assertEqual(len(members), 21)
+        wanted = [m for m in members if m.name in ('sprites/0.png', 'sprites/1.png', 'sprites/19.png')]
+        result = {m.name: data for m, data in z.read(wanted)}
+        self.assertEqual(result, {name: self.files[name] for name in result})
+        self.assertEqual(len(result), 3)
+
+    def test_extract_delta(self):
+        session = _RangeSession(self.zip_data)
+        with patch.object(updater, '_session', session):
+            ok = updater._extract_delta('http://example.com/a.zip', self.temp_dir, {'3.png', '4.png'})
+        self.assertTrue(ok)
+        self.assertEqual(sorted(os.listdir(self.temp_dir)), ['3.png', '4.png'])
+        self.assertEqual((self.temp_dir / '3.png').read_bytes(), self.files['sprites/3.png'])
+        # 目录 + 两个文件
+        self.assertEqual(len(session.ranges), 3)
+
+    def test_fallback(self):
+        # 需要的文件过多
+        with patch.object(updater, '_session', _RangeSession(self.zip_data)):
+            names = {f'{i}.png' for i in range(15)}
+            self.assertFalse(updater._extract_delta('http://example.com/a.zip', self.temp_dir, names))
+        # 不支持 Range
+        with patch.object(updater, '_session', _RangeSession(self.zip_data, support_range=False)):
+            self.assertFalse(updater._extract_delta('http://example.com/a.zip', self.temp_dir, {'1.png'}))
+        self.assertEqual(os.listdir(self.temp_dir), [])
+
+
+class TestRunJobs(TestCase):
+    def test_concurrent(self):
+        # 两个任务必须同时运行才能通过屏障
+        barrier = threading.Barrier(2, timeout=5)
+        done = []
+        def job(name):
+            barrier.wait()
+            done.append(name)
+        updater._run_jobs([('a', lambda: job('a')), ('b', lambda: job('b'))], max_workers=2)
+        self.assertEqual(sorted(done), ['a', 'b'])
+
+    def test_failure_waits_for_running(self):
+        started = threading.Event()
+        done = []
+        def slow():
+            started.set()
+            time.sleep(0.2)
+            done.append('slow')
+        def fail():
+            started.wait(5)
+            raise ValueError('failed')
+        with self.assertRaises(ValueError):
+            updater._run_jobs([('slow', slow), ('fail', fail)], max_workers=2)
+        # 抛出异常前等待正在执行的任务结束
+        self.assertEqual(done, ['slow'])
@@ -0,0 +1,42 @@
+import os
+from unittest import TestCase
+
+import cv2
+import numpy as np
+
+from kaa.image_db.descriptors import HistDescriptor, FastHistDescriptor
+
+IMAGES_PATH = os.path.join(os.path.dirname(__file__), '..', 'images')
+
+
+class TestFastHistDescriptor(TestCase):
+    def assertSameFeatures(self, img: np.ndarray, bin_count: int):
+        expected = HistDescriptor(bin_count)(img)
+        actual = FastHistDescriptor(bin_count)(img)
+        self.assertEqual(actual.dtype, np.float32)
+        self.assertEqual(actual.shape, expected.shape)
+        np.testing.assert_array_equal(actual, expected.astype(np.float32))
+
+    def test_random_images(self):
+        rng = np.random.default_rng(0)
+        for shape in [(68, 68, 3), (70, 50, 3), (190, 140, 3), (2, 2, 3)]:
+            img = rng.integers(0, 256, shape, dtype=np.uint8)
+            for bin_count in (4, 8):
+                with self.subTest(shape=shape, bin_count=bin_count):
+                    self.assertSameFeatures(img, bin_count)
+
+    def test_real_images(self):
+        for name in ('pdorinku.png', 'acquire_pdorinku.png'):
+            img = cv2.imread(os.path.join(IMAGES_PATH, name))
+            self.assertIsNotNone(img)
+            with self.subTest(name=name):
+                self.assertSameFeatures(img, 8)
+                # 饮品槽大小的裁剪
+                self.assertSameFeatures(img[:68, :68], 8)
+
+    def test_solid_color(self):
+        img = np.full((68, 68, 3), 255, dtype=np.uint8)
+        self.assertSameFeatures(img, 8)
+
+    def test_config(self):
+        self.assertEqual(FastHistDescriptor(8).config, HistDescriptor(8).config)
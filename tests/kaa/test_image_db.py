@@ -0,0 +1,355 @@
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+
+from kaa.image_db import ImageDatabase, FeatureIndex, FileDataSource, HistDescriptor, DescriptorStore
+from kaa.image_db import store as store_module
+from kaa.image_db.db import chi2_distance
+
+
+class _ArrayDescriptor:
+    """直接把输入数组展平作为特征，便于构造测试数据。"""
+    def __call__(self, image):
+        return np.asarray(image, dtype=np.float32).ravel()
+
+
+class _ListDataSource:
+    def __init__(self, items: dict[str, np.ndarray]):
+        self.items = items
+
+    def __iter__(self):
+        return iter(self.items.items())
+
+
+class TestFeatureIndex(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(42)
+        self.data = {f'key_{i}': rng.random(64).astype(np.float32) for i in range(50)}
+        self.query = rng.random(64).astype(np.float32)
+
+    def test_distances_match_loop(self):
+        index = FeatureIndex()
+        index.rebuild(self.data)
+        dists = index.distances(self.query)
+        self.assertEqual(index.matrix.dtype, np.float32)
+        self.assertTrue(index.matrix.flags['C_CONTIGUOUS'])
+        for key, d in zip(index.keys, dists):
+            expected = chi2_distance(self.query, self.data[key])
+            self.assertAlmostEqual(float(d), float(expected), places=4)
+
+    def test_topk(self):
+        index = FeatureIndex()
+        index.rebuild(self.data)
+        dists = index.distances(self.query)
+        indices, top = index.topk(self.query, 5)
+        self.assertEqual(len(indices), 5)
+        np.testing.assert_allclose(top, np.sort(dists)[:5])
+        # k 超过总数时返回全部
+        indices, top = index.topk(self.query, 100)
+        self.assertEqual(len(indices), 50)
+        self.assertTrue(np.all(np.diff(top) >= 0))
+
+    def test_empty(self):
+        index = FeatureIndex()
+        index.rebuild({})
+        self.assertEqual(len(index.distances(self.query)), 0)
+        self.assertEqual(len(index.topk(self.query, 3)[0]), 0)
+
+
+class TestImageDatabaseIndex(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        self.items = {f'img_{i}': rng.random((4, 4)).astype(np.float32) for i in range(20)}
+        self.db = ImageDatabase(
+            _ListDataSource(self.items),
+            os.path.join(self.tmp.name, 'test.npy'),
+            _ArrayDescriptor(),
+            name='test'
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_match_self(self):
+        result = self.db.match(self.items['img_7'])
+        self.assertIsNotNone(result)
+        assert result is not None
+        self.assertEqual(result.key, 'img_7')
+        self.assertAlmostEqual(result.distance, 0, places=5)
+
+    def test_match_all_sorted(self):
+        results = self.db.match_all(self.items['img_3'], threshold=1e9)
+        self.assertEqual(len(results), 20)
+        self.assertEqual(results[0].key, 'img_3')
+        distances = [r.distance for r in results]
+        self.assertEqual(distances, sorted(distances))
+
+    def test_match_topk_consistent(self):
+        query = self.items['img_5'] * 0.9
+        all_results = self.db.match_all(query, threshold=1e9)
+        top = self.db.match_topk(query, 3)
+        self.assertEqual([r.key for r in top], [r.key for r in all_results[:3]])
+
+    def test_insert_rebuilds_index(self):
+        new_img = np.full((4, 4), 0.5, dtype=np.float32)
+        self.db.insert('new', new_img)
+        self.assertEqual(len(self.db.index), 21)
+        result = self.db.match(new_img)
+        assert result is not None
+        self.assertEqual(result.key, 'new')
+
+    def test_match_batch(self):
+        queries = [self.items['img_1'], self.items['img_9'] * 0.8, self.items['img_15']]
+        batch = self.db.match_batch(queries, k=3)
+        self.assertEqual(len(batch), 3)
+        for query, results in zip(queries, batch):
+            expected = self.db.match_topk(query, 3)
+            self.assertEqual([r.key for r in results], [r.key for r in expected])
+            for r, e in zip(results, expected):
+                self.assertAlmostEqual(r.distance, e.distance, places=4)
+        self.assertEqual(self.db.match_batch([]), [])
+
+    def test_match_batch_chunked(self):
+        index = self.db.index
+        queries = np.stack([v.ravel() for v in self.items.values()])
+        full = index.distances_batch(queries)
+        chunked = index.distances_batch(queries, max_elements=1)
+        np.testing.assert_allclose(full, chunked)
+
+    def test_prefix_rows(self):
+        index = self.db.index
+        rows = index.prefix_rows('img_1')
+        self.assertEqual(sorted(index.keys[i] for i in rows), sorted(k for k in self.items if k.startswith('img_1')))
+        self.assertEqual(len(index.prefix_rows('missing')), 0)
+        # 插入后索引重建，前缀查找也随之更新
+        self.db.insert('img_1x', np.zeros((4, 4), dtype=np.float32))
+        self.assertIn('img_1x', [self.db.index.keys[i] for i in self.db.index.prefix_rows('img_1')])
+
+    def test_partition(self):
+        index = self.db.index
+        rows, n = index.partition('img_2', 3)
+        self.assertEqual(n, 1)
+        self.assertEqual(index.keys[rows[0]], 'img_2')
+        self.assertEqual(len(rows), 4)
+        self.assertNotIn(rows[0], rows[1:])
+
+    def test_match_prefix_consistent(self):
+        rng = np.random.default_rng(7)
+        queries = [v + rng.normal(0, 0.2, v.shape).astype(np.float32) for v in self.items.values()]
+        queries += [rng.random((4, 4)).astype(np.float32) for _ in range(20)]
+        for query in queries:
+            expected = self.db.match(query, threshold=3)
+            for prefix in ['img_1', 'img_7', 'img_19', 'missing']:
+                result = self.db.match_prefix(query, prefix, threshold=3, rejection_size=2)
+                if expected is not None and expected.key.startswith(prefix):
+                    self.assertIsNotNone(result)
+                    assert result is not None
+                    self.assertEqual(result.key, expected.key)
+                else:
+                    self.assertIsNone(result)
+
+
+class TestImageDatabaseStore(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, 'test.npy')
+        rng = np.random.default_rng(1)
+        self.items = {f'img_{i}': rng.random((4, 4)).astype(np.float32) for i in range(10)}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _open(self, items=None):
+        return ImageDatabase(
+            _ListDataSource(self.items if items is None else items),
+            self.db_path,
+            _ArrayDescriptor(),
+            name='test'
+        )
+
+    def test_reopen_uses_memory_map(self):
+        db = self._open()
+        self.assertFalse(db.modified)
+        index_path = os.path.join(self.tmp.name, 'test.json')
+        mtime = os.stat(index_path).st_mtime_ns
+
+        reopened = self._open()
+        self.assertEqual(reopened.db.count(), 10)
+        self.assertEqual(reopened.db.name, 'test')
+        self.assertIsInstance(reopened.index.matrix, np.memmap)
+        # 没有变化时不应重新写入
+        self.assertFalse(reopened.modified)
+        self.assertEqual(os.stat(index_path).st_mtime_ns, mtime)
+        result = reopened.match(self.items['img_4'])
+        assert result is not None
+        self.assertEqual(result.key, 'img_4')
+        # 查询结果不引用内存映射的矩阵
+        self.assertNotIsInstance(result.feature, np.memmap)
+        self.assertFalse(np.shares_memory(result.feature, reopened.index.matrix))
+
+    def test_persist_on_change(self):
+        self._open()
+        items = dict(self.items)
+        items['extra'] = np.full((4, 4), 0.25, dtype=np.float32)
+        self._open(items)
+        reopened = self._open({})
+        self.assertEqual(reopened.db.count(), 11)
+        self.assertIn('extra', reopened.db.data)
+
+    def test_save_while_mapped(self):
+        self._open()
+        mapped = self._open()
+        self.assertIsInstance(mapped.index.matrix, np.memmap)
+        old_matrix = np.array(mapped.index.matrix)
+
+        # 另一个实例仍映射着旧矩阵时保存：写入新文件，不替换被映射的文件
+        items = dict(self.items)
+        items['extra'] = np.full((4, 4), 0.25, dtype=np.float32)
+        changed = self._open(items)
+        self.assertFalse(changed.modified)
+        self.assertNotIsInstance(changed.index.matrix, np.memmap)
+        self.assertEqual(np.load(os.path.join(self.tmp.name, 'test.1.npy')).shape[0], 11)
+        np.testing.assert_array_equal(mapped.index.matrix, old_matrix)
+        self.assertEqual(mapped.db.count(), 10)
+
+        # 旧实例释放后，不再被引用的矩阵文件会被删除
+        del mapped
+        reopened = self._open()
+        self.assertEqual(reopened.db.count(), 11)
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), ['test.1.npy', 'test.json'])
+
+    def test_interrupted_save(self):
+        store = DescriptorStore(self.db_path)
+        keys = ['a', 'b']
+        store.save(keys, np.zeros((2, 3), dtype=np.float32), internal_version=1, version=None, name='test')
+        replace = os.replace
+        def fail_on_index(src, dst):
+            if dst == store.index_path:
+                raise OSError('interrupted')
+            replace(src, dst)
+        # 行数相同的新数据在写入索引前中断
+        with patch.object(store_module.os, 'replace', fail_on_index):
+            with self.assertRaises(OSError):
+                store.save(['c', 'd'], np.ones((2, 3), dtype=np.float32), internal_version=1, version=None, name='test')
+        stored = store.load()
+        assert stored is not None
+        self.assertEqual(stored.keys, keys)
+        np.testing.assert_array_equal(stored.matrix, np.zeros((2, 3), dtype=np.float32))
+
+    def test_legacy_cache_removed(self):
+        for name in ['test.pkl', 'test.npy']:
+            with open(os.path.join(self.tmp.name, name), 'wb') as f:
+                f.write(b'legacy')
+        self._open()
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), ['test.0.npy', 'test.json'])
+
+    def test_corrupted_store_is_rebuilt(self):
+        self._open()
+        with open(os.path.join(self.tmp.name, 'test.0.npy'), 'wb') as f:
+            f.write(b'garbage')
+        db = self._open()
+        self.assertEqual(db.db.count(), 10)
+
+
+class _CountingFileDataSource(FileDataSource):
+    def __init__(self, folder_path: str):
+        super().__init__(folder_path)
+        self.loaded: list[str] = []
+
+    def load(self, key: str):
+        self.loaded.append(key)
+        return super().load(key)
+
+
+class TestImageDatabaseSync(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.img_dir = os.path.join(self.tmp.name, 'images')
+        os.makedirs(self.img_dir)
+        self.db_path = os.path.join(self.tmp.name, 'test.npy')
+        rng = np.random.default_rng(2)
+        for i in range(5):
+            img = rng.integers(0, 256, (32, 32, 3), dtype=np.uint8)
+            cv2.imwrite(os.path.join(self.img_dir, f'img_{i}.png'), img)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _open(self):
+        source = _CountingFileDataSource(self.img_dir)
+        db = ImageDatabase(source, self.db_path, HistDescriptor(4), name='test')
+        return db, source
+
+    def test_only_changed_files_are_decoded(self):
+        db, source = self._open()
+        self.assertEqual(sorted(source.loaded), [f'img_{i}.png' for i in range(5)])
+        self.assertEqual(db.db.count(), 5)
+
+        db, source = self._open()
+        self.assertEqual(source.loaded, [])
+        self.assertFalse(db.modified)
+
+        os.remove(os.path.join(self.img_dir, 'img_0.png'))
+        img = np.full((40, 40, 3), 128, dtype=np.uint8)
+        cv2.imwrite(os.path.join(self.img_dir, 'img_1.png'), img)
+        cv2.imwrite(os.path.join(self.img_dir, 'img_new.png'), img)
+        db, source = self._open()
+        self.assertEqual(sorted(source.loaded), ['img_1.png', 'img_new.png'])
+        self.assertNotIn('img_0.png', db.db.data)
+        self.assertEqual(db.db.count(), 5)
+        result = db.match(img)
+        assert result is not None
+        self.assertIn(result.key, ('img_1.png', 'img_new.png'))
+
+    def test_parallel_build_progress(self):
+        progress = []
+        source = FileDataSource(self.img_dir)
+        db = ImageDatabase(
+            source, self.db_path, HistDescriptor(4), name='test',
+            progress_cb=lambda key, done, total: progress.append((key, done, total))
+        )
+        self.assertEqual(len(progress), 5)
+        self.assertEqual([p[1] for p in progress], [1, 2, 3, 4, 5])
+        self.assertTrue(all(p[2] == 5 for p in progress))
+        descriptor = HistDescriptor(4)
+        for key, feature in db.db.data.items():
+            expected = descriptor(source.load(key))
+            np.testing.assert_allclose(feature, expected, rtol=1e-5)
+
+    def test_corrupted_file_raises(self):
+        with open(os.path.join(self.img_dir, 'broken.png'), 'wb') as f:
+            f.write(b'not a png')
+        with self.assertRaises(ValueError):
+            self._open()
+
+    def test_import_bundle(self):
+        db, _ = self._open()
+        bundle_path = os.path.join(self.tmp.name, 'bundle.npz')
+        db.export_bundle(bundle_path, FileDataSource(self.img_dir))
+
+        source = _CountingFileDataSource(self.img_dir)
+        other = ImageDatabase(
+            source, os.path.join(self.tmp.name, 'other.npy'), HistDescriptor(4),
+            name='test', bundle_path=bundle_path
+        )
+        self.assertEqual(source.loaded, [])
+        self.assertEqual(other.db.count(), 5)
+        for key, feature in db.db.data.items():
+            np.testing.assert_allclose(other.db.data[key], feature)
+
+    def test_import_bundle_config_mismatch(self):
+        db, _ = self._open()
+        bundle_path = os.path.join(self.tmp.name, 'bundle.npz')
+        db.export_bundle(bundle_path, FileDataSource(self.img_dir))
+
+        source = _CountingFileDataSource(self.img_dir)
+        ImageDatabase(
+            source, os.path.join(self.tmp.name, 'other.npy'), HistDescriptor(8),
+            name='test', bundle_path=bundle_path
+        )
+        self.assertEqual(len(source.loaded), 5)
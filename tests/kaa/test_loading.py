@@ -0,0 +1,45 @@
+import os
+from unittest import TestCase
+
+import cv2
+import numpy as np
+
+from kaa.tasks.actions.loading import is_loading_image, _is_loading_image_unique
+
+IMAGES_PATH = os.path.join(os.path.dirname(__file__), '..', 'images', 'ui')
+
+
+class TestIsLoadingImage(TestCase):
+    def test_screenshots(self):
+        for name in sorted(os.listdir(IMAGES_PATH)):
+            if 'loading' not in name:
+                continue
+            img = cv2.imread(os.path.join(IMAGES_PATH, name))
+            self.assertIsNotNone(img)
+            with self.subTest(name=name):
+                expected = not name.startswith('not_')
+                self.assertEqual(_is_loading_image_unique(img), expected)
+                self.assertEqual(is_loading_image(img), expected)
+                self.assertEqual(is_loading_image(img, stride=1), expected)
+
+    def test_sparse_third_color(self):
+        # 采样时漏掉的颜色，应由完整检查发现
+        img = np.zeros((1280, 720, 3), dtype=np.uint8)
+        img[:, 360:] = 255
+        img[1, 1] = (0, 0, 255)
+        self.assertFalse(_is_loading_image_unique(img))
+        self.assertFalse(is_loading_image(img))
+        # 位于检测区域之外的颜色不影响结果
+        img[1, 1] = 0
+        img[1000, 1] = (0, 0, 255)
+        self.assertTrue(is_loading_image(img))
+
+    def test_random(self):
+        rng = np.random.default_rng(0)
+        for i in range(20):
+            img = np.full((1280, 720, 3), rng.integers(0, 256, 3), dtype=np.uint8)
+            for _ in range(i % 4):
+                y, x = rng.integers(0, 448), rng.integers(0, 720)
+                img[y:y + 3, x:x + 3] = rng.integers(0, 256, 3)
+            with self.subTest(i=i):
+                self.assertEqual(is_loading_image(img), _is_loading_image_unique(img))
@@ -0,0 +1,69 @@
+import os
+import shutil
+import hashlib
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from kaa.game_data.md5_cache import Md5Cache
+
+
+def _set_old_mtime(path: Path, offset: int = 0):
+    """将修改时间设为一小时前，避免被视为刚修改的文件而不缓存"""
+    mtime = os.stat(path).st_mtime_ns - 3600 * 10**9 + offset
+    os.utime(path, ns=(mtime, mtime))
+
+
+class TestMd5Cache(TestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.cache_path = self.root / 'md5_cache.json'
+        self.files = []
+        for i in range(5):
+            path = self.root / 'sprites' / f'{i}.png'
+            path.parent.mkdir(exist_ok=True)
+            path.write_bytes(os.urandom(1000))
+            _set_old_mtime(path)
+            self.files.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_cached_across_instances(self):
+        cache = Md5Cache(self.cache_path, self.root)
+        hashes = cache.md5_many(self.files)
+        self.assertEqual(hashes[self.files[0]], hashlib.md5(self.files[0].read_bytes()).hexdigest())
+        self.assertEqual(cache.misses, 5)
+        cache.save()
+
+        cache = Md5Cache(self.cache_path, self.root)
+        self.assertEqual(cache.md5_many(self.files), hashes)
+        self.assertEqual((cache.hits, cache.misses), (5, 0))
+
+    def test_changed_file_rehashed(self):
+        cache = Md5Cache(self.cache_path, self.root)
+        cache.md5_many(self.files)
+        # 相同大小，不同修改时间
+        self.files[1].write_bytes(b'x' * 1000)
+        _set_old_mtime(self.files[1], offset=10**9)
+        self.assertEqual(cache.md5(self.files[1]), hashlib.md5(b'x' * 1000).hexdigest())
+        self.assertEqual(cache.misses, 6)
+
+    def test_missing_and_recent_files(self):
+        cache = Md5Cache(self.cache_path, self.root)
+        self.assertIsNone(cache.md5(self.root / 'missing.png'))
+        recent = self.root / 'recent.png'
+        recent.write_bytes(b'recent')
+        cache.md5(recent)
+        cache.md5(recent)
+        # 刚修改的文件不缓存
+        self.assertEqual(cache.misses, 2)
+
+    def test_corrupted_cache_file(self):
+        self.cache_path.write_text('{invalid')
+        cache = Md5Cache(self.cache_path, self.root)
+        cache.md5_many(self.files)
+        cache.save()
+        cache = Md5Cache(self.cache_path, self.root)
+        cache.md5_many(self.files)
+        self.assertEqual(cache.hits, 5)
@@ -366,6 +366,48 @@ class TestProduceSolutionManager(TestCase):
 
         self.assertIn("Solution with id 'nonexistent_id' not found", str(context.exception))
 
+    def test_get_cached_solution(self):
+        """测试读取方案的缓存"""
+        solution = ProduceSolution(id='cache_test_id', name='缓存测试方案', data=ProduceData())
+        self.manager.save(solution.id, solution)
+
+        cached = self.manager.get(solution.id)
+        self.assertIs(ProduceSolutionManager().get(solution.id), cached)
+        # read 返回副本，修改不影响缓存
+        copy = self.manager.read(solution.id)
+        self.assertIsNot(copy, cached)
+        copy.data.mode = 'pro'
+        self.assertEqual(self.manager.get(solution.id).data.mode, 'regular')
+
+        # 保存后缓存失效
+        self.manager.save(solution.id, copy)
+        self.assertEqual(self.manager.get(solution.id).data.mode, 'pro')
+
+    def test_get_after_external_change(self):
+        """测试文件被外部修改、增删后重新读取"""
+        solution = ProduceSolution(id='external_id', name='外部修改', data=ProduceData())
+        self.manager.save(solution.id, solution)
+        self.assertEqual(self.manager.get(solution.id).data.mode, 'regular')
+
+        # 修改文件内容
+        file_path = self.manager._get_file_path(solution.name)
+        solution.data.mode = 'master'
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(solution.model_dump(mode='json'), f, ensure_ascii=False)
+        stat = os.stat(file_path)
+        os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertEqual(self.manager.get(solution.id).data.mode, 'master')
+
+        # 重命名文件
+        new_path = os.path.join(self.manager.SOLUTIONS_DIR, 'renamed.json')
+        os.rename(file_path, new_path)
+        self.assertEqual(self.manager._find_file_path_by_id(solution.id), new_path)
+
+        # 删除文件
+        os.remove(new_path)
+        with self.assertRaises(ProduceSolutionNotFoundError):
+            self.manager.get(solution.id)
+
     def test_delete_solution(self):
         """测试删除方案"""
         # 创建并保存方案
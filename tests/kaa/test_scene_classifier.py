@@ -0,0 +1,77 @@
+from unittest import TestCase
+
+import cv2
+import numpy as np
+from kotonebot.primitives import Rect, ImageSlice
+from kotonebot.core import AnyOf, TemplateMatchPrefab
+
+from kaa.game_ui.scene_classifier import SceneClassifier, SceneRule
+
+
+def _make_image(seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    img = rng.integers(0, 256, (1280, 720, 3), dtype=np.uint8)
+    return cv2.GaussianBlur(img, (5, 5), 0)
+
+
+def _make_prefab(name: str, source: np.ndarray, rect: Rect) -> type[TemplateMatchPrefab]:
+    pixels = source[rect.y1:rect.y2, rect.x1:rect.x2].copy()
+    return type(name, (TemplateMatchPrefab,), {
+        'template': ImageSlice(pixels=pixels, slice_rect=rect),
+    })
+
+
+class TestSceneClassifier(TestCase):
+    def setUp(self):
+        self.scene_a = _make_image(0)
+        self.scene_b = _make_image(1)
+        self.A = _make_prefab('A', self.scene_a, Rect(100, 800, 200, 50))
+        self.B1 = _make_prefab('B1', self.scene_b, Rect(50, 100, 120, 40))
+        self.B2 = _make_prefab('B2', self.scene_b, Rect(400, 1000, 120, 40))
+        self.classifier = SceneClassifier([
+            SceneRule('a', self.A),
+            SceneRule('b', AnyOf[self.B1, self.B2]),
+        ])
+
+    def test_classify(self):
+        frame = self.classifier.frame(self.scene_a)
+        self.assertEqual(self.classifier.classify(frame), 'a')
+        # 命中后不再判断低优先级规则
+        self.assertEqual(list(frame.timings.keys()), ['a'])
+
+        frame = self.classifier.frame(self.scene_b)
+        self.assertEqual(self.classifier.classify(frame), 'b')
+        self.assertIn('a', frame.timings)
+        self.assertIs(self.classifier.last_frame, frame)
+
+        frame = self.classifier.frame(_make_image(2))
+        self.assertIsNone(self.classifier.classify(frame))
+
+    def test_classify_subset(self):
+        frame = self.classifier.frame(self.scene_a)
+        self.assertIsNone(self.classifier.classify(frame, ['b']))
+        self.assertEqual(self.classifier.classify(frame, ['a', 'b']), 'a')
+        with self.assertRaises(ValueError):
+            self.classifier.classify(frame, ['unknown'])
+
+    def test_results_cached_per_frame(self):
+        frame = self.classifier.frame(self.scene_b)
+        self.assertTrue(self.classifier.test(frame, 'b'))
+        self.assertEqual(frame.results, {self.B1: True})
+        # 同一帧内再次判断直接使用缓存
+        frame.results[self.B1] = False
+        frame.results[self.B2] = False
+        self.assertFalse(self.classifier.test(frame, 'b'))
+
+    def test_roi(self):
+        # 在截取位置附近移动时仍能识别
+        moved = np.roll(self.scene_a, 100, axis=0)
+        frame = self.classifier.frame(moved)
+        self.assertTrue(self.classifier.test(frame, 'a'))
+        # 超出搜索范围时不再识别
+        moved = np.roll(self.scene_a, -600, axis=0)
+        frame = self.classifier.frame(moved)
+        self.assertFalse(self.classifier.test(frame, 'a'))
+        # 全屏搜索
+        classifier = SceneClassifier([SceneRule('a', self.A, full_frame=True)])
+        self.assertTrue(classifier.test(classifier.frame(moved), 'a'))
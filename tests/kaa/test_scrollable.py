@@ -0,0 +1,61 @@
+from unittest import TestCase
+
+import cv2
+import numpy as np
+from kotonebot.primitives import Rect
+
+from kaa.game_ui.scrollable import ScrollScanner, estimate_scroll_offset
+
+
+def _make_content(height: int, width: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    img = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    return cv2.GaussianBlur(img, (9, 9), 0)
+
+
+def _screen(content: np.ndarray, roi: Rect, scroll: int) -> np.ndarray:
+    """构造一张截图，其中 roi 区域显示从 scroll 处开始的滚动内容。"""
+    img = np.zeros((1280, 720, 3), dtype=np.uint8)
+    img[roi.y1:roi.y2, roi.x1:roi.x2] = content[scroll:scroll + roi.h]
+    return img
+
+
+class TestScrollScanner(TestCase):
+    def setUp(self):
+        self.roi = Rect(40, 300, 640, 700)
+        self.content = _make_content(3000, 640)
+
+    def test_estimate_offset(self):
+        for delta in [0, 37, 160, 300]:
+            prev = self.content[100:800]
+            curr = self.content[100 + delta:800 + delta]
+            offset, response = estimate_scroll_offset(prev, curr)
+            self.assertAlmostEqual(offset, delta, delta=1)
+            self.assertGreater(response, 0.1)
+
+    def test_feed(self):
+        scanner = ScrollScanner(self.roi)
+        # 第一帧：整个区域
+        region = scanner.feed(_screen(self.content, self.roi, 0))
+        self.assertEqual(region.xywh, self.roi.xywh)  # type: ignore[union-attr]
+        self.assertTrue(scanner.is_new((0, self.roi.y1, 10, 10)))
+        # 滚动 200px：只有底部 200px 是新的
+        region = scanner.feed(_screen(self.content, self.roi, 200), margin=50)
+        assert region is not None
+        self.assertAlmostEqual(scanner.offset or 0, 200, delta=1)
+        self.assertEqual(region.y2, self.roi.y2)
+        self.assertAlmostEqual(region.y1, self.roi.y2 - 200 - scanner.tolerance - 50, delta=1)
+        # 上一帧完整显示的元素不再是新元素
+        self.assertFalse(scanner.is_new((0, 600, 100, 190)))
+        # 跨越边界的元素是新元素
+        self.assertTrue(scanner.is_new((0, self.roi.y2 - 150, 100, 190 - 50)))
+        # 内容没有移动
+        self.assertIsNone(scanner.feed(_screen(self.content, self.roi, 200)))
+
+    def test_unreliable_estimate_falls_back_to_full_region(self):
+        scanner = ScrollScanner(self.roi)
+        scanner.feed(_screen(self.content, self.roi, 0))
+        other = _make_content(3000, 640)[::-1].copy()
+        region = scanner.feed(_screen(other, self.roi, 1000))
+        self.assertEqual(region.xywh, self.roi.xywh)  # type: ignore[union-attr]
+        self.assertIsNone(scanner.offset)
@@ -0,0 +1,90 @@
+import random
+from types import SimpleNamespace
+from unittest import TestCase
+
+from kaa.db.constants import ProduceExamEffectType
+from kaa.tasks.produce.new.play_cards.card_features import CardFeatureTable
+from kaa.tasks.produce.new.play_cards.expert_strategy import ExpertSystemStrategy
+from kaa.tasks.produce.new.play_cards.simulator import (
+    LessonConfig, LessonSimulator, SimulatedBattleContext,
+)
+
+from .fake_cards import FakeCatalog, card, effect
+
+
+class _NoopStrategy:
+    def on_action(self, ctx):
+        pass
+
+
+class TestLessonSimulator(TestCase):
+    def setUp(self):
+        self.lesson = card('lesson', [effect(ProduceExamEffectType.ExamLesson, 10)], stamina=4)
+        self.block = card('block', [effect(ProduceExamEffectType.ExamBlock, 6)], force_stamina=3)
+        self.review = card('review', [effect(ProduceExamEffectType.ExamReview, 3)])
+        self.buff = card('buff', [effect(ProduceExamEffectType.ExamParameterBuff, turn=2)])
+
+    def _sim(self, deck, **kwargs):
+        return LessonSimulator(deck, LessonConfig(**kwargs), rng=random.Random(0))  # type: ignore[arg-type]
+
+    def test_cost_uses_genki_first(self):
+        sim = self._sim([self.lesson], genki=3)
+        sim.start_turn()
+        sim.play(0)
+        self.assertEqual((sim.state.genki, sim.state.hp), (0, 29))
+        self.assertEqual(sim.state.score, 10)
+        # force_stamina 不消耗元气
+        sim = self._sim([self.block], genki=5)
+        sim.start_turn()
+        sim.play(0)
+        self.assertEqual((sim.state.genki, sim.state.hp), (11, 27))
+
+    def test_not_playable(self):
+        sim = self._sim([self.block], hp=2)
+        sim.start_turn()
+        self.assertFalse(sim.hands()[0].available)
+        with self.assertRaises(ValueError):
+            sim.play(0)
+
+    def test_buff_and_impression(self):
+        sim = self._sim([self.buff])
+        sim.apply(self.buff.play_effects[0].produce_exam_effect)
+        self.assertEqual(sim.lesson_value(10), 15)
+        sim.apply(self.review.play_effects[0].produce_exam_effect)
+        sim.end_turn()
+        sim.end_turn()
+        # 好印象 3 + 2；好调持续 2 回合
+        self.assertEqual(sim.state.score, 5)
+        self.assertEqual(sim.lesson_value(10), 10)
+
+    def test_ignored_effects(self):
+        sim = self._sim([self.lesson])
+        sim.apply(SimpleNamespace(effect_type=ProduceExamEffectType.ExamAntiDebuff, effect_value1=1, effect_turn=None))
+        self.assertEqual(sim.ignored_effects, {ProduceExamEffectType.ExamAntiDebuff: 1})
+
+    def test_skip_when_not_committed(self):
+        result = self._sim([self.lesson], turns=3, hp=10).run(_NoopStrategy())  # type: ignore[arg-type]
+        self.assertEqual((result.turns, result.skips, result.cards_played), (3, 3, 0))
+        self.assertEqual(len(result.decision_times), 3)
+
+    def test_context_commit(self):
+        sim = self._sim([self.lesson, self.block])
+        sim.start_turn()
+        ctx = SimulatedBattleContext(sim)
+        self.assertEqual(ctx.fetch_all(), (10, 30, 0))
+        card = ctx.fetch_hands()[1]
+        ctx.commit(card)
+        self.assertEqual(len(sim.hand), 1)
+        with self.assertRaises(RuntimeError):
+            ctx.commit(ctx.fetch_hands()[0])
+
+    def test_expert_strategy(self):
+        deck = [self.lesson, self.block, self.review, self.buff] * 2
+        strategy = ExpertSystemStrategy(table=CardFeatureTable(FakeCatalog()))  # type: ignore[arg-type]
+        first = self._sim(deck).run(strategy)
+        second = self._sim(deck).run(strategy)
+        self.assertEqual(first.turns, 10)
+        self.assertEqual(first.cards_played, 10)
+        self.assertGreater(first.score, 0)
+        # 相同的随机种子，结果相同
+        self.assertEqual((first.score, first.cards_played), (second.score, second.cards_played))
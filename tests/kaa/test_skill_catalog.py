@@ -0,0 +1,89 @@
+import json
+import os
+import sqlite3
+import tempfile
+from unittest import TestCase
+
+from kaa.db.catalog import SkillCatalog
+from kaa.db.constants import ProduceExamEffectType
+from kaa.db.skill_card import PRODUCE_CARD_COLUMNS, PRODUCE_EXAM_EFFECT_COLUMNS
+from kaa.db.sqlite import ConnectionManager
+
+
+def _columns(raw: str) -> list[str]:
+    return [c.strip() for c in raw.split(',')]
+
+
+def _create_game_db(path: str, card_name: str):
+    """创建只包含测试所需数据的最小 game.db"""
+    if os.path.exists(path):
+        os.remove(path)
+    card_columns = _columns(PRODUCE_CARD_COLUMNS)
+    effect_columns = _columns(PRODUCE_EXAM_EFFECT_COLUMNS)
+    conn = sqlite3.connect(path)
+    conn.execute(f'CREATE TABLE ProduceCard ({", ".join(card_columns)});')
+    conn.execute(f'CREATE TABLE ProduceExamEffect ({", ".join(effect_columns)});')
+
+    effect = dict.fromkeys(effect_columns)
+    effect.update(id='e_1', effectType=next(iter(ProduceExamEffectType)).value, effectValue1=5)
+    conn.execute(
+        f'INSERT INTO ProduceExamEffect VALUES ({", ".join("?" for _ in effect_columns)});',
+        [effect[c] for c in effect_columns]
+    )
+    for upgrade in (0, 1):
+        card = {c: 0 for c in card_columns}
+        card.update({
+            'id': 'c_1',
+            'upgradeCount': upgrade,
+            'name': f'{card_name}{"+" if upgrade else ""}',
+            'assetId': 'img_card_1',
+            'playEffects': json.dumps([{'produceExamTriggerId': '', 'produceExamEffectId': 'e_1'}]),
+            'moveProduceExamEffectIds': '[]',
+            '"order"': '1',
+        })
+        conn.execute(
+            f'INSERT INTO ProduceCard VALUES ({", ".join("?" for _ in card_columns)});',
+            [card[c] for c in card_columns]
+        )
+    conn.commit()
+    conn.close()
+
+
+class TestSkillCatalog(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'game.db')
+        _create_game_db(self.path, 'Card')
+        self.connections = ConnectionManager(self.path)
+        self.catalog = SkillCatalog(self.connections)
+
+    def tearDown(self):
+        self.connections.release_idle()
+        self.tmp.cleanup()
+
+    def test_lookup(self):
+        card = self.catalog.by_asset_id('img_card_1')
+        assert card is not None
+        # 与 SkillCard.from_asset_id 一致，取第一行
+        self.assertEqual(card.name, 'Card')
+        self.assertIs(self.catalog.by_id('c_1'), card)
+        self.assertIsNone(self.catalog.by_asset_id('missing'))
+        self.assertEqual(len(card.play_effects), 1)
+        effect = card.play_effects[0].produce_exam_effect
+        assert effect is not None
+        self.assertEqual(effect.effect_value1, 5)
+        self.assertIs(self.catalog.effect('e_1'), effect)
+
+    def test_all_cards(self):
+        cards = self.catalog.all_cards()
+        self.assertEqual([c.upgrade_count for c in cards], [0, 1])
+        self.assertEqual(self.catalog.generation, self.connections.generation)
+
+    def test_reload_after_game_db_changed(self):
+        first = self.catalog.by_id('c_1')
+        self.assertIs(self.catalog.by_id('c_1'), first)
+        self.connections.reset()
+        _create_game_db(self.path, 'New')
+        card = self.catalog.by_id('c_1')
+        assert card is not None
+        self.assertEqual(card.name, 'New')
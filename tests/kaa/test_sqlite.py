@@ -0,0 +1,110 @@
+import gc
+import os
+import sqlite3
+import tempfile
+import threading
+from unittest import TestCase
+
+from kaa.db.sqlite import ConnectionManager
+
+
+def _create_db(path: str, value: int):
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE t (v INTEGER);')
+    conn.execute('INSERT INTO t VALUES (?);', (value,))
+    conn.commit()
+    conn.close()
+
+
+class TestConnectionManager(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'game.db')
+        _create_db(self.path, 1)
+        self.manager = ConnectionManager(self.path)
+
+    def tearDown(self):
+        self.manager.release_idle()
+        self.tmp.cleanup()
+
+    def test_read_only(self):
+        conn = self.manager.get()
+        self.assertIs(conn, self.manager.get())
+        self.assertEqual(conn.execute('SELECT v FROM t;').fetchone()[0], 1)
+        with self.assertRaises(sqlite3.OperationalError):
+            conn.execute('INSERT INTO t VALUES (2);')
+
+    def test_per_thread_and_closed_on_exit(self):
+        main_conn = self.manager.get()
+        result = {}
+
+        def worker():
+            result['conn'] = self.manager.get()
+            result['value'] = result['conn'].execute('SELECT v FROM t;').fetchone()[0]
+
+        t = threading.Thread(target=worker)
+        t.start()
+        t.join()
+        self.assertEqual(result['value'], 1)
+        self.assertIsNot(result['conn'], main_conn)
+        gc.collect()
+        # 线程结束后，其连接应被关闭
+        self.assertEqual(self.manager.connection_count, 1)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            result['conn'].execute('SELECT 1;')
+
+    def test_reset_reopens(self):
+        old = self.manager.get()
+        self.manager.reset()
+        # 旧连接仍可使用，直到所属线程下次获取连接
+        self.assertEqual(old.execute('SELECT v FROM t;').fetchone()[0], 1)
+        _create_db(self.path, 2)
+        conn = self.manager.get()
+        self.assertIsNot(conn, old)
+        self.assertEqual(conn.execute('SELECT v FROM t;').fetchone()[0], 2)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            old.execute('SELECT 1;')
+
+    def test_reset_during_query(self):
+        with self.manager.connection() as conn:
+            cursor = conn.execute('SELECT v FROM t;')
+            # 其他线程触发的重置不影响正在进行的查询
+            t = threading.Thread(target=self.manager.reset)
+            t.start()
+            t.join()
+            self.assertEqual([tuple(r) for r in cursor.fetchall()], [(1,)])
+        with self.manager.connection() as conn:
+            self.assertEqual(conn.execute('SELECT v FROM t;').fetchone()[0], 1)
+
+    def test_release_idle(self):
+        started = threading.Event()
+        finish = threading.Event()
+        result = {}
+
+        def busy():
+            with self.manager.connection() as conn:
+                started.set()
+                finish.wait(5)
+                result['value'] = conn.execute('SELECT v FROM t;').fetchone()[0]
+
+        idle = self.manager.get()
+        t = threading.Thread(target=busy)
+        t.start()
+        started.wait(5)
+        # 只关闭空闲的连接，正在使用的连接不受影响
+        self.assertEqual(self.manager.release_idle(), 1)
+        finish.set()
+        t.join()
+        self.assertEqual(result['value'], 1)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            idle.execute('SELECT 1;')
+        with self.manager.connection() as conn:
+            self.assertIsNot(conn, idle)
+            self.assertEqual(conn.execute('SELECT v FROM t;').fetchone()[0], 1)
+
+    def test_close_current(self):
+        old = self.manager.get()
+        self.manager.close_current()
+        self.assertIsNot(self.manager.get(), old)
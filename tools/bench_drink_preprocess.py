@@ -0,0 +1,53 @@
+"""
+对比饮品槽预处理的两种实现：逐像素 BFS 与基于连通区域的掩码实现。
+
+使用 kotonebot-resource 中的考试截图，截取左下角三个饮品槽进行测试。
+"""
+import os
+import time
+import argparse
+
+import cv2
+import numpy as np
+
+from kaa.game_ui.drinks_overview import preprocess_drink_slot_img, _preprocess_drink_slot_img_bfs
+
+SPRITES_PATH = './kotonebot-resource/sprites/jp/in_purodyuusu'
+SCREENSHOTS = ['screenshot_drink_test.png', 'screenshot_drink_test_3.png']
+# InPurodyuusu.BoxDrink1~3
+DRINK_SLOTS = [(53, 1166, 68, 68), (149, 1166, 68, 68), (245, 1166, 68, 68)]
+
+
+def bench(func, slots: list, rounds: int) -> float:
+    """返回单个饮品槽的平均耗时（毫秒）"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for slot in slots:
+            func(slot)
+    return (time.perf_counter() - start) / (rounds * len(slots)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    slots = []
+    for name in SCREENSHOTS:
+        img = cv2.imread(os.path.join(SPRITES_PATH, name))
+        assert img is not None, f'Cannot read {name}'
+        for x, y, w, h in DRINK_SLOTS:
+            slots.append(img[y:y+h, x:x+w])
+
+    for slot in slots:
+        assert np.array_equal(preprocess_drink_slot_img(slot), _preprocess_drink_slot_img_bfs(slot))
+    print(f"Outputs identical on {len(slots)} slots.")
+
+    bfs = bench(_preprocess_drink_slot_img_bfs, slots, args.rounds)
+    mask = bench(preprocess_drink_slot_img, slots, args.rounds)
+    print(f"BFS:  {bfs:8.3f} ms/slot")
+    print(f"Mask: {mask:8.3f} ms/slot")
+    print(f"Speedup: {bfs / mask:.1f}x")
+
+if __name__ == "__main__":
+    main()
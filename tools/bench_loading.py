@@ -0,0 +1,57 @@
+"""
+对比加载画面检测的两种实现：基于 np.unique 的原始实现与采样 + 位压缩直方图的实现。
+
+使用 tests/images/ui 中的加载截图以及 kotonebot-resource 中的游戏截图进行测试。
+"""
+import glob
+import time
+import argparse
+
+import cv2
+
+from kaa.tasks.actions.loading import is_loading_image, _is_loading_image_unique
+
+IMAGE_PATTERNS = [
+    './tests/images/ui/*loading_*.png',
+    './kotonebot-resource/sprites/jp/**/*.png',
+]
+
+
+def bench(func, images: list, rounds: int) -> float:
+    """返回单张截图的平均耗时（毫秒）"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for img in images:
+            func(img)
+    return (time.perf_counter() - start) / (rounds * len(images)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--rounds', type=int, default=10)
+    args = parser.parse_args()
+
+    images = []
+    for pattern in IMAGE_PATTERNS:
+        for path in sorted(glob.glob(pattern, recursive=True)):
+            img = cv2.imread(path)
+            # 只使用完整的游戏截图，跳过切图
+            if img is not None and img.shape[:2] == (1280, 720):
+                images.append(img)
+    loading = [img for img in images if _is_loading_image_unique(img)]
+    not_loading = [img for img in images if not _is_loading_image_unique(img)]
+
+    for img in images:
+        assert is_loading_image(img) == _is_loading_image_unique(img)
+    print(f"Results identical on {len(images)} screenshots ({len(loading)} loading).")
+
+    for name, group in [('loading', loading), ('not loading', not_loading)]:
+        unique = bench(_is_loading_image_unique, group, args.rounds)
+        sampled = bench(is_loading_image, group, args.rounds)
+        print(f"[{name}]")
+        print(f"  np.unique: {unique:8.3f} ms/frame")
+        print(f"  Sampled:   {sampled:8.3f} ms/frame")
+        print(f"  Speedup:   {unique / sampled:.1f}x")
+
+if __name__ == "__main__":
+    main()
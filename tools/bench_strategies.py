@@ -0,0 +1,108 @@
+"""
+使用离线模拟器评估出牌策略。
+
+从 game.db 中随机组成牌组，让每个策略在相同的牌组与随机种子下各模拟若干场课程，
+输出得分分布与单次决策耗时。
+
+例：
+    python tools/bench_strategies.py -n 2000 --plan ProducePlanType_Plan1
+"""
+import time
+import random
+import logging
+import argparse
+from typing import Callable
+
+import numpy as np
+
+from kaa.db.catalog import skill_catalog
+from kaa.db.skill_card import SkillCard
+from kaa.tasks.produce.new.play_cards.strategy import AbstractBattleStrategy
+from kaa.tasks.produce.new.play_cards.expert_strategy import ExpertSystemStrategy
+from kaa.tasks.produce.new.play_cards.simulator import LessonConfig, LessonSimulator, LessonResult
+
+
+class FirstCardStrategy(AbstractBattleStrategy):
+    """总是打出第一张可用的卡。作为基准。"""
+    def on_action(self, ctx):
+        for card in ctx.fetch_hands():
+            if card.available:
+                ctx.commit(card)
+                return
+
+
+class RandomStrategy(AbstractBattleStrategy):
+    """随机打出一张可用的卡。作为基准。"""
+    def __init__(self, seed: int = 0):
+        self.rng = random.Random(seed)
+
+    def on_action(self, ctx):
+        cards = [c for c in ctx.fetch_hands() if c.available]
+        if cards:
+            ctx.commit(self.rng.choice(cards))
+
+
+STRATEGIES: dict[str, Callable[[], AbstractBattleStrategy]] = {
+    'expert': ExpertSystemStrategy,
+    'first': FirstCardStrategy,
+    'random': RandomStrategy,
+}
+# BandaiStrategy 依赖画面上的推荐卡高亮，无法离线模拟
+
+
+def card_pool(plan: str | None) -> list[SkillCard]:
+    cards = [c for c in skill_catalog().all_cards() if c.play_effects]
+    if plan:
+        cards = [c for c in cards if c.plan_type in (plan, 'ProducePlanType_Common')]
+    return cards
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--lessons', type=int, default=1000, help='Lessons per strategy')
+    parser.add_argument('--deck-size', type=int, default=12)
+    parser.add_argument('--turns', type=int, default=10)
+    parser.add_argument('--plan', default=None, help='e.g. ProducePlanType_Plan1')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-s', '--strategy', action='append', choices=list(STRATEGIES), help='Default: all')
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    pool = card_pool(args.plan)
+    if len(pool) < args.deck_size:
+        raise SystemExit(f'Not enough cards in pool: {len(pool)}')
+    print(f"Card pool: {len(pool)} cards.")
+    rng = random.Random(args.seed)
+    decks = [rng.sample(pool, args.deck_size) for _ in range(args.lessons)]
+    config = LessonConfig(turns=args.turns)
+
+    for name in args.strategy or list(STRATEGIES):
+        strategy = STRATEGIES[name]()
+        results: list[LessonResult] = []
+        start = time.perf_counter()
+        for i, deck in enumerate(decks):
+            sim = LessonSimulator(deck, config, rng=random.Random(args.seed + i))
+            results.append(sim.run(strategy))
+        elapsed = time.perf_counter() - start
+
+        scores = np.array([r.score for r in results])
+        decisions = np.array([t for r in results for t in r.decision_times]) * 1e6
+        turns = sum(r.turns for r in results)
+        p10, p50, p90 = np.percentile(scores, [10, 50, 90])
+        print(f"[{name}]")
+        print(f"  score   mean={scores.mean():.1f} std={scores.std():.1f} p10={p10:.0f} p50={p50:.0f} p90={p90:.0f}")
+        print(f"  decide  mean={decisions.mean():.1f}us p50={np.percentile(decisions, 50):.1f}us p99={np.percentile(decisions, 99):.1f}us")
+        print(f"  speed   {turns / elapsed:.0f} turns/s, skips={sum(r.skips for r in results)}")
+
+    ignored: dict = {}
+    for deck in decks[:100]:
+        sim = LessonSimulator(deck, config, rng=random.Random(args.seed))
+        for effect_type, count in sim.run(FirstCardStrategy()).ignored_effects.items():
+            ignored[effect_type] = ignored.get(effect_type, 0) + count
+    if ignored:
+        top = sorted(ignored.items(), key=lambda kv: -kv[1])[:10]
+        print("Most frequent ignored effects:", ', '.join(f'{t.name}={c}' for t, c in top))
+
+
+if __name__ == '__main__':
+    main()
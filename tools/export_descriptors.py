@@ -0,0 +1,38 @@
+"""
+导出预先计算的描述符包，供发布游戏数据时一同上传。
+
+输出文件名与 `kaa.game_data.updater._descriptor_asset` 一致，
+同时需要在 manifest.json 中以 `descriptors/<category>.npz` 为 key 登记 md5 与大小。
+"""
+import os
+import argparse
+
+from kaa.image_db import FileDataSource
+from kaa.util import paths
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('output', help='Output directory')
+    args = parser.parse_args()
+
+    from kaa.game_ui.drinks_overview import drinks_db
+    from kaa.game_ui.idols_overview import idols_db
+    from kaa.tasks.produce.new.play_cards.ui import skill_cards_db
+
+    os.makedirs(args.output, exist_ok=True)
+    for category, get_db in [
+        ('idol_cards', idols_db),
+        ('skill_cards', skill_cards_db),
+        ('drinks', drinks_db),
+    ]:
+        print(f"Building {category}...")
+        db = get_db()
+        out = os.path.join(args.output, f'descriptors-{category}.npz')
+        db.export_bundle(out, FileDataSource(paths.resource(category)))
+        print(f"Exported {db.db.count()} descriptors to {out}")
+
+    print("Done!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+从 kotonebot-resource 中的截图生成字形模板，供 `kaa.game_ui.digits` 使用。
+
+每种字体由若干已知内容的截图区域生成。新增字体或字符时，
+在 `FONTS` 中登记截图、区域 (x1, y1, x2, y2) 与区域内的文字，然后重新运行本脚本。
+"""
+import os
+import shutil
+
+import cv2
+
+from kaa.game_ui.digits import GlyphSet
+
+SPRITES_PATH = './kotonebot-resource/sprites/jp'
+OUTPUT_PATH = './kaa/resources/glyphs'
+
+# 行动页属性值（InPurodyuusu.CurVoValue/CurDaValue/CurViValue/MaxDaValue）
+_PARAM_BOXES = [(185, 680, 285, 720), (330, 680, 430, 720), (475, 680, 575, 720), (285, 720, 430, 750)]
+# 课程 HUD（InPurodyuusu.InLesson.BoxRemainingTurns/BoxHp）
+_TURNS_BOX = (54, 69, 148, 113)
+_HP_BOX = (565, 168, 629, 210)
+
+FONTS: dict[str, dict] = {
+    # 白色、带深色描边的数字
+    'outlined': {
+        'threshold': 220,
+        'samples': [
+            *zip(['in_purodyuusu/screenshot_action_1.png'] * 4, _PARAM_BOXES, ['211', '305', '345', '/1000']),
+            *zip(['in_purodyuusu/screenshot_action_2.png'] * 4, _PARAM_BOXES, ['172', '184', '313', '/1500']),
+            *zip(['in_purodyuusu/screenshot_sensei_tip_consult.png'] * 4, _PARAM_BOXES, ['159', '253', '283', '/1500']),
+            *zip(['in_purodyuusu/screenshot_sp.png'] * 4, _PARAM_BOXES, ['521', '522', '684', '/1500']),
+            ('in_purodyuusu/screenshot_5_cards.png', _TURNS_BOX, '1'),
+            ('in_purodyuusu/screenshot_5_cards.png', _HP_BOX, '23'),
+            ('in_purodyuusu/screenshot_lesson_5_cards.png', _HP_BOX, '22'),
+            ('in_purodyuusu/screenshot_skill_card_T.png', _TURNS_BOX, '5'),
+            ('in_purodyuusu/screenshot_skill_card_T.png', _HP_BOX, '4'),
+        ],
+    },
+}
+
+
+def main():
+    for font, spec in FONTS.items():
+        glyphs = GlyphSet(font, spec['threshold'])
+        for file, (x1, y1, x2, y2), text in spec['samples']:
+            img = cv2.imread(os.path.join(SPRITES_PATH, file))
+            assert img is not None, f'Cannot read {file}'
+            if not glyphs.add_sample(img[y1:y2, x1:x2], text):
+                raise ValueError(f'Failed to segment "{text}" from {file} {(x1, y1, x2, y2)}.')
+        out = os.path.join(OUTPUT_PATH, font)
+        if os.path.exists(out):
+            shutil.rmtree(out)
+        glyphs.save(out)
+        print(f'{font}: {len(glyphs)} glyphs, chars={"".join(sorted(glyphs.chars))}')
+
+if __name__ == "__main__":
+    main()